@@ -2,25 +2,30 @@
 Ollama Chat Adapter
 """
 
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple
 from urllib.parse import urlparse
 
+import orjson
+
 from ai_client.models import RequestParts
 
 
 class OllamaChatAdapter:
     """
-    Ollama /api/chat adapter (non-stream).
+    Ollama /api/chat adapter (non-stream by default, NDJSON when streaming).
     """
 
-    def build(
+    def prepare(
         self,
         *,
         base_url: str,
         model: str,
-        user_text: str,
-        extra: Optional[Dict[str, Any]] = None,
     ) -> RequestParts:
+        """
+        Resolve everything that doesn't depend on the message: final URL
+        (including the docker localhost fix), headers and the static
+        payload skeleton.
+        """
         base = self._normalize_url(base_url)
 
         # accept both "http://host:11434" and ".../api/chat"
@@ -34,16 +39,61 @@ class OllamaChatAdapter:
         headers = {"Content-Type": "application/json"}
         payload: Dict[str, Any] = {
             "model": model,
-            "messages": [{"role": "user", "content": user_text}],
             "stream": False,
             # NOTE: If 5 min no request, Ollama will shut down the model and
             #   free resources - next request will take 2-5 seconds to start the model
             "keep_alive": "5m",
         }
+
+        return RequestParts(url=url, headers=headers, payload=payload)
+
+    def render(
+        self,
+        template: RequestParts,
+        *,
+        user_text: str,
+        extra: Optional[Dict[str, Any]] = None,
+        max_tokens: Optional[int] = None,
+        stop: Optional[List[str]] = None,
+        stream: bool = False,
+        top_logprobs: int = 0,
+    ) -> RequestParts:
+        """Build a request from a prepared template - payload assembly only."""
+        payload: Dict[str, Any] = {
+            **template.payload,
+            "messages": [{"role": "user", "content": user_text}],
+        }
         if extra:
             payload.update(extra)
 
-        return RequestParts(url=url, headers=headers, payload=payload)
+        # Ollama takes generation limits in "options"
+        options: Dict[str, Any] = dict(payload.get("options") or {})
+        if max_tokens:
+            options["num_predict"] = max_tokens
+        if stop:
+            options["stop"] = stop
+        if options:
+            payload["options"] = options
+        if stream:
+            payload["stream"] = True
+        if top_logprobs:
+            payload["logprobs"] = True
+            payload["top_logprobs"] = top_logprobs
+
+        return RequestParts(
+            url=template.url, headers=template.headers, payload=payload
+        )
+
+    def build(
+        self,
+        *,
+        base_url: str,
+        model: str,
+        user_text: str,
+        extra: Optional[Dict[str, Any]] = None,
+    ) -> RequestParts:
+        template = self.prepare(base_url=base_url, model=model)
+        return self.render(template, user_text=user_text, extra=extra)
 
     def parse(self, data: Dict[str, Any]) -> str:
         try:
@@ -62,6 +112,43 @@ class OllamaChatAdapter:
 
         return text
 
+    def parse_top_logprobs(self, data: Dict[str, Any]) -> Dict[str, float]:
+        """
+        Top candidate tokens of the first generated token with their
+        logprobs. Raises AIResponseFormatError if the backend returned
+        no logprobs (not supported by the model/server).
+        """
+        try:
+            candidates = data["logprobs"][0]["top_logprobs"]
+            return {c["token"]: float(c["logprob"]) for c in candidates}
+        except Exception as e:
+            from ai_client.models import AIResponseFormatError
+
+            raise AIResponseFormatError(
+                "Ollama /api/chat response has no logprobs"
+            ) from e
+
+    def parse_stream_line(self, line: str) -> Tuple[str, bool]:
+        """
+        Parse one NDJSON line of a streamed response.
+        Returns (text delta, stream finished).
+        """
+        line = line.strip()
+        if not line:
+            return "", False
+
+        try:
+            data = orjson.loads(line)
+            delta = (data.get("message") or {}).get("content") or ""
+        except Exception as e:
+            from ai_client.models import AIResponseFormatError
+
+            raise AIResponseFormatError(
+                "Invalid Ollama /api/chat stream chunk"
+            ) from e
+
+        return delta, bool(data.get("done"))
+
     def _normalize_url(self, base_url: str) -> str:
         return (base_url or "").strip().rstrip("/")
 
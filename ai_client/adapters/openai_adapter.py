@@ -2,7 +2,9 @@
 OpenAI Chat Completions Adapter
 """
 
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple
+
+import orjson
 
 from ai_client.models import RequestParts
 
@@ -12,15 +14,17 @@ class OpenAIChatCompletionsAdapter:
     OpenAI-compatible /v1/chat/completions adapter.
     """
 
-    def build(
+    def prepare(
         self,
         *,
         base_url: str,
         api_key: str,
         model: str,
-        user_text: str,
-        extra: Optional[Dict[str, Any]] = None,
     ) -> RequestParts:
+        """
+        Resolve everything that doesn't depend on the message: final URL,
+        headers and the static payload skeleton.
+        """
         base = self._normalize_url(base_url)
 
         # allow passing either ".../v1/chat/completions" or just host
@@ -37,12 +41,53 @@ class OpenAIChatCompletionsAdapter:
         }
         payload: Dict[str, Any] = {
             "model": model,
+        }
+
+        return RequestParts(url=url, headers=headers, payload=payload)
+
+    def render(
+        self,
+        template: RequestParts,
+        *,
+        user_text: str,
+        extra: Optional[Dict[str, Any]] = None,
+        max_tokens: Optional[int] = None,
+        stop: Optional[List[str]] = None,
+        stream: bool = False,
+        top_logprobs: int = 0,
+    ) -> RequestParts:
+        """Build a request from a prepared template - payload assembly only."""
+        payload: Dict[str, Any] = {
+            **template.payload,
             "messages": [{"role": "user", "content": user_text}],
         }
         if extra:
             payload.update(extra)
+        if max_tokens:
+            payload["max_tokens"] = max_tokens
+        if stop:
+            payload["stop"] = stop
+        if stream:
+            payload["stream"] = True
+        if top_logprobs:
+            payload["logprobs"] = True
+            payload["top_logprobs"] = top_logprobs
 
-        return RequestParts(url=url, headers=headers, payload=payload)
+        return RequestParts(
+            url=template.url, headers=template.headers, payload=payload
+        )
+
+    def build(
+        self,
+        *,
+        base_url: str,
+        api_key: str,
+        model: str,
+        user_text: str,
+        extra: Optional[Dict[str, Any]] = None,
+    ) -> RequestParts:
+        template = self.prepare(base_url=base_url, api_key=api_key, model=model)
+        return self.render(template, user_text=user_text, extra=extra)
 
     def parse(self, data: Dict[str, Any]) -> str:
         try:
@@ -61,5 +106,46 @@ class OpenAIChatCompletionsAdapter:
 
         return text
 
+    def parse_top_logprobs(self, data: Dict[str, Any]) -> Dict[str, float]:
+        """
+        Top candidate tokens of the first generated token with their
+        logprobs. Raises AIResponseFormatError if the backend returned
+        no logprobs (not supported by the model/server).
+        """
+        try:
+            candidates = data["choices"][0]["logprobs"]["content"][0]["top_logprobs"]
+            return {c["token"]: float(c["logprob"]) for c in candidates}
+        except Exception as e:
+            from ai_client.models import AIResponseFormatError
+
+            raise AIResponseFormatError(
+                "OpenAI /chat/completions response has no logprobs"
+            ) from e
+
+    def parse_stream_line(self, line: str) -> Tuple[str, bool]:
+        """
+        Parse one SSE line of a streamed response.
+        Returns (text delta, stream finished).
+        """
+        line = line.strip()
+        if not line.startswith("data:"):
+            return "", False
+
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            return "", True
+
+        try:
+            choice = orjson.loads(data)["choices"][0]
+            delta = choice.get("delta", {}).get("content") or ""
+        except Exception as e:
+            from ai_client.models import AIResponseFormatError
+
+            raise AIResponseFormatError(
+                "Invalid OpenAI /chat/completions stream chunk"
+            ) from e
+
+        return delta, choice.get("finish_reason") is not None
+
     def _normalize_url(self, base_url: str) -> str:
         return (base_url or "").strip().rstrip("/")
@@ -0,0 +1,326 @@
+"""
+Single AI backend: endpoint, request template and health/latency state
+"""
+
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+from urllib.parse import urlparse
+
+import httpx
+
+from config import config
+from config.ai_client import AIBackendConfig
+from logger import get_logger
+from .adapters import OpenAIChatCompletionsAdapter, OllamaChatAdapter
+from .breaker import CircuitBreaker, CircuitState
+from .limiter import AdaptiveConcurrencyLimiter, RequestOutcome
+from .models import (
+    AIDeadlineExceededError,
+    AIHTTPError,
+    AIResponseFormatError,
+    RequestParts,
+)
+from .utils import looks_like_ollama
+
+log = get_logger(__name__)
+
+_openai = OpenAIChatCompletionsAdapter()
+_ollama = OllamaChatAdapter()
+
+
+class AIBackend:
+    """
+    One AI endpoint with its own concurrency limiter, circuit breaker and
+    latency statistics (EWMA and a rolling window for p95) used by the
+    router to pick a backend and by the service to decide when to hedge.
+    """
+
+    EWMA_ALPHA = 0.3
+    LATENCY_WINDOW = 200
+    MIN_P95_SAMPLES = 20
+
+    def __init__(
+        self,
+        cfg: AIBackendConfig,
+        on_change: Optional[Callable[[], None]] = None,
+    ) -> None:
+        self.name = cfg.name or urlparse(cfg.base_url).netloc or cfg.base_url
+        self.model = cfg.model
+
+        http = config.ai.http
+        concurrency = cfg.concurrency or http.concurrency
+        if http.adaptive_concurrency:
+            min_limit, max_limit = http.min_concurrency, http.max_concurrency
+        else:
+            min_limit = max_limit = concurrency
+
+        self._on_change = on_change
+        self.limiter = AdaptiveConcurrencyLimiter(
+            initial=concurrency,
+            min_limit=min_limit,
+            max_limit=max_limit,
+            latency_target_s=http.latency_target_s,
+            on_limit_change=self._changed,
+        )
+        self.breaker = CircuitBreaker(
+            failure_threshold=http.breaker_failure_threshold,
+            reset_timeout_s=http.breaker_reset_s,
+            name=self.name,
+            on_state_change=self._changed,
+        )
+
+        # Switched off once the backend rejects logprob requests (4xx) or
+        # answers them without logprobs
+        self.logprobs_supported = True
+
+        self.outstanding = 0
+        self.ewma_latency_s: Optional[float] = None
+        self._latencies: deque[float] = deque(maxlen=self.LATENCY_WINDOW)
+
+        self.adapter: OpenAIChatCompletionsAdapter | OllamaChatAdapter
+        if looks_like_ollama(cfg.base_url):
+            self.adapter = _ollama
+            self.template = _ollama.prepare(
+                base_url=cfg.base_url, model=cfg.model
+            )
+        else:
+            self.adapter = _openai
+            self.template = _openai.prepare(
+                base_url=cfg.base_url, api_key=cfg.api_key, model=cfg.model
+            )
+
+    def __repr__(self) -> str:
+        return f"AIBackend({self.name!r})"
+
+    @property
+    def available(self) -> bool:
+        """False while the circuit breaker rejects requests."""
+        return not self.breaker.is_open()
+
+    @property
+    def circuit_state(self) -> CircuitState:
+        return self.breaker.state
+
+    def load(self) -> float:
+        """Outstanding requests relative to the concurrency limit."""
+        return self.outstanding / self.limiter.limit
+
+    def hedge_delay_s(self, default_s: float) -> float:
+        """Observed p95 latency, or `default_s` until enough samples."""
+        n = len(self._latencies)
+        if n < self.MIN_P95_SAMPLES:
+            return default_s
+        return sorted(self._latencies)[int(0.95 * (n - 1))]
+
+    def typical_latency_s(self) -> Optional[float]:
+        """p95 latency, EWMA while there are few samples, None if unknown."""
+        if len(self._latencies) >= self.MIN_P95_SAMPLES:
+            return self.hedge_delay_s(0.0)
+        return self.ewma_latency_s
+
+    def _changed(self, _value: Any = None) -> None:
+        if self._on_change is not None:
+            self._on_change()
+
+    def _record_latency(self, latency_s: float) -> None:
+        self._latencies.append(latency_s)
+        if self.ewma_latency_s is None:
+            self.ewma_latency_s = latency_s
+        else:
+            self.ewma_latency_s += self.EWMA_ALPHA * (
+                latency_s - self.ewma_latency_s
+            )
+
+    def timeout_for(self, deadline: Optional[float]) -> tuple[float, bool]:
+        """
+        HTTP timeout for a request that must finish by `deadline`
+        (time.monotonic() based), and whether the deadline is what limits
+        it. Raises AIDeadlineExceededError if no time is left.
+        """
+        timeout_s = config.ai.http.timeout_s
+        if deadline is None:
+            return timeout_s, False
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise AIDeadlineExceededError("Message deadline already passed")
+        if remaining < timeout_s:
+            return remaining, True
+        return timeout_s, False
+
+    @asynccontextmanager
+    async def guarded(
+        self, deadline: Optional[float] = None
+    ) -> AsyncIterator[tuple[RequestOutcome, float]]:
+        """
+        Run one request under this backend's circuit breaker and
+        concurrency limiter. Yields the outcome and the HTTP timeout to
+        use - the remaining time once the slot is acquired, if `deadline`
+        is closer than the configured timeout. The body sets `outcome.ok`
+        once the backend answered with a status that isn't a backend
+        failure.
+
+        A timeout only counts as caused by the deadline when the deadline
+        cut the attempt short - it got less time than this backend usually
+        needs (typical_latency_s()). That says nothing about the backend:
+        it raises AIDeadlineExceededError and leaves the breaker and the
+        limiter alone. Any other timeout is a backend failure, so a hung
+        backend still opens the circuit even though every request is
+        deadline-bound (message_budget_s < timeout_s).
+        """
+        self.breaker.before_request()
+
+        self.outstanding += 1
+        started = time.monotonic()
+        ok = False
+        try:
+            async with self.limiter.slot() as outcome:
+                try:
+                    timeout_s, deadline_bound = self.timeout_for(deadline)
+                    yield outcome, timeout_s
+                except httpx.TimeoutException as e:
+                    if deadline_bound and self._cut_short(timeout_s):
+                        outcome.ignored = True
+                        raise AIDeadlineExceededError(
+                            f"[{self.name}] Request cut short by the message deadline"  # noqa: E501
+                        ) from e
+                    raise AIHTTPError(
+                        f"[{self.name}] Timeout after {timeout_s:.1f}s"
+                    ) from e
+                except httpx.HTTPError as e:
+                    raise AIHTTPError(f"[{self.name}] HTTP error: {e!r}") from e
+                except AIDeadlineExceededError:
+                    # No time left once the slot was acquired
+                    outcome.ignored = True
+                    raise
+                finally:
+                    ok = outcome.ok
+        except (asyncio.CancelledError, AIDeadlineExceededError):
+            self.breaker.record_cancelled()
+            raise
+        except BaseException:
+            self._record_outcome(ok, started)
+            raise
+        finally:
+            self.outstanding -= 1
+        self._record_outcome(ok, started)
+
+    def _cut_short(self, timeout_s: float) -> bool:
+        """True if `timeout_s` was less than the backend usually needs."""
+        typical_s = self.typical_latency_s()
+        return typical_s is not None and timeout_s < typical_s
+
+    def _record_outcome(self, ok: bool, started: float) -> None:
+        if ok:
+            self._record_latency(time.monotonic() - started)
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+
+    @staticmethod
+    def is_backend_failure(status_code: int) -> bool:
+        """Statuses that mean the backend is overloaded or down."""
+        return status_code >= 500 or status_code == 429
+
+    def render(
+        self,
+        user_text: str,
+        *,
+        extra: Optional[Dict[str, Any]] = None,
+        max_tokens: Optional[int] = None,
+        stop: Optional[List[str]] = None,
+        stream: bool = False,
+        top_logprobs: int = 0,
+    ) -> RequestParts:
+        return self.adapter.render(
+            self.template,
+            user_text=user_text,
+            extra=extra,
+            max_tokens=max_tokens,
+            stop=stop,
+            stream=stream,
+            top_logprobs=top_logprobs,
+        )
+
+    async def post_json(
+        self,
+        client: httpx.AsyncClient,
+        req: RequestParts,
+        deadline: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """Send a prepared request and return the decoded JSON body."""
+        async with self.guarded(deadline) as (outcome, timeout_s):
+            response = await client.post(
+                req.url,
+                headers=req.headers,
+                json=req.payload,
+                timeout=timeout_s,
+            )
+            outcome.ok = not self.is_backend_failure(response.status_code)
+
+        if response.status_code >= 400:
+            body = (response.text or "")[:2000]
+            raise AIHTTPError(
+                f"[{self.name}] HTTP {response.status_code}: {body}",
+                status_code=response.status_code,
+            )
+
+        try:
+            return response.json()
+        except Exception as e:
+            raise AIResponseFormatError("Response is not valid JSON") from e
+
+    async def stream_until(
+        self,
+        client: httpx.AsyncClient,
+        req: RequestParts,
+        is_complete: Callable[[str], bool],
+        deadline: Optional[float] = None,
+    ) -> str:
+        """
+        Stream the response and stop reading as soon as
+        `is_complete(text_so_far)` is true. Closing the stream early drops
+        the connection, so the backend stops generating the rest.
+        """
+        text = ""
+        early = False
+
+        async with self.guarded(deadline) as (outcome, timeout_s):
+            async with client.stream(
+                "POST",
+                req.url,
+                headers=req.headers,
+                json=req.payload,
+                timeout=timeout_s,
+            ) as response:
+                outcome.ok = not self.is_backend_failure(response.status_code)
+                if response.status_code >= 400:
+                    body = (await response.aread()).decode(errors="replace")
+                    raise AIHTTPError(
+                        f"[{self.name}] HTTP {response.status_code}: {body[:2000]}",  # noqa: E501
+                        status_code=response.status_code,
+                    )
+
+                async for line in response.aiter_lines():
+                    delta, done = self.adapter.parse_stream_line(line)
+                    text += delta
+                    if done:
+                        break
+                    if delta and is_complete(text):
+                        early = True
+                        break
+
+        if early:
+            log.debug(
+                "AI stream closed early after %d chars (backend=%s)",
+                len(text),
+                self.name,
+            )
+
+        if not text.strip():
+            raise AIResponseFormatError("Empty model output")
+
+        return text
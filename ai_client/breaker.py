@@ -0,0 +1,121 @@
+"""
+Circuit breaker for the AI backend
+"""
+
+import time
+from enum import Enum
+from typing import Callable, Optional
+
+from logger import get_logger
+from .models import AICircuitOpenError
+
+log = get_logger(__name__)
+
+
+class CircuitState(str, Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Classic three-state circuit breaker.
+
+    - CLOSED: requests pass; `failure_threshold` consecutive failures open it.
+    - OPEN: requests are rejected immediately with AICircuitOpenError
+      until `reset_timeout_s` has passed.
+    - HALF_OPEN: a single probe request is let through; its success closes
+      the circuit, its failure opens it again.
+
+    failure_threshold=0 disables the breaker.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout_s: float = 30.0,
+        name: str = "ai",
+        on_state_change: Optional[Callable[[CircuitState], None]] = None,
+    ) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_s = reset_timeout_s
+        self.name = name
+
+        self._state = CircuitState.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._on_state_change = on_state_change
+
+    @property
+    def state(self) -> CircuitState:
+        return self._state
+
+    @property
+    def enabled(self) -> bool:
+        return self.failure_threshold > 0
+
+    def is_open(self) -> bool:
+        """True if a request made now would be rejected (no side effects)."""
+        if not self.enabled or self._state is CircuitState.CLOSED:
+            return False
+        if self._state is CircuitState.OPEN:
+            return time.monotonic() - self._opened_at < self.reset_timeout_s
+        return self._probe_in_flight
+
+    def before_request(self) -> None:
+        """Raise AICircuitOpenError if the request must not be sent."""
+        if not self.enabled or self._state is CircuitState.CLOSED:
+            return
+
+        if self._state is CircuitState.OPEN:
+            remaining = self.reset_timeout_s - (time.monotonic() - self._opened_at)  # noqa: E501
+            if remaining > 0:
+                raise AICircuitOpenError(
+                    f"AI circuit '{self.name}' is open, retry in {remaining:.0f}s"  # noqa: E501
+                )
+            self._transition(CircuitState.HALF_OPEN)
+
+        if self._probe_in_flight:
+            raise AICircuitOpenError(
+                f"AI circuit '{self.name}' is half-open, probe in flight"
+            )
+        self._probe_in_flight = True
+
+    def record_success(self) -> None:
+        self._failures = 0
+        self._probe_in_flight = False
+        if self._state is not CircuitState.CLOSED:
+            self._transition(CircuitState.CLOSED)
+
+    def record_cancelled(self) -> None:
+        """The request was abandoned by the caller - free the probe slot."""
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        if not self.enabled:
+            return
+
+        self._probe_in_flight = False
+        self._failures += 1
+
+        if self._state is CircuitState.HALF_OPEN or (
+            self._state is CircuitState.CLOSED
+            and self._failures >= self.failure_threshold
+        ):
+            self._opened_at = time.monotonic()
+            self._transition(CircuitState.OPEN)
+
+    def _transition(self, state: CircuitState) -> None:
+        old = self._state
+        self._state = state
+        log.warning(
+            "AI circuit '%s' state: %s -> %s (failures=%s)",
+            self.name,
+            old.value,
+            state.value,
+            self._failures,
+        )
+        if self._on_state_change is not None:
+            self._on_state_change(state)
@@ -0,0 +1,147 @@
+"""
+Adaptive (AIMD) concurrency limiter
+"""
+
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Optional
+
+from logger import get_logger
+
+log = get_logger(__name__)
+
+
+class RequestOutcome:
+    """
+    Mutable outcome of a request running under the limiter.
+    `ignored` requests (e.g. cut short by the caller's deadline) say
+    nothing about the backend and don't adjust the limit.
+    """
+
+    __slots__ = ("ok", "ignored")
+
+    def __init__(self) -> None:
+        self.ok = False
+        self.ignored = False
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Concurrency limiter with an AIMD-adjusted limit.
+
+    - Additive increase: every fast successful request grows the limit
+      by 1/limit (about +1 per "round" of requests).
+    - Multiplicative decrease: an error or a request slower than
+      `latency_target_s` shrinks the limit by `backoff`, at most once
+      per `latency_target_s` so a burst of failures doesn't collapse it.
+
+    With min_limit == max_limit it behaves like a plain semaphore.
+    """
+
+    def __init__(
+        self,
+        initial: int,
+        min_limit: int = 1,
+        max_limit: int = 20,
+        latency_target_s: float = 10.0,
+        backoff: float = 0.7,
+        on_limit_change: Optional[Callable[[int], None]] = None,
+    ) -> None:
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.latency_target_s = latency_target_s
+        self.backoff = backoff
+
+        self._limit = float(min(max(initial, self.min_limit), self.max_limit))
+        self._in_flight = 0
+        self._waiters: deque[asyncio.Future[None]] = deque()
+        self._last_decrease = 0.0
+        self._on_limit_change = on_limit_change
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[RequestOutcome]:
+        """
+        Hold a concurrency slot for one request. Set `outcome.ok = True`
+        when the request succeeded; latency is measured automatically.
+        """
+        await self._acquire()
+        outcome = RequestOutcome()
+        started = time.monotonic()
+        cancelled = False
+        try:
+            yield outcome
+        except asyncio.CancelledError:
+            # Cancelled by the caller (e.g. first-hit cancellation) - says
+            # nothing about the backend, so the limit is left as is
+            cancelled = True
+            raise
+        finally:
+            if not cancelled and not outcome.ignored:
+                self._on_result(time.monotonic() - started, outcome.ok)
+            self._release()
+
+    async def _acquire(self) -> None:
+        if self._in_flight < self.limit and not self._waiters:
+            self._in_flight += 1
+            return
+
+        fut: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                # Slot was handed over right before cancellation - give it back
+                self._release()
+            elif fut in self._waiters:
+                self._waiters.remove(fut)
+            raise
+
+    def _release(self) -> None:
+        self._in_flight -= 1
+        self._wake_waiters()
+
+    def _wake_waiters(self) -> None:
+        while self._waiters and self._in_flight < self.limit:
+            fut = self._waiters.popleft()
+            if fut.done():
+                continue
+            self._in_flight += 1
+            fut.set_result(None)
+
+    def _on_result(self, latency_s: float, ok: bool) -> None:
+        old = self.limit
+
+        if ok and latency_s <= self.latency_target_s:
+            self._limit = min(self.max_limit, self._limit + 1.0 / self._limit)
+        else:
+            now = time.monotonic()
+            if now - self._last_decrease >= self.latency_target_s:
+                self._last_decrease = now
+                self._limit = max(self.min_limit, self._limit * self.backoff)
+
+        if self.limit != old:
+            log.info(
+                "AI concurrency limit changed: %s -> %s (latency=%.2fs ok=%s)",
+                old,
+                self.limit,
+                latency_s,
+                ok,
+            )
+            if self._on_limit_change is not None:
+                self._on_limit_change(self.limit)
+            self._wake_waiters()
@@ -6,9 +6,19 @@ __all__ = [
     "AIServiceError",
     "AIHTTPError",
     "AIResponseFormatError",
+    "AILogprobsUnsupportedError",
+    "AICircuitOpenError",
+    "AIDeadlineExceededError",
     "RequestParts",
 ]
 
 
-from .errors import AIServiceError, AIHTTPError, AIResponseFormatError
+from .errors import (
+    AIServiceError,
+    AIHTTPError,
+    AIResponseFormatError,
+    AILogprobsUnsupportedError,
+    AICircuitOpenError,
+    AIDeadlineExceededError,
+)
 from .request_parts import RequestParts
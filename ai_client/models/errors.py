@@ -2,6 +2,8 @@
 AI Service Errors
 """
 
+from typing import Optional
+
 
 class AIServiceError(RuntimeError):
     """Base AI service error."""
@@ -12,10 +14,40 @@ class AIServiceError(RuntimeError):
 class AIHTTPError(AIServiceError):
     """Raised when HTTP errors occur during AI service requests."""
 
-    pass
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        # None for network errors and timeouts
+        self.status_code = status_code
+
+    @property
+    def is_client_error(self) -> bool:
+        """4xx other than 429 - the request itself was rejected."""
+        code = self.status_code
+        return code is not None and 400 <= code < 500 and code != 429
 
 
 class AIResponseFormatError(AIServiceError):
     """Raised when the AI response format is invalid."""
 
     pass
+
+
+class AILogprobsUnsupportedError(AIResponseFormatError):
+    """
+    Raised when a backend doesn't return logprobs; other backends may, so
+    the request fails over to them.
+    """
+
+    pass
+
+
+class AICircuitOpenError(AIServiceError):
+    """Raised when the circuit breaker rejects a request without sending it."""
+
+    pass
+
+
+class AIDeadlineExceededError(AIServiceError):
+    """Raised when a request can't finish within the caller's deadline."""
+
+    pass
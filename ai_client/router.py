@@ -0,0 +1,49 @@
+"""
+Backend selection for multi-backend AI routing
+"""
+
+from typing import Collection, List, Literal, Optional
+
+from .backend import AIBackend
+
+RoutingStrategy = Literal["least_outstanding", "ewma"]
+
+
+class BackendRouter:
+    """
+    Picks the backend for the next request among the ones whose circuit
+    isn't open.
+
+    - least_outstanding: fewest in-flight requests relative to the
+      backend's concurrency limit; ties go to the lower EWMA latency.
+    - ewma: lowest smoothed latency multiplied by (outstanding + 1), so a
+      fast backend stops winning once it queues up. Backends without
+      samples yet are tried first.
+    """
+
+    def __init__(
+        self,
+        backends: List[AIBackend],
+        strategy: RoutingStrategy = "least_outstanding",
+    ) -> None:
+        self.backends = backends
+        self.strategy = strategy
+
+    def pick(
+        self, exclude: Collection[AIBackend] = ()
+    ) -> Optional[AIBackend]:
+        """Best available backend not in `exclude`, None if there is none."""
+        candidates = [
+            b for b in self.backends if b not in exclude and b.available
+        ]
+        if not candidates:
+            return None
+        return min(candidates, key=self._cost)
+
+    def _cost(self, backend: AIBackend) -> tuple[float, float]:
+        ewma = backend.ewma_latency_s
+        if self.strategy == "ewma":
+            if ewma is None:
+                return (0.0, backend.load())
+            return (ewma * (backend.outstanding + 1), backend.load())
+        return (backend.load(), ewma if ewma is not None else 0.0)
@@ -1,27 +1,58 @@
 import asyncio
-from typing import Any, Dict, Optional
+import hashlib
+import time
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    TypeVar,
+)
 
 import httpx
+import orjson
 
 from config import config
+from config.ai_client import AIBackendConfig
 from logger import get_logger
 from app.monitoring import system_monitor
-from .adapters import OpenAIChatCompletionsAdapter, OllamaChatAdapter
-from .models import AIHTTPError, AIResponseFormatError
-from .utils import looks_like_ollama
+from utils import SingleFlight
+from .backend import AIBackend
+from .breaker import CircuitState
+from .models import (
+    AICircuitOpenError,
+    AIDeadlineExceededError,
+    AIHTTPError,
+    AILogprobsUnsupportedError,
+    AIResponseFormatError,
+)
+from .router import BackendRouter
 
 log = get_logger(__name__)
 
+T = TypeVar("T")
+
 
 class AIService:
     """
-    Single-request AI service. Provider inferred from base_url.
+    Single-request AI service over one or more backends. Providers, final
+    URLs, headers and the static payload skeleton are resolved once at
+    construction; config changes take effect with a new service (restart).
 
     - Ollama: base_url contains 11434 or ollama or /api/chat
     - Otherwise: OpenAI-compatible /v1/chat/completions
+
+    With several backends every request goes to the backend picked by
+    the router; optionally a hedged duplicate is sent to a second backend
+    when the first one is slower than its p95, and failed requests are
+    retried on the next backend.
     """
 
-    def __init__(self) -> None:
+    def __init__(
+        self, backends: Optional[List[AIBackendConfig]] = None
+    ) -> None:
         log.info(
             "AI service config: %s",
             {
@@ -30,11 +61,12 @@ class AIService:
                 "max_connections": config.ai.http.max_connections,
                 "max_keepalive_connections": config.ai.http.max_keepalive_connections,  # noqa: E501
                 "keepalive_expiry_s": config.ai.http.keepalive_expiry_s,
+                "adaptive_concurrency": config.ai.http.adaptive_concurrency,
+                "breaker_failure_threshold": config.ai.http.breaker_failure_threshold,  # noqa: E501
+                "routing": config.ai.routing.model_dump(),
             },
         )
 
-        self._sem = asyncio.Semaphore(config.ai.http.concurrency)
-
         limits = httpx.Limits(
             max_connections=config.ai.http.max_connections,
             max_keepalive_connections=config.ai.http.max_keepalive_connections,
@@ -45,60 +77,375 @@ class AIService:
             timeout=config.ai.http.timeout_s, limits=limits
         )
 
-        self._openai = OpenAIChatCompletionsAdapter()
-        self._ollama = OllamaChatAdapter()
+        # Identical concurrent requests (e.g. a copy-paste raid) share
+        # one backend call
+        self._flights: SingleFlight[str, Any] = SingleFlight(
+            on_shared=system_monitor.increment_ai_requests_coalesced
+        )
+        # Shared calls whose callers all ran out of time, kept referenced
+        # until they finish
+        self._abandoned: set[asyncio.Future[Any]] = set()
+
+        # Provider, final URL, headers and the static payload skeleton are
+        # resolved here once, so a request only assembles its payload
+        configs = backends or config.ai.resolved_backends()
+        if not configs:
+            raise ValueError("No AI backend configured")
+
+        self._backends: List[AIBackend] = [
+            AIBackend(cfg, on_change=self._publish_state) for cfg in configs
+        ]
+        self._router = BackendRouter(
+            self._backends, strategy=config.ai.routing.strategy
+        )
+        self._publish_state()
+
+        for backend in self._backends:
+            log.info(
+                "AI backend resolved: name=%s adapter=%s url=%s model=%s",
+                backend.name,
+                type(backend.adapter).__name__,
+                backend.template.url,
+                backend.model,
+            )
 
     async def close(self) -> None:
         """Close the HTTP client connection."""
         await self._client.aclose()
 
+    @property
+    def backends(self) -> List[AIBackend]:
+        return list(self._backends)
+
+    @property
+    def logprobs_supported(self) -> bool:
+        """False once no backend is left that returns logprobs."""
+        return any(b.logprobs_supported for b in self._backends)
+
+    @property
+    def circuit_open(self) -> bool:
+        """True while requests are rejected on every backend."""
+        return not any(b.available for b in self._backends)
+
+    def _publish_state(self) -> None:
+        """Aggregate circuit state and concurrency limit for monitoring."""
+        states = [b.circuit_state for b in self._backends]
+        if all(s is CircuitState.CLOSED for s in states):
+            state = CircuitState.CLOSED.value
+        elif len(states) == 1:
+            state = states[0].value
+        else:
+            not_closed = sum(s is not CircuitState.CLOSED for s in states)
+            state = f"degraded ({not_closed}/{len(states)} not closed)"
+
+        if state != system_monitor.ai_circuit_state:
+            system_monitor.set_ai_circuit_state(state)
+        system_monitor.set_ai_concurrency_limit(
+            sum(b.limiter.limit for b in self._backends)
+        )
+
+    async def _coalesced(
+        self,
+        key_parts: List[Any],
+        op: Callable[[AIBackend, Optional[float]], Awaitable[T]],
+        deadline: Optional[float] = None,
+    ) -> T:
+        """
+        Run `op` via _call(), sharing it with identical in-flight calls.
+
+        A shared call isn't bound to any one caller's deadline - it runs
+        with the full HTTP timeout, and every caller waits for it only
+        until its own `deadline`. A caller giving up on its deadline
+        leaves the call running for the others (and for the breaker,
+        which learns from its outcome); a cancelled caller doesn't.
+        """
+        if deadline is not None and deadline <= time.monotonic():
+            raise AIDeadlineExceededError("Message deadline already passed")
+
+        if not config.ai.coalesce_requests:
+            call = self._call(op, deadline)
+            if deadline is None:
+                return await call
+            return await self._within_deadline(call, deadline)
+
+        if deadline is not None:
+            backend = self._router.pick()
+            if backend is not None:
+                self._check_budget(backend, deadline)
+
+        key = hashlib.sha256(
+            orjson.dumps(key_parts, option=orjson.OPT_SORT_KEYS)
+        ).hexdigest()
+        shared = self._flights.do(key, lambda: self._call(op, None))
+        if deadline is None:
+            return await shared
+
+        waiter = asyncio.ensure_future(shared)
+        try:
+            return await self._within_deadline(asyncio.shield(waiter), deadline)  # noqa: E501
+        except AIDeadlineExceededError:
+            self._abandoned.add(waiter)
+            waiter.add_done_callback(self._forget_abandoned)
+            raise
+        except asyncio.CancelledError:
+            waiter.cancel()
+            raise
+
+    def _forget_abandoned(self, waiter: "asyncio.Future[Any]") -> None:
+        self._abandoned.discard(waiter)
+        if not waiter.cancelled():
+            # Nobody awaits it anymore; the backend already saw the outcome
+            waiter.exception()
+
+    @staticmethod
+    async def _within_deadline(call: Awaitable[T], deadline: float) -> T:
+        try:
+            return await asyncio.wait_for(call, deadline - time.monotonic())
+        except TimeoutError as e:
+            raise AIDeadlineExceededError(
+                "AI request didn't finish before the message deadline"
+            ) from e
+
+    async def _call(
+        self,
+        op: Callable[[AIBackend, Optional[float]], Awaitable[T]],
+        deadline: Optional[float] = None,
+    ) -> T:
+        """
+        Run `op` on the best backend, hedging and failing over to the
+        other backends according to config.ai.routing. A request isn't
+        sent if the backend's typical latency doesn't fit before
+        `deadline`.
+        """
+        routing = config.ai.routing
+        tried: List[AIBackend] = []
+        last_error: Optional[Exception] = None
+
+        while True:
+            backend = self._router.pick(exclude=tried)
+            if backend is None:
+                if last_error is not None:
+                    raise last_error
+                system_monitor.increment_ai_circuit_rejections()
+                raise AICircuitOpenError("AI circuit is open on all backends")  # noqa: E501
+
+            if deadline is not None:
+                self._check_budget(backend, deadline)
+
+            tried.append(backend)
+            try:
+                if routing.hedge_enabled:
+                    result = await self._hedged(op, backend, tried, deadline)
+                else:
+                    result = await op(backend, deadline)
+            except AILogprobsUnsupportedError as e:
+                # Not a failure of the backend - try one that supports
+                # the request, whatever the failover setting
+                last_error = e
+                continue
+            except (AIHTTPError, AICircuitOpenError) as e:
+                if isinstance(e, AICircuitOpenError):
+                    system_monitor.increment_ai_circuit_rejections()
+                if not routing.failover:
+                    raise
+                last_error = e
+                if self._router.pick(exclude=tried) is not None:
+                    system_monitor.increment_ai_failovers()
+                    log.warning(
+                        "AI backend %s failed, failing over: %s",
+                        backend.name,
+                        e,
+                    )
+                continue
+
+            system_monitor.increment_ai_requests_count()
+            return result
+
+    @staticmethod
+    def _check_budget(backend: AIBackend, deadline: float) -> None:
+        remaining = deadline - time.monotonic()
+        expected = backend.ewma_latency_s or 0.0
+        if remaining <= 0 or expected > remaining:
+            raise AIDeadlineExceededError(
+                f"Not enough time left for an AI request: remaining={remaining:.2f}s "  # noqa: E501
+                f"expected={expected:.2f}s backend={backend.name}"
+            )
+
+    async def _hedged(
+        self,
+        op: Callable[[AIBackend, Optional[float]], Awaitable[T]],
+        primary: AIBackend,
+        tried: List[AIBackend],
+        deadline: Optional[float] = None,
+    ) -> T:
+        """
+        Run `op` on `primary`; if it hasn't answered within its p95, send
+        the same request to another backend and take the first success.
+        """
+        delay_s = primary.hedge_delay_s(
+            config.ai.routing.hedge_default_ms / 1000
+        )
+        pending = {asyncio.create_task(op(primary, deadline))}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=delay_s)
+            if not done:
+                hedge = self._router.pick(exclude=tried)
+                if hedge is not None:
+                    tried.append(hedge)
+                    system_monitor.increment_ai_hedged_requests()
+                    log.debug(
+                        "AI request slower than %.2fs on %s, hedging to %s",
+                        delay_s,
+                        primary.name,
+                        hedge.name,
+                    )
+                    pending.add(asyncio.create_task(op(hedge, deadline)))
+
+            error: Optional[BaseException] = None
+            while True:
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = error or task.exception()
+                if not pending:
+                    assert error is not None
+                    raise error
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
     async def one_shot(
-        self, user_text: str, *, extra: Optional[Dict[str, Any]] = None
+        self,
+        user_text: str,
+        *,
+        extra: Optional[Dict[str, Any]] = None,
+        max_tokens: Optional[int] = None,
+        stop: Optional[List[str]] = None,
+        deadline: Optional[float] = None,
     ) -> str:
-        """Send a single request to the AI service and return the response."""
-        base_url = config.ai.base_url
-        model = config.ai.model
-        api_key = config.ai.api_key
-
-        if looks_like_ollama(base_url):
-            req = self._ollama.build(
-                base_url=base_url,
-                model=model,
-                user_text=user_text,
-                extra=extra,
-            )
-        else:
-            req = self._openai.build(
-                base_url=base_url,
-                api_key=api_key,
-                model=model,
-                user_text=user_text,
-                extra=extra,
+        """
+        Send a single request to the AI service and return the response.
+
+        max_tokens / stop cap the generated output (mapped to the
+        provider-specific fields by the adapter). `deadline`
+        (time.monotonic() based) bounds the whole call; raises
+        AIDeadlineExceededError when it can't be met.
+        """
+
+        async def op(backend: AIBackend, deadline: Optional[float]) -> str:
+            req = backend.render(
+                user_text, extra=extra, max_tokens=max_tokens, stop=stop
             )
+            data = await backend.post_json(self._client, req, deadline)
+            return backend.adapter.parse(data)
 
-        async with self._sem:
-            try:
-                response = await self._client.post(
-                    req.url, headers=req.headers, json=req.payload
+        return await self._coalesced(
+            ["one_shot", user_text, extra, max_tokens, stop], op, deadline
+        )
+
+    async def top_logprobs(
+        self,
+        user_text: str,
+        *,
+        extra: Optional[Dict[str, Any]] = None,
+        top: int = 5,
+        deadline: Optional[float] = None,
+    ) -> Dict[str, float]:
+        """
+        Generate a single token and return the `top` candidate tokens for
+        it with their logprobs. A backend that doesn't support logprobs -
+        it rejected the request with a 4xx or answered without them - isn't
+        asked again and the request moves on to the next backend; raises
+        AILogprobsUnsupportedError (an AIResponseFormatError) once none is
+        left.
+        """
+
+        async def op(
+            backend: AIBackend, deadline: Optional[float]
+        ) -> Dict[str, float]:
+            if not backend.logprobs_supported:
+                raise AILogprobsUnsupportedError(
+                    f"[{backend.name}] Backend doesn't support logprobs"
                 )
-            except httpx.TimeoutException as e:
-                raise AIHTTPError(
-                    f"Timeout after {config.ai.http.timeout_s}s"
+            req = backend.render(
+                user_text, extra=extra, max_tokens=1, top_logprobs=top
+            )
+            try:
+                data = await backend.post_json(self._client, req, deadline)
+                return backend.adapter.parse_top_logprobs(data)
+            except AIHTTPError as e:
+                if not e.is_client_error:
+                    raise
+                backend.logprobs_supported = False
+                raise AILogprobsUnsupportedError(
+                    f"[{backend.name}] Logprob request rejected: {e}"
+                ) from e
+            except AIResponseFormatError as e:
+                backend.logprobs_supported = False
+                raise AILogprobsUnsupportedError(
+                    f"[{backend.name}] No logprobs in the response: {e}"
                 ) from e
-            except httpx.HTTPError as e:
-                raise AIHTTPError(f"HTTP error: {e!r}") from e
 
-        if response.status_code >= 400:
-            body = (response.text or "")[:2000]
-            raise AIHTTPError(f"HTTP {response.status_code}: {body}")
+        return await self._coalesced(
+            ["top_logprobs", user_text, extra, top], op, deadline
+        )
 
-        system_monitor.increment_ai_requests_count()
+    async def stream_until(
+        self,
+        user_text: str,
+        is_complete: Callable[[str], bool],
+        *,
+        extra: Optional[Dict[str, Any]] = None,
+        max_tokens: Optional[int] = None,
+        stop: Optional[List[str]] = None,
+        deadline: Optional[float] = None,
+    ) -> str:
+        """
+        Stream the response and stop reading as soon as
+        `is_complete(text_so_far)` is true. Closing the stream early drops
+        the connection, so the backend stops generating the rest. Only
+        calls with the same predicate are coalesced.
+        """
 
-        try:
-            data = response.json()
-        except Exception as e:
-            raise AIResponseFormatError("Response is not valid JSON") from e
+        async def op(backend: AIBackend, deadline: Optional[float]) -> str:
+            req = backend.render(
+                user_text,
+                extra=extra,
+                max_tokens=max_tokens,
+                stop=stop,
+                stream=True,
+            )
+            return await backend.stream_until(
+                self._client, req, is_complete, deadline
+            )
+
+        return await self._coalesced(
+            [
+                "stream_until",
+                self._predicate_key(is_complete),
+                user_text,
+                extra,
+                max_tokens,
+                stop,
+            ],
+            op,
+            deadline,
+        )
 
-        if looks_like_ollama(base_url):
-            return self._ollama.parse(data)
-        return self._openai.parse(data)
+    @staticmethod
+    def _predicate_key(fn: Callable[..., Any]) -> List[int]:
+        """
+        Identity of a callable for the coalescing key. Bound methods are
+        new objects on every access, so they're identified by function and
+        instance. The in-flight call holds the predicate, so the ids can't
+        be reused by another object while the key is in use.
+        """
+        return [
+            id(getattr(fn, "__func__", fn)),
+            id(getattr(fn, "__self__", None)),
+        ]
@@ -0,0 +1,37 @@
+"""add spammer reputations
+
+Revision ID: 5e2a9c7d3f10
+Revises: 1c81ab447ab3
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '5e2a9c7d3f10'
+down_revision: Union[str, Sequence[str], None] = '1c81ab447ab3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('spammer_reputations',
+    sa.Column('telegram_user_id', sa.BigInteger(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.Column('hits', sa.Integer(), nullable=False),
+    sa.Column('last_hit_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.PrimaryKeyConstraint('id', name=op.f('pk_spammer_reputations')),
+    sqlite_autoincrement=True
+    )
+    op.create_index(op.f('ix_spammer_reputations_telegram_user_id'), 'spammer_reputations', ['telegram_user_id'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_spammer_reputations_telegram_user_id'), table_name='spammer_reputations')
+    op.drop_table('spammer_reputations')
@@ -1,14 +1,26 @@
+import asyncio
+import time
 from dataclasses import dataclass
-from typing import Optional
+from typing import Awaitable, Optional, TypeVar
 
-from app.antispam.scoring import AIScorer
+from ai_client.models import (
+    AIDeadlineExceededError,
+    AIResponseFormatError,
+    AIServiceError,
+)
+from app.antispam.scoring import AIBatchScorer, AIScorer
 from app.antispam.dto import MessageTask
+from app.metrics import AI_REQUEST_SECONDS
+from app.monitoring import system_monitor
+from app.tracing import tracer
 from config import config
 from logger import get_logger
 from prompts import PROMPTS
 
 log = get_logger(__name__)
 
+T = TypeVar("T")
+
 
 @dataclass(frozen=True)
 class ModerationHit:
@@ -23,13 +35,58 @@ class ModerationHit:
     score: float
 
 
+class _ScoringTier:
+    """One AI service of the cascade with its own per-backend state."""
+
+    def __init__(self, name: str, ai_service) -> None:
+        self.name = name
+        self.ai_service = ai_service
+        # Switched off for good once the backend turns out not to return
+        # logprobs, so it isn't asked again for every message
+        self.logprobs_supported = True
+
+        # Shared by all workers using this moderator, so concurrent
+        # messages can end up in the same batch
+        self.batch_scorer: Optional[AIBatchScorer] = None
+        if config.ai.batch.enabled and ai_service is not None:
+            self.batch_scorer = AIBatchScorer(
+                ai_service,
+                max_size=config.ai.batch.max_size,
+                max_wait_ms=config.ai.batch.max_wait_ms,
+            )
+
+
 class AIModerator:
     """
     Handles AI-based spam moderation logic.
+
+    With a `small_ai_service` every prompt is scored by the small model
+    first; only scores within config.ai.cascade.uncertainty_band of the
+    threshold (or unparseable / failed ones) are escalated to the main
+    model.
     """
 
-    def __init__(self, ai_service=None):
+    def __init__(self, ai_service=None, small_ai_service=None):
         self.ai_service = ai_service
+        self._large = _ScoringTier("large", ai_service)
+        self._small: Optional[_ScoringTier] = None
+        if small_ai_service is not None:
+            self._small = _ScoringTier("small", small_ai_service)
+
+    async def close(self) -> None:
+        """Score the messages still waiting for their batch."""
+        for tier in (self._large, self._small):
+            if tier is not None and tier.batch_scorer is not None:
+                await tier.batch_scorer.close()
+
+    @staticmethod
+    def _is_uncertain(score: Optional[float]) -> bool:
+        """True if a small-model score is too close to call."""
+        if score is None:
+            return True
+        threshold = config.ai.spam_threshold
+        band = config.ai.cascade.uncertainty_band
+        return threshold - band <= score < threshold + band
 
     @staticmethod
     def _normalize_task_text(task: MessageTask) -> Optional[str]:
@@ -50,44 +107,304 @@ class AIModerator:
         self, task: MessageTask
     ) -> Optional[ModerationHit]:
         """
-        Run prompts sequentially. If ANY score >= threshold ->
-        return hit immediately. If message has no text ->
+        Run prompts according to config.ai.prompt_mode. If ANY score >=
+        threshold -> return hit immediately. If message has no text ->
         return None (treat as not spam by AI).
         """
         msg = self._normalize_task_text(task)
         if msg is None:
             return None
 
-        threshold = config.ai.spam_threshold
-
         ai_scorer = AIScorer(self.ai_service)
 
+        if config.ai.prompt_mode == "parallel":
+            return await self._first_hit_parallel(ai_scorer, task, msg)
+        if config.ai.prompt_mode == "combined":
+            return await self._first_hit_combined(ai_scorer, task, msg)
+        return await self._first_hit_sequential(ai_scorer, task, msg)
+
+    async def _first_hit_sequential(
+        self, ai_scorer: AIScorer, task: MessageTask, msg: str
+    ) -> Optional[ModerationHit]:
+        """Run prompts one by one, stop on the first hit."""
+        threshold = config.ai.spam_threshold
+
         for i in range(len(PROMPTS)):
-            ai_prompt = PROMPTS.build_moderation_prompt(msg, i)
+            score = await self._score_prompt(ai_scorer, task, msg, i)
+            if score is not None and score >= threshold:
+                return ModerationHit(prompt_index=i, score=score)
 
-            ai_response = await ai_scorer.get_score(ai_prompt, self.ai_service)
-            score = ai_scorer.extract_score(ai_response)
+        return None
 
-            if score is None:
+    async def _first_hit_parallel(
+        self, ai_scorer: AIScorer, task: MessageTask, msg: str
+    ) -> Optional[ModerationHit]:
+        """
+        Fire all prompts at once (bounded by the AIService semaphore) and
+        cancel the remaining ones as soon as one score crosses the threshold.
+
+        A hit always wins over errors of other prompts. If there is no hit
+        but some prompt failed, the first error is re-raised so the caller
+        keeps the same fail-permissive behaviour as in sequential mode.
+        """
+        threshold = config.ai.spam_threshold
+
+        pending: dict[asyncio.Task[Optional[float]], int] = {
+            asyncio.create_task(
+                self._score_prompt(ai_scorer, task, msg, i),
+                name=f"ai-prompt-{i}",
+            ): i
+            for i in range(len(PROMPTS))
+        }
+        first_error: Optional[BaseException] = None
+
+        try:
+            while pending:
+                done, _ = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for t in sorted(done, key=lambda d: pending[d]):
+                    i = pending.pop(t)
+                    try:
+                        score = t.result()
+                    except Exception as e:
+                        if first_error is None:
+                            first_error = e
+                        continue
+
+                    if score is not None and score >= threshold:
+                        return ModerationHit(prompt_index=i, score=score)
+        finally:
+            for t in pending:
+                t.cancel()
+            if pending:
+                log.debug(
+                    "Cancelled %d pending AI prompts: chat_id=%s msg_id=%s",
+                    len(pending),
+                    task.telegram_chat_id,
+                    task.telegram_message_id,
+                )
+                await asyncio.gather(*pending, return_exceptions=True)
+
+        if first_error is not None:
+            raise first_error
+        return None
+
+    async def _first_hit_combined(
+        self, ai_scorer: AIScorer, task: MessageTask, msg: str
+    ) -> Optional[ModerationHit]:
+        """
+        Score all policies with a single request. Falls back to per-prompt
+        sequential calls if the combined output can't be parsed.
+        """
+        threshold = config.ai.spam_threshold
+        ai_prompt = PROMPTS.build_combined_prompt(msg)
+
+        scores: Optional[list[float]] = None
+        if self._small is not None:
+            scores = await self._combined_small(ai_scorer, task, ai_prompt)
+            if scores is not None:
+                return self._first_hit(scores)
+
+        with (
+            AI_REQUEST_SECONDS.time(prompt="combined", tier=self._large.name),  # noqa: E501
+            tracer.span("ai.combined", tier=self._large.name),
+        ):
+            ai_response = await ai_scorer.get_score(
+                ai_prompt,
+                self.ai_service,
+                scores=len(PROMPTS),
+                deadline=task.deadline,
+            )
+        scores = ai_scorer.extract_scores(ai_response, len(PROMPTS))
+
+        if scores is None:
+            log.warning(
+                "AI combined output not parseable; falling back to per-prompt calls. chat_id=%s msg_id=%s",  # noqa: E501
+                task.telegram_chat_id,
+                task.telegram_message_id,
+            )
+            return await self._first_hit_sequential(ai_scorer, task, msg)
+
+        log.debug(
+            "AI combined scores: chat_id=%s msg_id=%s scores=%s threshold=%.3f",
+            task.telegram_chat_id,
+            task.telegram_message_id,
+            scores,
+            threshold,
+        )
+        return self._first_hit(scores)
+
+    @staticmethod
+    def _first_hit(scores: list[float]) -> Optional[ModerationHit]:
+        threshold = config.ai.spam_threshold
+        for i, score in enumerate(scores):
+            if score >= threshold:
+                return ModerationHit(prompt_index=i, score=score)
+        return None
+
+    async def _combined_small(
+        self, ai_scorer: AIScorer, task: MessageTask, ai_prompt: str
+    ) -> Optional[list[float]]:
+        """
+        Combined request on the small model. Returns its scores when they
+        settle the message: any confident hit, or all confidently clean.
+        None -> escalate the whole request to the main model.
+        """
+        assert self._small is not None
+        try:
+            with (
+                AI_REQUEST_SECONDS.time(prompt="combined", tier=self._small.name),  # noqa: E501
+                tracer.span("ai.combined", tier=self._small.name),
+            ):
+                ai_response = await ai_scorer.get_score(
+                    ai_prompt,
+                    self._small.ai_service,
+                    scores=len(PROMPTS),
+                    deadline=task.deadline,
+                )
+        except AIDeadlineExceededError:
+            raise
+        except AIServiceError as e:
+            log.warning("Small AI model failed, escalating: %s", e)
+            system_monitor.record_ai_cascade(escalated=True)
+            return None
+
+        scores = ai_scorer.extract_scores(ai_response, len(PROMPTS))
+        threshold = config.ai.spam_threshold
+        band = config.ai.cascade.uncertainty_band
+        decided = scores is not None and (
+            any(s >= threshold + band for s in scores)
+            or not any(self._is_uncertain(s) for s in scores)
+        )
+        system_monitor.record_ai_cascade(escalated=not decided)
+        return scores if decided else None
+
+    async def _score_prompt(
+        self, ai_scorer: AIScorer, task: MessageTask, msg: str, i: int
+    ) -> Optional[float]:
+        """
+        Score the message with a single prompt, going through the cascade
+        if there is a small model. None if not parseable.
+        """
+        if self._small is not None:
+            try:
+                score = await self._score_on_tier(
+                    self._small, ai_scorer, task, msg, i
+                )
+            except AIDeadlineExceededError:
+                raise
+            except AIServiceError as e:
                 log.warning(
-                    "AI output not parseable; continue next prompt. chat_id=%s msg_id=%s prompt=%s raw=%r",
+                    "Small AI model failed, escalating: chat_id=%s msg_id=%s prompt=%s error=%s",  # noqa: E501
                     task.telegram_chat_id,
                     task.telegram_message_id,
                     i,
-                    str(ai_response)[:200] if ai_response else "None",
+                    e,
                 )
-                continue
+                score = None
+
+            escalate = self._is_uncertain(score)
+            system_monitor.record_ai_cascade(escalated=escalate)
+            if not escalate:
+                return score
+
+        return await self._score_on_tier(self._large, ai_scorer, task, msg, i)
+
+    async def _score_on_tier(
+        self,
+        tier: _ScoringTier,
+        ai_scorer: AIScorer,
+        task: MessageTask,
+        msg: str,
+        i: int,
+    ) -> Optional[float]:
+        """Score the message with a single prompt on one cascade tier."""
+        threshold = config.ai.spam_threshold
+
+        score: Optional[float] = None
+        with (
+            AI_REQUEST_SECONDS.time(prompt=i, tier=tier.name),
+            tracer.span("ai.prompt", prompt=i, tier=tier.name) as span,
+        ):
+            if config.ai.score_mode == "logprob" and tier.logprobs_supported:
+                ai_response = "<logprob>"
+                score = await self._score_logprob(tier, ai_scorer, task, msg, i)  # noqa: E501
 
-            log.debug(
-                "AI score: chat_id=%s msg_id=%s prompt=%s score=%.3f threshold=%.3f",
+            if score is None:
+                if tier.batch_scorer is not None:
+                    ai_response = "<batched>"
+                    score = await self._within_deadline(
+                        tier.batch_scorer.score(msg, i, task.deadline),
+                        task.deadline,
+                    )
+                else:
+                    ai_prompt = PROMPTS.build_moderation_prompt(msg, i)
+                    ai_response = await ai_scorer.get_score(
+                        ai_prompt, tier.ai_service, deadline=task.deadline
+                    )
+                    score = ai_scorer.extract_score(ai_response)
+            span.set_attribute("score", score)
+
+        if score is None:
+            log.warning(
+                "AI output not parseable; continue next prompt. chat_id=%s msg_id=%s prompt=%s tier=%s raw=%r",
                 task.telegram_chat_id,
                 task.telegram_message_id,
                 i,
-                score,
-                threshold,
+                tier.name,
+                str(ai_response)[:200] if ai_response else "None",
             )
+            return None
 
-            if score >= threshold:
-                return ModerationHit(prompt_index=i, score=score)
+        log.debug(
+            "AI score: chat_id=%s msg_id=%s prompt=%s tier=%s score=%.3f threshold=%.3f",
+            task.telegram_chat_id,
+            task.telegram_message_id,
+            i,
+            tier.name,
+            score,
+            threshold,
+        )
+        return score
 
-        return None
+    async def _score_logprob(
+        self,
+        tier: _ScoringTier,
+        ai_scorer: AIScorer,
+        task: MessageTask,
+        msg: str,
+        i: int,
+    ) -> Optional[float]:
+        """
+        Single-token YES/NO scoring. None -> fall back to text scoring.
+        """
+        ai_prompt = PROMPTS.build_yes_no_prompt(msg, i)
+        try:
+            return await ai_scorer.get_spam_probability(
+                ai_prompt, tier.ai_service, deadline=task.deadline
+            )
+        except AIResponseFormatError as e:
+            # The service remembers unsupported backends; stop asking for
+            # logprobs only once none of them is left
+            if not getattr(tier.ai_service, "logprobs_supported", False):
+                tier.logprobs_supported = False
+            log.warning(
+                "AI backend doesn't support logprobs - falling back to text scoring: %s",  # noqa: E501
+                e,
+            )
+            return None
+
+    @staticmethod
+    async def _within_deadline(
+        aw: Awaitable[T], deadline: Optional[float]
+    ) -> T:
+        """Await `aw`, giving up with AIDeadlineExceededError at `deadline`."""
+        if deadline is None:
+            return await aw
+        try:
+            return await asyncio.wait_for(aw, deadline - time.monotonic())
+        except TimeoutError as e:
+            raise AIDeadlineExceededError(
+                "AI batch didn't finish before the message deadline"
+            ) from e
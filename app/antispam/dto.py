@@ -1,5 +1,8 @@
 from dataclasses import dataclass, field
-from typing import Any, Optional
+from typing import TYPE_CHECKING, Any, Optional
+
+if TYPE_CHECKING:
+    from app.tracing import Span
 
 
 @dataclass(frozen=True)
@@ -12,3 +15,15 @@ class MessageTask:
     entities: list[dict[str, Any]] = field(default_factory=list)
 
     chat_title: Optional[str] = None
+
+    # time.monotonic() by which the AI verdict is needed, set on enqueue
+    deadline: Optional[float] = None
+
+    # time.monotonic() at which the update was fetched from Telegram
+    fetched_at: Optional[float] = None
+
+    # time.monotonic() at which the task was put into the anti-spam queue
+    enqueued_at: Optional[float] = None
+
+    # Handler span of a sampled trace; the worker's spans are its children
+    trace: Optional["Span"] = field(default=None, compare=False, repr=False)
@@ -1,15 +1,29 @@
+from typing import Awaitable, Callable, Optional
+
 from aiogram import Bot
-from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.bot.utils import try_delete_message
+from ai_client.models import AICircuitOpenError, AIDeadlineExceededError
+from app.bot.utils import (
+    BulkMessageDeleter,
+    try_delete_message,
+    try_restrict_user,
+)
 from app.antispam.dto import MessageTask
 from app.antispam.detectors.mentions import has_mentions
 from app.antispam.detectors.links import has_links
 from app.antispam.detectors.emojis import has_excessive_emojis
 from app.antispam.ai.moderator import AIModerator
 from app.antispam.ai.notifier import RateLimitedNotifier
-from app.services import get_chat_by_telegram_id, get_or_create_user_state
+from app.metrics import STAGE_SECONDS
+from app.tracing import tracer
+from app.services import (
+    chat_registry,
+    get_or_create_user_state,
+    is_known_spammer,
+    record_spam_hit,
+    trusted_senders,
+)
 from config import config
 from logger import get_logger
 from utils import ensure_utc_timezone, utc_now
@@ -33,6 +47,8 @@ class MessageProcessor:
         cleanup_mentions: bool = True,
         cleanup_links: bool = True,
         cleanup_emojis: bool = True,
+        small_ai_service=None,
+        on_spam: Optional[Callable[[MessageTask], Awaitable[None]]] = None,
     ):
         self.bot = bot
         self.ai_service = ai_service
@@ -40,8 +56,25 @@ class MessageProcessor:
         self.cleanup_mentions = cleanup_mentions
         self.cleanup_links = cleanup_links
         self.cleanup_emojis = cleanup_emojis
-        self._ai_moderator = AIModerator(ai_service)
+        self._ai_moderator = AIModerator(ai_service, small_ai_service)
         self._notifier = RateLimitedNotifier()
+        # Awaited once a message is judged spam (not on rule-based cleanup)
+        self._on_spam = on_spam
+
+        # Shared by all workers, so deletions in the same chat coalesce
+        self._deleter: Optional[BulkMessageDeleter] = None
+        if config.bot.bulk_delete_enabled:
+            self._deleter = BulkMessageDeleter(
+                bot,
+                max_size=config.bot.bulk_delete_max_size,
+                max_wait_ms=config.bot.bulk_delete_max_wait_ms,
+            )
+
+    async def close(self) -> None:
+        """Flush AI scoring and deletions still waiting for their batch."""
+        await self._ai_moderator.close()
+        if self._deleter is not None:
+            await self._deleter.close()
 
     async def process_message(
         self,
@@ -59,56 +92,29 @@ class MessageProcessor:
             True if message is valid (not spam), False if it was deleted
         """
         incoming_title = (task.chat_title or "").strip() or None
-        needs_commit = False
-
-        chat = await get_chat_by_telegram_id(session, task.telegram_chat_id)
 
+        # Usually a cache hit: the handler registered the chat already
+        with STAGE_SECONDS.time(stage="chat_lookup"), tracer.span("chat_lookup"):  # noqa: E501
+            chat = await chat_registry.ensure_chat(
+                session,
+                telegram_chat_id=task.telegram_chat_id,
+                title=incoming_title,
+            )
         if chat is None:
-            from app.db.models.chat import Chat
-
-            try:
-                chat = Chat(
-                    telegram_chat_id=task.telegram_chat_id,
-                    title=incoming_title,
-                    is_active=False,
-                    enable_ai_check=config.bot.ai_enabled,
-                    cleanup_mentions=True,
-                    cleanup_links=True,
-                    cleanup_emojis=False,  # Default to disabled initially
-                )
-                session.add(chat)
-                await session.flush()
-                needs_commit = True
-                log.info(
-                    "Created chat: telegram_chat_id=%s title=%r",
-                    task.telegram_chat_id,
-                    incoming_title,
-                )
-            except IntegrityError:
-                await session.rollback()
-                chat = await get_chat_by_telegram_id(session, task.telegram_chat_id)  # noqa: E501
-                if chat is None:
-                    log.error(
-                        "Chat create race lost, but chat still missing: %s",
-                        task.telegram_chat_id,
-                    )
-                    # Consider message valid if chat creation fails
-                    return True
-
-        if incoming_title and incoming_title != (chat.title or None):
-            chat.title = incoming_title
-            needs_commit = True
+            # Consider message valid if chat creation fails
+            return True
 
         if not chat.is_active:
-            if needs_commit:
-                await session.commit()
+            if config.bot.trusted_index_enabled:
+                trusted_senders.mark_inactive_chat(task.telegram_chat_id)
             return True
 
-        user_state = await get_or_create_user_state(
-            session,
-            chat_id=chat.id,
-            telegram_user_id=task.telegram_user_id,
-        )
+        with STAGE_SECONDS.time(stage="user_state"), tracer.span("user_state"):  # noqa: E501
+            user_state = await get_or_create_user_state(
+                session,
+                chat_id=chat.id,
+                telegram_user_id=task.telegram_user_id,
+            )
 
         now = utc_now()
         joined_at = ensure_utc_timezone(user_state.joined_at)
@@ -118,8 +124,10 @@ class MessageProcessor:
         trusted = time_ok and msgs_ok
 
         if trusted:
-            if needs_commit:
-                await session.commit()
+            if config.bot.trusted_index_enabled:
+                trusted_senders.mark_trusted(
+                    task.telegram_chat_id, task.telegram_user_id
+                )
             log.debug(
                 "User is trusted (time_ok=%s, msgs_ok=%s): chat_id=%s, user_id=%s, valid_messages=%s",  # noqa: E501
                 time_ok,
@@ -130,6 +138,14 @@ class MessageProcessor:
             )
             return True
 
+        if config.bot.reputation_enabled:
+            with STAGE_SECONDS.time(stage="reputation"), tracer.span("reputation"):  # noqa: E501
+                known_spammer = await is_known_spammer(
+                    session, task.telegram_user_id
+                )
+            if known_spammer:
+                return await self._delete_known_spammer(task)
+
         chat_enable_ai_check = chat.enable_ai_check
         chat_cleanup_mentions = chat.cleanup_mentions
         chat_cleanup_links = chat.cleanup_links
@@ -137,16 +153,15 @@ class MessageProcessor:
 
         # Check all rule-based filters and delete message
         # if any condition is met
-        should_delete = (
-            (chat_cleanup_mentions and has_mentions(task)) or
-            (chat_cleanup_links and has_links(task, chat)) or
-            (chat_cleanup_emojis and has_excessive_emojis(task, config.bot.max_emojis))  # noqa: E501
-        )
+        with STAGE_SECONDS.time(stage="rules"):
+            should_delete = (
+                (chat_cleanup_mentions and self._detect("mentions", has_mentions, task)) or  # noqa: E501
+                (chat_cleanup_links and self._detect("links", has_links, task, chat)) or  # noqa: E501
+                (chat_cleanup_emojis and self._detect("emojis", has_excessive_emojis, task, config.bot.max_emojis))  # noqa: E501
+            )
 
         if should_delete:
-            await try_delete_message(self.bot, task)
-            if needs_commit:
-                await session.commit()
+            await self._delete(task)
             return False
 
         # If global AI is disabled but the chat has AI enabled, log a warning
@@ -158,23 +173,62 @@ class MessageProcessor:
             chat_enable_ai_check = False
 
         if chat_enable_ai_check:
-            success = await self._process_with_ai(
-                session, task, user_state, needs_commit
-            )
+            success = await self._process_with_ai(session, task, user_state)
             return success
         else:
-            needs_commit = True
             log.info("Chat %s has AI disabled.", chat.telegram_chat_id)
             user_state.valid_messages += 1
-            await session.commit()
+            await self._commit(session)
             return True
 
+    @staticmethod
+    def _detect(name: str, detector, *args) -> bool:
+        with tracer.span(f"detector.{name}") as span:
+            hit = detector(*args)
+            span.set_attribute("hit", hit)
+        return hit
+
+    async def _delete(self, task: MessageTask) -> bool:
+        with STAGE_SECONDS.time(stage="delete"), tracer.span("delete") as span:  # noqa: E501
+            deleted = await try_delete_message(self.bot, task, self._deleter)
+            span.set_attribute("deleted", deleted)
+        return deleted
+
+    async def _spam_detected(self, task: MessageTask) -> None:
+        if self._on_spam is not None:
+            await self._on_spam(task)
+
+    @staticmethod
+    async def _commit(session: AsyncSession) -> None:
+        with tracer.span("commit"):
+            await session.commit()
+
+    async def _delete_known_spammer(self, task: MessageTask) -> bool:
+        """Delete without AI: the user was caught spamming in some chat."""
+        from app.monitoring import system_monitor
+
+        log.info(
+            "Known spammer, deleting without AI: chat_id=%s msg_id=%s user_id=%s",  # noqa: E501
+            task.telegram_chat_id,
+            task.telegram_message_id,
+            task.telegram_user_id,
+        )
+        system_monitor.increment_spam_blocked_count()
+        system_monitor.increment_reputation_blocked()
+
+        await self._delete(task)
+        await self._spam_detected(task)
+        if config.bot.reputation_restrict:
+            await try_restrict_user(
+                self.bot, task.telegram_chat_id, task.telegram_user_id
+            )
+        return False
+
     async def _process_with_ai(
         self,
         session: AsyncSession,
         task: MessageTask,
         user_state,
-        needs_commit: bool,
     ) -> bool:
         """Process message using AI scoring."""
         from app.monitoring import system_monitor
@@ -182,7 +236,8 @@ class MessageProcessor:
         log.debug("Processing message with AI: %s", task)
 
         try:
-            hit = await self._ai_moderator.first_score_over_threshold(task)
+            with STAGE_SECONDS.time(stage="ai"), tracer.span("ai"):
+                hit = await self._ai_moderator.first_score_over_threshold(task)  # noqa: E501
 
             if hit is not None:
                 log.info(
@@ -195,15 +250,16 @@ class MessageProcessor:
 
                 system_monitor.increment_spam_blocked_count()
 
-                await try_delete_message(self.bot, task)
-                if needs_commit:
-                    await session.commit()
+                await self._delete(task)
+                await self._spam_detected(task)
+                if config.bot.reputation_enabled:
+                    await record_spam_hit(session, task.telegram_user_id)
+                    await self._commit(session)
                 return False  # Message was deleted
 
             # Not spam -> counts as valid
             old_valid_messages = user_state.valid_messages
             user_state.valid_messages += 1
-            needs_commit = True
 
             # Check if user just became trusted (was not trusted before, but is now)  # noqa: E501
             now = utc_now()
@@ -219,6 +275,10 @@ class MessageProcessor:
             newly_trusted = not was_trusted_before and is_trusted_now
 
             if newly_trusted:
+                if config.bot.trusted_index_enabled:
+                    trusted_senders.mark_trusted(
+                        task.telegram_chat_id, task.telegram_user_id
+                    )
                 log.info(
                     "User became trusted: chat_id=%s, user_id=%s, valid_messages=%s",  # noqa: E501
                     task.telegram_chat_id,
@@ -226,6 +286,31 @@ class MessageProcessor:
                     user_state.valid_messages,
                 )
 
+        except AICircuitOpenError as e:
+            # Backend is known to be down - skip straight to the
+            # fail-permissive path, the failures that opened the circuit
+            # have already been reported to the admin
+            log.info(
+                "AI circuit open; treating as valid (fail-safe). chat_id=%s msg_id=%s err=%s",  # noqa: E501
+                task.telegram_chat_id,
+                task.telegram_message_id,
+                e,
+            )
+            return True
+
+        except AIDeadlineExceededError as e:
+            # The message used up its time budget - a late verdict is
+            # worthless, so the remaining prompts are skipped. Treated as
+            # valid without boosting trust, like any other AI failure
+            system_monitor.increment_ai_deadline_exceeded()
+            log.info(
+                "AI deadline exceeded; treating as valid (fail-safe). chat_id=%s msg_id=%s err=%s",  # noqa: E501
+                task.telegram_chat_id,
+                task.telegram_message_id,
+                e,
+            )
+            return True
+
         except Exception as e:
             log.warning(
                 "AI moderation failed; treating as valid (fail-safe). chat_id=%s msg_id=%s err=%r",  # noqa: E501
@@ -238,11 +323,7 @@ class MessageProcessor:
             # AI failure - do NOT delete the message (fail-permissive) and
             # do NOT increment trust - this prevents AI failures from
             # accidentally boosting user trust
-            if needs_commit:
-                await session.commit()
             return True  # Message is treated as valid
 
-        if needs_commit:
-            await session.commit()
-
+        await self._commit(session)
         return True  # Message is valid
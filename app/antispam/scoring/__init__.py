@@ -1,4 +1,5 @@
-__all__ = ["AIScorer"]
+__all__ = ["AIScorer", "AIBatchScorer"]
 
 
 from .ai_scorer import AIScorer
+from .batch_scorer import AIBatchScorer
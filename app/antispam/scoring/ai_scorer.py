@@ -1,3 +1,4 @@
+import math
 import re
 from typing import Optional
 
@@ -7,6 +8,18 @@ from config import config
 
 log = get_logger(__name__)
 
+_LABELED_SCORE_RES = {
+    label: re.compile(
+        rf"\b{label}\s*(\d+)\s*[=:]\s*(-?\d+(?:\.\d+)?)", re.IGNORECASE
+    )
+    for label in ("P", "M")
+}
+_FLOAT_RE = re.compile(r"(-?\d+(?:\.\d+)?)")
+# A number is complete once a character that can't continue it follows
+_COMPLETE_FLOAT_RE = re.compile(r"-?\d+(?:\.\d+)?(?=[^\d.])")
+# Candidate tokens considered for the yes/no logprob answer
+_LOGPROB_TOP = 5
+
 
 class AIScorer:
     """
@@ -17,7 +30,12 @@ class AIScorer:
         self.ai_service: Optional[AIService] = ai_service
 
     async def get_score(
-        self, prompt: str, ai_service: Optional[AIService] = None
+        self,
+        prompt: str,
+        ai_service: Optional[AIService] = None,
+        *,
+        scores: int = 1,
+        deadline: Optional[float] = None,
     ) -> str:
         """
         Get AI score for a message.
@@ -25,6 +43,8 @@ class AIScorer:
         Args:
             prompt: The prompt to send to the AI
             ai_service: The AI service instance to use
+            scores: How many scores the prompt asks for (caps the output)
+            deadline: time.monotonic() by which the answer is needed
 
         Returns:
             The AI's response as a string
@@ -36,14 +56,87 @@ class AIScorer:
 
         from config import config
 
+        extra = {"temperature": config.ai.temperature}
+        max_tokens = config.ai.max_output_tokens * scores or None
+        # Multi-score answers are multi-line - never cut them on stop sequences
+        stop = (config.ai.stop_sequences or None) if scores == 1 else None
+
+        if config.ai.stream and scores == 1:
+            return await service.stream_until(
+                prompt,
+                self.has_complete_score,
+                extra=extra,
+                max_tokens=max_tokens,
+                stop=stop,
+                deadline=deadline,
+            )
+
         response = await service.one_shot(
             prompt,
-            extra={
-                "temperature": config.ai.temperature,
-            },
+            extra=extra,
+            max_tokens=max_tokens,
+            stop=stop,
+            deadline=deadline,
         )
         return response
 
+    async def get_spam_probability(
+        self,
+        prompt: str,
+        ai_service: Optional[AIService] = None,
+        *,
+        deadline: Optional[float] = None,
+    ) -> Optional[float]:
+        """
+        Score a yes/no prompt by the logprobs of its single answer token.
+
+        Returns P(YES) normalized over the YES/NO candidates, or None if
+        neither of them is among the top candidates. Raises
+        AIResponseFormatError if the backend doesn't return logprobs.
+        """
+        service = ai_service or self.ai_service
+        if service is None:
+            log.warning("( ! ) AI service not configured - AI check will always pass with score 0.0 ( ! )")  # noqa: E501
+            return 0.0
+
+        top = await service.top_logprobs(
+            prompt, top=_LOGPROB_TOP, deadline=deadline
+        )
+        return self.spam_probability_from_logprobs(top)
+
+    @staticmethod
+    def spam_probability_from_logprobs(top: dict[str, float]) -> Optional[float]:
+        """
+        P(YES) / (P(YES) + P(NO)) over the candidate tokens. Tokenizer
+        variants ("Yes", " yes", "YES") are summed up.
+        """
+        p_yes = p_no = 0.0
+        for token, logprob in top.items():
+            word = token.strip().lower()
+            if word == "yes":
+                p_yes += math.exp(logprob)
+            elif word == "no":
+                p_no += math.exp(logprob)
+
+        if p_yes + p_no <= 0.0:
+            log.warning("AI logprobs have no YES/NO candidates: %r", top)
+            return None
+
+        v = p_yes / (p_yes + p_no)
+        log.info(
+            "AI logprob response: p_yes=%.3f p_no=%.3f -> %.3f (threshold: %s)",
+            p_yes,
+            p_no,
+            v,
+            config.ai.spam_threshold,
+        )
+        return v
+
+    @staticmethod
+    def has_complete_score(partial: str) -> bool:
+        """True once a streamed answer contains a complete number."""
+        return _COMPLETE_FLOAT_RE.search(partial) is not None
+
     @staticmethod
     def extract_score(response: str) -> Optional[float]:
         """
@@ -74,7 +167,7 @@ class AIScorer:
             pass
 
         # Fallback: pick first float token and validate range
-        m = re.search(r"(-?\d+(?:\.\d+)?)", s)
+        m = _FLOAT_RE.search(s)
         if not m:
             return None
 
@@ -86,3 +179,50 @@ class AIScorer:
         if 0.0 <= v <= 1.0:
             return v
         return None
+
+    @staticmethod
+    def extract_scores(
+        response: str, count: int, label: str = "P"
+    ) -> Optional[list[float]]:
+        """
+        Extract `count` scores from a multi-score AI output.
+
+        Expected format is one "<label><n>=<score>" line per item: "P" for
+        policies of a combined prompt, "M" for messages of a batch prompt.
+        As a fallback, exactly `count` bare numbers in order are accepted.
+        Returns None unless all `count` scores are present and in [0, 1].
+        """
+        s = (response or "").strip()
+
+        by_index: dict[int, float] = {}
+        for m in _LABELED_SCORE_RES[label].finditer(s):
+            idx = int(m.group(1))
+            if 1 <= idx <= count and idx not in by_index:
+                by_index[idx] = float(m.group(2))
+
+        if by_index:
+            if len(by_index) != count:
+                log.warning(
+                    "AI multi-score response is missing items: got %s of %s, raw=%r",  # noqa: E501
+                    sorted(by_index),
+                    count,
+                    s[:200],
+                )
+                return None
+            scores = [by_index[i] for i in range(1, count + 1)]
+        else:
+            scores = [float(v) for v in _FLOAT_RE.findall(s)]
+            if len(scores) != count:
+                log.warning("AI multi-score response (unparseable raw): %r", s[:200])  # noqa: E501
+                return None
+
+        if not all(0.0 <= v <= 1.0 for v in scores):
+            log.warning("AI multi-score response out of range: %r", s[:200])
+            return None
+
+        log.info(
+            "AI multi-score response: %s (threshold: %s)",
+            scores,
+            config.ai.spam_threshold,
+        )
+        return scores
@@ -0,0 +1,149 @@
+import asyncio
+import time
+from typing import Optional, Union, cast
+
+from ai_client.models import AIDeadlineExceededError
+from ai_client.service import AIService
+from app.antispam.scoring.ai_scorer import AIScorer
+from logger import get_logger
+from prompts import PROMPTS
+from utils import MicroBatcher
+
+log = get_logger(__name__)
+
+# Result for a message whose deadline passed before it could be scored
+_EXPIRED = object()
+
+_Item = tuple[str, Optional[float]]
+_Result = Union[Optional[float], object]
+
+
+class AIBatchScorer:
+    """
+    Micro-batched AI scoring.
+
+    Messages scored against the same prompt within a short window are sent
+    as one numbered multi-message request, and the per-message scores are
+    handed back to the waiting callers. If the batched answer can't be
+    parsed, every message of the batch is re-scored with its own request.
+
+    Messages whose deadline has passed by the flush are left out of the
+    request, and the request is bound to the earliest deadline of the
+    rest; if that's too tight, the others are scored on their own with
+    their own deadlines.
+    """
+
+    def __init__(
+        self,
+        ai_service: Optional[AIService],
+        max_size: int = 8,
+        max_wait_ms: int = 50,
+    ):
+        self._scorer = AIScorer(ai_service)
+        self._batcher: MicroBatcher[int, _Item, _Result] = MicroBatcher(
+            self._flush,
+            max_size=max_size,
+            max_wait_s=max_wait_ms / 1000,
+            name="ai-batch",
+        )
+
+    async def score(
+        self,
+        msg: str,
+        prompt_index: int,
+        deadline: Optional[float] = None,
+    ) -> Optional[float]:
+        """
+        Score a normalized message with the given prompt. Raises
+        AIDeadlineExceededError if `deadline` passes before it's scored.
+        """
+        if _expired(deadline):
+            raise AIDeadlineExceededError("Message deadline already passed")
+        result = await self._batcher.submit(prompt_index, (msg, deadline))
+        if result is _EXPIRED:
+            raise AIDeadlineExceededError(
+                "Message deadline passed before its batch was scored"
+            )
+        return cast(Optional[float], result)
+
+    async def close(self) -> None:
+        await self._batcher.close()
+
+    async def _flush(
+        self, prompt_index: int, items: list[_Item]
+    ) -> list[_Result]:
+        results: list[_Result] = [_EXPIRED] * len(items)
+        live = [i for i, (_, deadline) in enumerate(items) if not _expired(deadline)]  # noqa: E501
+        if len(live) < len(items):
+            log.debug(
+                "AI batch: dropped %d expired messages. prompt=%s",
+                len(items) - len(live),
+                prompt_index,
+            )
+        if not live:
+            return results
+
+        if len(live) == 1:
+            msg, deadline = items[live[0]]
+            results[live[0]] = await self._score_single(
+                msg, prompt_index, deadline
+            )
+            return results
+
+        msgs = [items[i][0] for i in live]
+        deadlines = [items[i][1] for i in live if items[i][1] is not None]
+        scores = None
+        try:
+            ai_prompt = PROMPTS.build_batch_prompt(msgs, prompt_index)
+            ai_response = await self._scorer.get_score(
+                ai_prompt,
+                scores=len(msgs),
+                deadline=min(deadlines) if deadlines else None,
+            )
+            scores = self._scorer.extract_scores(ai_response, len(msgs), label="M")  # noqa: E501
+        except AIDeadlineExceededError as e:
+            log.debug(
+                "AI batch didn't fit the earliest deadline; scoring %d messages one by one. prompt=%s err=%s",  # noqa: E501
+                len(msgs),
+                prompt_index,
+                e,
+            )
+        else:
+            if scores is not None:
+                log.debug(
+                    "AI batch scored: prompt=%s size=%s", prompt_index, len(msgs)  # noqa: E501
+                )
+                for i, score in zip(live, scores):
+                    results[i] = score
+                return results
+
+            log.warning(
+                "AI batch output not parseable; re-scoring %d messages one by one. prompt=%s",  # noqa: E501
+                len(msgs),
+                prompt_index,
+            )
+
+        singles = await asyncio.gather(
+            *(self._score_within(items[i], prompt_index) for i in live)
+        )
+        for i, result in zip(live, singles):
+            results[i] = result
+        return results
+
+    async def _score_within(self, item: _Item, prompt_index: int) -> _Result:
+        msg, deadline = item
+        try:
+            return await self._score_single(msg, prompt_index, deadline)
+        except AIDeadlineExceededError:
+            return _EXPIRED
+
+    async def _score_single(
+        self, msg: str, prompt_index: int, deadline: Optional[float] = None
+    ) -> Optional[float]:
+        ai_prompt = PROMPTS.build_moderation_prompt(msg, prompt_index)
+        ai_response = await self._scorer.get_score(ai_prompt, deadline=deadline)  # noqa: E501
+        return self._scorer.extract_score(ai_response)
+
+
+def _expired(deadline: Optional[float]) -> bool:
+    return deadline is not None and deadline <= time.monotonic()
@@ -3,7 +3,9 @@ Anti-Spam Service
 """
 
 import asyncio
-from typing import cast
+import dataclasses
+import time
+from typing import Optional, cast
 
 from aiogram import Bot
 from sqlalchemy.ext.asyncio import async_sessionmaker
@@ -11,7 +13,12 @@ from sqlalchemy.ext.asyncio import async_sessionmaker
 from ai_client.service import AIService
 from app.antispam.dto import MessageTask
 from app.antispam.processors.message_processor import MessageProcessor
-from app.antispam.utils import TTLSet, get_sentinel
+from app.antispam.utils import RecentMessages, TTLSet, get_sentinel
+from app.bot.utils import try_delete_messages
+from app.metrics import MESSAGE_SECONDS, QUEUE_DEPTH, QUEUE_WAIT_SECONDS
+from app.monitoring import system_monitor
+from app.services.joins import JoinRecorder, MemberJoin
+from app.tracing import tracer
 from logger import get_logger
 from config import config
 
@@ -42,6 +49,7 @@ class AntiSpamService:
         cleanup_mentions: bool = True,
         cleanup_links: bool = True,
         cleanup_emojis: bool = True,
+        small_ai_service: Optional[AIService] = None,
     ):
         # Make AI service optional - don't crash due to AI config error
         # Log warning if AI is enabled but service is not available
@@ -56,6 +64,7 @@ class AntiSpamService:
 
         # Store the service (can be None)
         self.ai_service = ai_service
+        self.bot = bot
 
         self.queue: asyncio.Queue[MessageTask | object] = asyncio.Queue(
             maxsize=queue_size
@@ -74,6 +83,22 @@ class AntiSpamService:
         # Early dedupe for (chat_id, msg_id)
         self._seen = TTLSet(ttl_s=dedupe_ttl_s, max_size=2000)
 
+        # Recent message ids per (chat, user): once one message of a burst
+        # is spam, the rest are deleted together and skipped in the queue
+        self._recent = RecentMessages(
+            size=config.bot.spam_history_size,
+            window_s=config.bot.spam_history_window_s,
+        )
+        # Queued tasks of purged messages; sized to the queue, so no id is
+        # evicted before its task is dequeued
+        self._purged = TTLSet(
+            ttl_s=dedupe_ttl_s,
+            max_size=queue_size if queue_size > 0 else 10_000,
+        )
+
+        # Real join times from chat_member updates, created on start()
+        self._joins: Optional[JoinRecorder] = None
+
         self._message_processor = MessageProcessor(
             bot,
             ai_service,
@@ -81,6 +106,8 @@ class AntiSpamService:
             cleanup_mentions=cleanup_mentions,
             cleanup_links=cleanup_links,
             cleanup_emojis=cleanup_emojis,
+            small_ai_service=small_ai_service,
+            on_spam=self._purge_recent_messages,
         )
 
     async def start(self, session_factory: async_sessionmaker):
@@ -88,6 +115,13 @@ class AntiSpamService:
             return
         self._started = True
 
+        if config.bot.join_tracking_enabled:
+            self._joins = JoinRecorder(
+                session_factory,
+                max_size=config.bot.join_batch_max_size,
+                max_wait_ms=config.bot.join_batch_max_wait_ms,
+            )
+
         self._tasks = [
             asyncio.create_task(
                 self._worker_loop(i, session_factory), name=f"antispam-worker-{i}"  # noqa: E501
@@ -111,11 +145,41 @@ class AntiSpamService:
 
         await asyncio.gather(*self._tasks, return_exceptions=True)
 
+        try:
+            await self._message_processor.close()
+        except Exception:
+            log.exception("Error closing the message processor")
+
+        if self._joins is not None:
+            await self._joins.close()
+            self._joins = None
+
         self._tasks.clear()
         self._started = False
         log.info("AntiSpamService stopped")
 
+    def record_join(self, join: MemberJoin) -> None:
+        """Remember when a member joined a chat (written in the background)."""  # noqa: E501
+        if self._joins is not None:
+            self._joins.record(join)
+
     async def enqueue(self, task: MessageTask) -> None:
+        now = time.monotonic()
+        budget_s = config.ai.message_budget_s
+        if budget_s > 0 and task.deadline is None:
+            # Time spent waiting in the queue counts against the budget
+            task = dataclasses.replace(
+                task, deadline=now + budget_s, enqueued_at=now
+            )
+        else:
+            task = dataclasses.replace(task, enqueued_at=now)
+
+        self._recent.add(
+            task.telegram_chat_id,
+            task.telegram_user_id,
+            task.telegram_message_id,
+        )
+
         try:
             self.queue.put_nowait(task)
         except asyncio.QueueFull:
@@ -126,6 +190,46 @@ class AntiSpamService:
                 task.telegram_user_id,
             )
             await self.queue.put(task)
+        QUEUE_DEPTH.set(self.queue.qsize())
+
+        if task.fetched_at is not None:
+            system_monitor.observe_update_enqueue_latency(
+                time.monotonic() - task.fetched_at
+            )
+
+    async def _purge_recent_messages(self, task: MessageTask) -> None:
+        """
+        Delete the spammer's other recent messages in the chat with one
+        bulk call and mark them as purged, so their queued tasks are
+        skipped without DB or AI work. Called by the processor when a
+        message is judged spam (AI verdict or known spammer); messages
+        already processed are no longer in the buffer and stay.
+        """
+        message_ids = [
+            mid
+            for mid in self._recent.pop(
+                task.telegram_chat_id, task.telegram_user_id
+            )
+            if mid != task.telegram_message_id
+        ]
+        if not message_ids:
+            return
+
+        for mid in message_ids:
+            self._purged.add_if_new((task.telegram_chat_id, mid))
+
+        log.info(
+            "Purging %d recent messages of spammer user_id=%s in chat_id=%s",
+            len(message_ids),
+            task.telegram_user_id,
+            task.telegram_chat_id,
+        )
+        with tracer.span("purge_history", count=len(message_ids)):
+            purged = await try_delete_messages(
+                self.bot, task.telegram_chat_id, message_ids
+            )
+        if purged:
+            system_monitor.increment_spam_history_purged(len(message_ids))
 
     async def _worker_loop(self, idx: int, session_factory: async_sessionmaker):  # noqa: E501
         while True:
@@ -135,8 +239,21 @@ class AntiSpamService:
                     return
 
                 task = cast(MessageTask, item)
+                QUEUE_DEPTH.set(self.queue.qsize())
+                if task.enqueued_at is not None:
+                    waited_s = time.monotonic() - task.enqueued_at
+                    QUEUE_WAIT_SECONDS.observe(waited_s)
+                    tracer.record("queue_wait", waited_s, parent=task.trace)
 
                 key = (task.telegram_chat_id, task.telegram_message_id)
+                if self._purged.discard(key):
+                    log.debug(
+                        "Purged task skipped: chat_id=%s msg_id=%s worker=%s",  # noqa: E501
+                        task.telegram_chat_id,
+                        task.telegram_message_id,
+                        idx,
+                    )
+                    continue
                 if not self._seen.add_if_new(key):
                     log.debug(
                         "Duplicate task skipped: chat_id=%s msg_id=%s worker=%s",  # noqa: E501
@@ -146,20 +263,35 @@ class AntiSpamService:
                     )
                     continue
 
-                async with session_factory() as session:
-                    try:
-                        await self._message_processor.process_message(session, task)  # noqa: E501
-                    except Exception:
-                        log.exception(
-                            "AntiSpam worker=%s failed: chat_id=%s msg_id=%s user_id=%s",  # noqa: E501
-                            idx,
-                            task.telegram_chat_id,
-                            task.telegram_message_id,
-                            task.telegram_user_id,
-                        )
+                started = time.perf_counter()
+                result = "error"
+                with tracer.span(
+                    "process", parent=task.trace, worker=idx
+                ) as span:
+                    async with session_factory() as session:
                         try:
-                            await session.rollback()
+                            is_valid = await self._message_processor.process_message(session, task)  # noqa: E501
+                            result = "deleted" if is_valid is False else "valid"  # noqa: E501
                         except Exception:
-                            log.exception("Rollback failed in worker=%s", idx)
+                            log.exception(
+                                "AntiSpam worker=%s failed: chat_id=%s msg_id=%s user_id=%s",  # noqa: E501
+                                idx,
+                                task.telegram_chat_id,
+                                task.telegram_message_id,
+                                task.telegram_user_id,
+                            )
+                            try:
+                                await session.rollback()
+                            except Exception:
+                                log.exception("Rollback failed in worker=%s", idx)  # noqa: E501
+                    span.set_attribute("result", result)
+                self._recent.discard(
+                    task.telegram_chat_id,
+                    task.telegram_user_id,
+                    task.telegram_message_id,
+                )
+                MESSAGE_SECONDS.observe(
+                    time.perf_counter() - started, result=result
+                )
             finally:
                 self.queue.task_done()
@@ -1,5 +1,5 @@
 import asyncio
-from collections import OrderedDict
+from collections import OrderedDict, deque
 from typing import Final
 
 
@@ -25,6 +25,10 @@ class TTLSet:
         self._data[key] = now
         return True
 
+    def discard(self, key: object) -> bool:
+        """Forget `key`; True if it was in the set."""
+        return self._data.pop(key, None) is not None
+
     def _evict(self, now: float) -> None:
         ttl = self.ttl_s
 
@@ -38,6 +42,67 @@ class TTLSet:
             self._data.popitem(last=False)
 
 
+class RecentMessages:
+    """
+    Bounded ring buffer of the last `size` message ids per (chat, user),
+    so a spammer's other messages can be found once one of them is
+    judged spam. Processed messages are discarded, so only ids younger
+    than `window_s` that are still waiting in the queue (or being
+    processed) are returned; the least recently active users are
+    dropped beyond `max_users`.
+    """
+
+    def __init__(
+        self, size: int = 10, window_s: int = 120, max_users: int = 5000
+    ):
+        self.size = size
+        self.window_s = window_s
+        self.max_users = max_users
+        self._data: OrderedDict[
+            tuple[int, int], deque[tuple[int, float]]
+        ] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def add(self, chat_id: int, user_id: int, message_id: int) -> None:
+        if self.size <= 0:
+            return
+        now = asyncio.get_running_loop().time()
+        key = (chat_id, user_id)
+
+        ring = self._data.get(key)
+        if ring is None:
+            ring = deque(maxlen=self.size)
+            self._data[key] = ring
+        else:
+            self._data.move_to_end(key)
+        ring.append((message_id, now))
+
+        while len(self._data) > self.max_users:
+            self._data.popitem(last=False)
+
+    def discard(self, chat_id: int, user_id: int, message_id: int) -> None:
+        """Forget a message once it's processed, so it's never purged."""
+        ring = self._data.get((chat_id, user_id))
+        if not ring:
+            return
+        kept = [entry for entry in ring if entry[0] != message_id]
+        if not kept:
+            del self._data[(chat_id, user_id)]
+        elif len(kept) < len(ring):
+            ring.clear()
+            ring.extend(kept)
+
+    def pop(self, chat_id: int, user_id: int) -> list[int]:
+        """Forget the user's recent messages in the chat and return their ids."""  # noqa: E501
+        ring = self._data.pop((chat_id, user_id), None)
+        if not ring:
+            return []
+        now = asyncio.get_running_loop().time()
+        return [mid for mid, ts in ring if now - ts < self.window_s]
+
+
 def get_sentinel():
     """Get the sentinel object used for graceful shutdown."""
     return _SENTINEL
@@ -7,6 +7,10 @@ from aiogram import Bot, Dispatcher
 
 from app.antispam.service import AntiSpamService
 from app.bot.middleware.antispam import AntiSpamMiddleware
+from app.bot.middleware.polling import (
+    UpdateFetchClock,
+    UpdateFetchedAtMiddleware,
+)
 from app.container import get_container, set_antispam_service
 from app.bot.factory import create_bot_and_dispatcher
 from config import config
@@ -34,11 +38,16 @@ async def bootstrap_bot_for_polling(
     """
     bot, dp = create_bot_and_dispatcher()
 
+    clock = UpdateFetchClock(limit=config.bot.polling_limit)
+    bot.session.middleware(clock)
+    dp.update.outer_middleware(UpdateFetchedAtMiddleware(clock))
+
     container = get_container()
 
     antispam = AntiSpamService(
         bot,
         ai_service=container.ai_service,
+        small_ai_service=container.ai_small_service,
         queue_size=config.bot.antispam_queue_size,
         workers=config.bot.antispam_workers,
         cleanup_emojis=True,
@@ -71,6 +80,7 @@ async def bootstrap_antispam_service(db, bot: Bot) -> AntiSpamService:
     antispam = AntiSpamService(
         bot,
         ai_service=container.ai_service,
+        small_ai_service=container.ai_small_service,
         queue_size=config.bot.antispam_queue_size,
         workers=config.bot.antispam_workers,
         cleanup_emojis=True,
@@ -1,8 +1,10 @@
 from aiogram import Bot, Dispatcher
 
 from app.bot.middleware.db_session import DbSessionMiddleware
+from app.bot.middleware.outbound import OutboundScheduler
 from app.bot.middleware.chat_registry import ChatRegistryMiddleware
 from app.bot.middleware.security import SecurityValidationMiddleware
+from app.bot.middleware.trusted_senders import TrustedSenderMiddleware
 from app.bot.handlers import router
 from config import config
 from logger import get_logger
@@ -13,9 +15,14 @@ log = get_logger(__name__)
 def create_bot_and_dispatcher() -> tuple[Bot, Dispatcher]:
     log.info("Creating bot and dispatcher")
     bot = Bot(token=config.bot.token)
+    if config.bot.outbound_rate_limit_enabled:
+        log.debug("Adding outbound Telegram API scheduler")
+        bot.session.middleware(OutboundScheduler.from_config())
 
     dp = Dispatcher()
     log.debug("Adding middlewares to dispatcher")
+    if config.bot.trusted_index_enabled:
+        dp.update.outer_middleware(TrustedSenderMiddleware())
     dp.update.middleware(SecurityValidationMiddleware())
     dp.update.middleware(DbSessionMiddleware())
     dp.update.middleware(ChatRegistryMiddleware())
@@ -29,6 +29,14 @@ from .test import router as test_router  # noqa: E402
 
 router.include_router(test_router)
 
+from .my_chat_member import router as my_chat_member_router  # noqa: E402
+
+router.include_router(my_chat_member_router)
+
+from .chat_member import router as chat_member_router  # noqa: E402
+
+router.include_router(chat_member_router)
+
 from .antispam import router as anti_spam_router  # noqa: E402
 
 router.include_router(anti_spam_router)
@@ -19,7 +19,8 @@ from app.bot.handlers.admin.utils import (
 )
 from app.db import Chat
 from logger import get_logger
-from app.services.chat_cached import cached_chat_service
+from app.services.chat_registry import chat_registry
+from app.services.trusted_index import trusted_senders
 from .constants import HTML
 from .services import ensure_chat_link, fetch_group_chats, update_chat_titles
 from .callbacks_data import ChatCb, ChatFlagCb, ChatsCb, ChatWhitelistCb
@@ -62,6 +63,8 @@ async def toggle_chat_status(
 
     chat.is_active = not chat.is_active
     await session.commit()
+    chat_registry.invalidate(chat.telegram_chat_id)
+    trusted_senders.forget_chat(chat.telegram_chat_id)
 
     await callback_query.answer(
         "✅  Activated" if chat.is_active else "⭕️  Deactivated",
@@ -339,7 +342,7 @@ async def whitelist_add_domains(
     )
 
     added = await add_allowed_link_domains(session, chat, message.text or "")
-    cached_chat_service.invalidate_chat(chat.telegram_chat_id)
+    chat_registry.invalidate(chat.telegram_chat_id)
 
     await state.clear()
 
@@ -377,7 +380,7 @@ async def whitelist_remove_domains(
         return
 
     removed = await remove_allowed_link_domains(session, chat, message.text or "")  # noqa: E501
-    cached_chat_service.invalidate_chat(chat.telegram_chat_id)
+    chat_registry.invalidate(chat.telegram_chat_id)
 
     await state.clear()
 
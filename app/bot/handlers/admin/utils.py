@@ -6,7 +6,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.bot.handlers.admin.renderers import render_chat_config
 from app.db import Chat
-from app.services.chat_cached import cached_chat_service
+from app.services.chat_registry import chat_registry
 from config import config
 from utils import parse_domains
 from logger import get_logger
@@ -87,7 +87,7 @@ async def toggle_chat_flag(
         show_alert=False,
     )
 
-    cached_chat_service.invalidate_chat(chat.telegram_chat_id)
+    chat_registry.invalidate(chat.telegram_chat_id)
 
     await render_chat_config(callback_query.message, chat, page)
 
@@ -6,6 +6,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.antispam import AntiSpamService, MessageTask
 from app.bot.filters import GroupOrSupergroupChatFilter
 from app.services.chat_registry import ChatRegistry
+from app.tracing import tracer
 from config import config
 from logger import get_logger
 
@@ -25,45 +26,56 @@ async def anti_spam_stub(
     if not message.from_user:
         return
 
-    incoming_title = (getattr(message.chat, "title", None) or "").strip() or None  # noqa: E501
-
-    log.debug(
-        "Processing message from user_id=%s in chat_id=%s (admin=%s)",
-        message.from_user.id,
+    # Root of the message's trace when it's sampled (APP_TRACING_SAMPLE_RATE)
+    with tracer.start_trace(
+        "handler",
         message.chat.id,
-        message.from_user.id == config.bot.main_admin_id,
-    )
-
-    await chat_registry.ensure_chat(
-        session=session,
-        telegram_chat_id=message.chat.id,
-        title=incoming_title,
-        default_is_active=False,
-    )
+        message.message_id,
+        user_id=message.from_user.id,
+    ) as span:
+        incoming_title = (getattr(message.chat, "title", None) or "").strip() or None  # noqa: E501
 
-    if message.from_user.id == config.bot.main_admin_id:
         log.debug(
-            "Skipping antispam for admin user_id=%s",
-            message.from_user.id
+            "Processing message from user_id=%s in chat_id=%s (admin=%s)",
+            message.from_user.id,
+            message.chat.id,
+            message.from_user.id == config.bot.main_admin_id,
         )
-        return
 
-    text = message.text or message.caption or ""
-    entities = (message.entities or []) + (message.caption_entities or [])
+        with tracer.span("chat_lookup"):
+            await chat_registry.ensure_chat(
+                session=session,
+                telegram_chat_id=message.chat.id,
+                title=incoming_title,
+                default_is_active=False,
+            )
 
-    task = MessageTask(
-        telegram_chat_id=message.chat.id,
-        telegram_message_id=message.message_id,
-        telegram_user_id=message.from_user.id,
-        text=text,
-        entities=[e.model_dump() for e in entities],
-        chat_title=incoming_title,
-    )
+        if message.from_user.id == config.bot.main_admin_id:
+            log.debug(
+                "Skipping antispam for admin user_id=%s",
+                message.from_user.id
+            )
+            return
 
-    log.debug(
-        "Enqueuing antispam task: chat_id=%s msg_id=%s user_id=%s",
-        message.chat.id,
-        message.message_id,
-        message.from_user.id,
-    )
-    await antispam.enqueue(task)
+        text = message.text or message.caption or ""
+        entities = (message.entities or []) + (message.caption_entities or [])
+
+        task = MessageTask(
+            telegram_chat_id=message.chat.id,
+            telegram_message_id=message.message_id,
+            telegram_user_id=message.from_user.id,
+            text=text,
+            entities=[e.model_dump() for e in entities],
+            chat_title=incoming_title,
+            fetched_at=kwargs.get("fetched_at"),
+            trace=span if span.sampled else None,
+        )
+
+        log.debug(
+            "Enqueuing antispam task: chat_id=%s msg_id=%s user_id=%s",
+            message.chat.id,
+            message.message_id,
+            message.from_user.id,
+        )
+        with tracer.span("enqueue"):
+            await antispam.enqueue(task)
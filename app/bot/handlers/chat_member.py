@@ -0,0 +1,34 @@
+from aiogram import Router, types
+from aiogram.enums import ChatType
+from aiogram.filters import JOIN_TRANSITION, ChatMemberUpdatedFilter
+
+from app.antispam import AntiSpamService
+from app.services.joins import MemberJoin
+from logger import get_logger
+
+log = get_logger(__name__)
+
+router = Router()
+
+
+@router.chat_member(ChatMemberUpdatedFilter(member_status_changed=JOIN_TRANSITION))  # noqa: E501
+async def member_joined(
+    event: types.ChatMemberUpdated,
+    antispam: AntiSpamService,
+):
+    """Record the real join time, so trust is counted from the join."""
+    user = event.new_chat_member.user
+    if user.is_bot or event.chat.type not in (ChatType.GROUP, ChatType.SUPERGROUP):  # noqa: E501
+        return
+
+    log.debug(
+        "Member joined: chat_id=%s user_id=%s", event.chat.id, user.id
+    )
+    antispam.record_join(
+        MemberJoin(
+            telegram_chat_id=event.chat.id,
+            telegram_user_id=user.id,
+            joined_at=event.date,
+            chat_title=(event.chat.title or "").strip() or None,
+        )
+    )
@@ -0,0 +1,20 @@
+from aiogram import Router, types
+
+from app.bot.utils import chat_permissions
+from logger import get_logger
+
+log = get_logger(__name__)
+
+router = Router()
+
+
+@router.my_chat_member()
+async def bot_membership_changed(event: types.ChatMemberUpdated):
+    """Drop cached bot permissions when the bot is promoted/demoted/kicked."""
+    chat_permissions.invalidate(event.chat.id, event.new_chat_member.user.id)
+    log.info(
+        "Bot membership changed: chat_id=%s status=%s -> %s",
+        event.chat.id,
+        event.old_chat_member.status,
+        event.new_chat_member.status,
+    )
@@ -15,6 +15,8 @@ class DbSessionMiddleware(BaseMiddleware):
     ) -> Any:
         db = get_db()
 
+        # With NullPool an unused session never takes a connection, so
+        # updates that don't touch the database cost next to nothing
         async with db.session() as session:
             data["session"] = session
             return await handler(event, data)
@@ -0,0 +1,294 @@
+"""
+Outbound Telegram API scheduler: rate limits, flood control and priorities
+for every request the bot makes
+"""
+
+import asyncio
+import itertools
+import time
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Dict, List, Optional, Union
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import (
+    BaseRequestMiddleware,
+    NextRequestMiddlewareType,
+)
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import (
+    BanChatMember,
+    BanChatSenderChat,
+    CreateChatInviteLink,
+    DeleteMessage,
+    DeleteMessages,
+    DeleteWebhook,
+    ExportChatInviteLink,
+    GetChat,
+    GetChatMember,
+    GetMe,
+    GetUpdates,
+    RestrictChatMember,
+    SetMyCommands,
+    SetWebhook,
+    TelegramMethod,
+)
+from aiogram.methods.base import Response, TelegramType
+
+from app.monitoring import system_monitor
+from config import config
+from logger import get_logger
+
+log = get_logger(__name__)
+
+ChatId = Union[int, str]
+
+
+class Priority(IntEnum):
+    """Lower value is sent first."""
+
+    MODERATION = 0
+    NORMAL = 1
+    COSMETIC = 2
+
+
+# Not scheduled: long polling and startup calls must never queue
+_BYPASS = (GetUpdates, GetMe, SetWebhook, DeleteWebhook)
+_MODERATION = (
+    DeleteMessage,
+    DeleteMessages,
+    BanChatMember,
+    BanChatSenderChat,
+    RestrictChatMember,
+    GetChatMember,
+)
+_COSMETIC = (GetChat, CreateChatInviteLink, ExportChatInviteLink, SetMyCommands)
+
+
+class TokenBucket:
+    """Classic token bucket that can also be blocked until a point in time."""
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.blocked_until = 0.0
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        if now > self._updated:
+            self.tokens = min(
+                self.burst, self.tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+
+    def ready(self, now: float) -> bool:
+        self._refill(now)
+        return now >= self.blocked_until and self.tokens >= 1
+
+    def take(self) -> None:
+        self.tokens -= 1
+
+    def wait_s(self, now: float) -> float:
+        """Time until the next token, including any flood-control block."""
+        self._refill(now)
+        refill = 0.0
+        if self.tokens < 1:
+            refill = (1 - self.tokens) / self.rate if self.rate > 0 else 1.0
+        return max(self.blocked_until - now, refill, 0.0)
+
+    def block(self, until: float) -> None:
+        self.blocked_until = max(self.blocked_until, until)
+
+    def idle(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.burst and now >= self.blocked_until
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    seq: int
+    chat_id: Optional[ChatId] = field(compare=False)
+    future: "asyncio.Future[None]" = field(compare=False)
+
+
+class OutboundScheduler(BaseRequestMiddleware):
+    """
+    Session middleware that queues every outbound Bot API request behind
+    a global and a per-chat token bucket, sends moderation calls (deletes,
+    bans, permission checks) before notifications and cosmetic calls, and
+    honours retry_after: a 429 blocks the chat (or everything, for calls
+    without a chat) for the requested time and the request is retried.
+    """
+
+    MAX_IDLE_BUCKETS = 10_000
+    MIN_SLEEP_S = 0.001
+
+    def __init__(
+        self,
+        *,
+        global_rate: float,
+        global_burst: int,
+        chat_rate: float,
+        chat_burst: int,
+        max_retries: int = 2,
+    ) -> None:
+        self.max_retries = max_retries
+        self._chat_rate = chat_rate
+        self._chat_burst = chat_burst
+        self._global = TokenBucket(global_rate, global_burst)
+        self._chats: Dict[ChatId, TokenBucket] = {}
+
+        self._waiters: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._runner: Optional[asyncio.Task[None]] = None
+
+    @classmethod
+    def from_config(cls) -> "OutboundScheduler":
+        return cls(
+            global_rate=config.bot.outbound_global_rate,
+            global_burst=config.bot.outbound_global_burst,
+            chat_rate=config.bot.outbound_chat_rate,
+            chat_burst=config.bot.outbound_chat_burst,
+            max_retries=config.bot.outbound_max_retries,
+        )
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    @staticmethod
+    def priority_of(method: TelegramMethod) -> Priority:
+        if isinstance(method, _MODERATION):
+            return Priority.MODERATION
+        if isinstance(method, _COSMETIC):
+            return Priority.COSMETIC
+        return Priority.NORMAL
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        if isinstance(method, _BYPASS):
+            return await make_request(bot, method)
+
+        priority = self.priority_of(method)
+        chat_id = getattr(method, "chat_id", None)
+
+        attempt = 0
+        while True:
+            await self.acquire(priority, chat_id)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                self._flood_wait(chat_id, e.retry_after)
+                if attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                log.warning(
+                    "Flood control on %s chat_id=%s: retry %d/%d in %ss",
+                    type(method).__name__,
+                    chat_id,
+                    attempt,
+                    self.max_retries,
+                    e.retry_after,
+                )
+
+    async def acquire(
+        self, priority: Priority, chat_id: Optional[ChatId] = None
+    ) -> None:
+        """Wait until a request for `chat_id` may be sent."""
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(
+            _Waiter(int(priority), next(self._seq), chat_id, future)
+        )
+        self._publish_depth()
+
+        if self._runner is None or self._runner.done():
+            self._runner = asyncio.create_task(
+                self._run(), name="telegram-outbound"
+            )
+        else:
+            self._wakeup.set()
+
+        try:
+            await future
+        finally:
+            if not future.done():
+                future.cancel()
+
+    def _flood_wait(self, chat_id: Optional[ChatId], retry_after: float) -> None:  # noqa: E501
+        system_monitor.increment_telegram_retry_after()
+        until = time.monotonic() + retry_after
+        if chat_id is None:
+            self._global.block(until)
+        else:
+            self._bucket(chat_id).block(until)
+
+    def _bucket(self, chat_id: ChatId) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= self.MAX_IDLE_BUCKETS:
+                now = time.monotonic()
+                self._chats = {
+                    k: b for k, b in self._chats.items() if not b.idle(now)
+                }
+            bucket = TokenBucket(self._chat_rate, self._chat_burst)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    def _publish_depth(self) -> None:
+        system_monitor.set_telegram_queue_depth(len(self._waiters))
+
+    async def _run(self) -> None:
+        while True:
+            wait_s = self._grant(time.monotonic())
+            if not self._waiters:
+                return
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(
+                    self._wakeup.wait(), max(wait_s, self.MIN_SLEEP_S)
+                )
+            except TimeoutError:
+                pass
+
+    def _grant(self, now: float) -> float:
+        """
+        Release every waiter that can go now, best priority first.
+        Returns how long to sleep before the next waiter may be ready.
+        """
+        self._waiters.sort()
+        remaining: List[_Waiter] = []
+        wait_s: Optional[float] = None
+
+        for i, waiter in enumerate(self._waiters):
+            if waiter.future.done():
+                continue  # Caller went away
+            if not self._global.ready(now):
+                wait_s = self._global.wait_s(now)
+                remaining.extend(
+                    w for w in self._waiters[i:] if not w.future.done()
+                )
+                break
+
+            bucket = None
+            if waiter.chat_id is not None:
+                bucket = self._bucket(waiter.chat_id)
+                if not bucket.ready(now):
+                    chat_wait = bucket.wait_s(now)
+                    wait_s = chat_wait if wait_s is None else min(wait_s, chat_wait)  # noqa: E501
+                    remaining.append(waiter)
+                    continue
+                bucket.take()
+
+            self._global.take()
+            waiter.future.set_result(None)
+
+        self._waiters = remaining
+        self._publish_depth()
+        return wait_s if wait_s is not None else 0.0
@@ -0,0 +1,73 @@
+"""
+Polling instrumentation: getUpdates batch size and the time each update
+was fetched, so the delay until it reaches the antispam queue can be
+measured
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.middlewares.base import (
+    BaseRequestMiddleware,
+    NextRequestMiddlewareType,
+)
+from aiogram.methods import GetUpdates, TelegramMethod
+from aiogram.methods.base import Response, TelegramType
+from aiogram.types import TelegramObject, Update
+
+
+class UpdateFetchClock(BaseRequestMiddleware):
+    """
+    Session middleware for getUpdates: applies `limit` (aiogram's
+    start_polling doesn't expose it) and records time.monotonic() at
+    which every returned update arrived.
+    """
+
+    def __init__(self, limit: Optional[int] = None, max_pending: int = 10_000):  # noqa: E501
+        self.limit = limit
+        self.max_pending = max_pending
+        self._fetched_at: OrderedDict[int, float] = OrderedDict()
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        if not isinstance(method, GetUpdates):
+            return await make_request(bot, method)
+
+        if self.limit:
+            method.limit = self.limit
+        updates = await make_request(bot, method)
+
+        now = time.monotonic()
+        for update in updates or ():  # type: ignore[attr-defined]
+            self._fetched_at[update.update_id] = now
+        # Updates that never reach the dispatcher must not pile up
+        while len(self._fetched_at) > self.max_pending:
+            self._fetched_at.popitem(last=False)
+        return updates
+
+    def pop(self, update_id: int) -> Optional[float]:
+        return self._fetched_at.pop(update_id, None)
+
+
+class UpdateFetchedAtMiddleware(BaseMiddleware):
+    """Outer update middleware: exposes the fetch time as `fetched_at`."""
+
+    def __init__(self, clock: UpdateFetchClock):
+        super().__init__()
+        self.clock = clock
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        if isinstance(event, Update):
+            data["fetched_at"] = self.clock.pop(event.update_id)
+        return await handler(event, data)
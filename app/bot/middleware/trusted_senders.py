@@ -0,0 +1,48 @@
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.enums import ChatType
+from aiogram.types import TelegramObject, Update
+
+from app.monitoring import system_monitor
+from app.services.trusted_index import TrustedSenderIndex, trusted_senders
+from logger import get_logger
+
+log = get_logger(__name__)
+
+
+class TrustedSenderMiddleware(BaseMiddleware):
+    """
+    Outer update middleware: group messages of trusted members and
+    messages in inactive chats are dropped here, before sanitizing, the
+    DB session and handler routing.
+    """
+
+    def __init__(self, index: TrustedSenderIndex = trusted_senders):
+        super().__init__()
+        self.index = index
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        message = event.message if isinstance(event, Update) else None
+        if (
+            message is not None
+            and message.from_user is not None
+            and message.chat.type in (ChatType.GROUP, ChatType.SUPERGROUP)
+        ):
+            reason = self.index.skip_reason(message.chat.id, message.from_user.id)  # noqa: E501
+            if reason is not None:
+                system_monitor.increment_trusted_shortcuts()
+                log.debug(
+                    "Skipping message: reason=%s chat_id=%s user_id=%s",
+                    reason,
+                    message.chat.id,
+                    message.from_user.id,
+                )
+                return None
+
+        return await handler(event, data)
@@ -6,6 +6,7 @@ from app.container import get_db
 from config import config
 from logger import get_logger
 from app.bot.bootstrap import bootstrap_bot_for_polling
+from app.metrics import start_configured_metrics_server
 
 log = get_logger(__name__)
 
@@ -14,8 +15,22 @@ async def _run():
     db = get_db()
     bot, dp, antispam = await bootstrap_bot_for_polling(db)
 
+    metrics_server = await start_configured_metrics_server()
+
     try:
-        await dp.start_polling(bot)
+        # Handlers run as tasks so slow DB work or a full antispam queue
+        # doesn't hold back getUpdates; the concurrency limit still
+        # applies backpressure once that many updates are in flight
+        await dp.start_polling(
+            bot,
+            polling_timeout=config.bot.polling_timeout_s,
+            handle_as_tasks=True,
+            tasks_concurrency_limit=config.bot.polling_concurrency or None,
+            # Same update types as the webhook; without it aiogram asks for
+            # every type a router handles (chat_member even with join
+            # tracking off)
+            allowed_updates=config.bot.allowed_updates,
+        )
     except asyncio.CancelledError:
         log.info("Polling was cancelled")
     except KeyboardInterrupt:
@@ -28,6 +43,10 @@ async def _run():
         )
         raise
     finally:
+        if metrics_server is not None:
+            metrics_server.close()
+            await metrics_server.wait_closed()
+
         log.info("Stopping antispam service...")
         try:
             await antispam.stop()
@@ -65,6 +84,12 @@ def run_polling():
     log.info("Bot token configured: %s", "Yes" if config.bot.token else "No")
     log.info("Antispam queue size: %s", config.bot.antispam_queue_size)
     log.info("Antispam workers: %s", config.bot.antispam_workers)
+    log.info(
+        "Polling: timeout=%ss limit=%s concurrency=%s",
+        config.bot.polling_timeout_s,
+        config.bot.polling_limit,
+        config.bot.polling_concurrency or "unlimited",
+    )
     log.info("AI enabled: %s", config.bot.ai_enabled)
 
     try:
@@ -9,9 +9,16 @@ from app.bot.factory import create_bot_and_dispatcher
 from app.container import get_db
 from config import config
 from logger import get_logger
+from app.metrics import start_configured_metrics_server
 from app.monitoring import system_monitor
 from app.bot.bootstrap import bootstrap_antispam_service
 from app.bot.middleware.antispam import AntiSpamMiddleware
+from app.bot.webhook_ingest import WebhookIngestor
+from app.bot.webhook_prefilter import (
+    DROP_MALFORMED,
+    UpdatePreFilter,
+    parse_update,
+)
 
 log = get_logger(__name__)
 
@@ -21,18 +28,36 @@ _antispam_service = None
 def create_webhook_app() -> FastAPI:
     bot, dp = create_bot_and_dispatcher()
 
+    ingestor = None
+    if config.bot.webhook_ingest_enabled:
+        ingestor = WebhookIngestor(
+            bot,
+            dp,
+            buffer_size=config.bot.webhook_ingest_buffer_size,
+            workers=config.bot.webhook_ingest_workers,
+        )
+
+    prefilter = None
+    if config.bot.webhook_prefilter_enabled:
+        prefilter = UpdatePreFilter()
+
     @asynccontextmanager
     async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
         global _antispam_service
         log.info("FastAPI lifespan startup: setting webhook...")
 
         db = get_db()
+        # Not a route on this app: the webhook port is public
+        metrics_server = await start_configured_metrics_server()
 
         try:
             _antispam_service = await bootstrap_antispam_service(db, bot)
 
             dp.update.middleware(AntiSpamMiddleware(_antispam_service))
 
+            if ingestor is not None:
+                ingestor.start()
+
             if not config.bot.webhook_url:
                 raise RuntimeError(
                     "config.bot.webhook_url is empty but webhook mode is enabled"  # noqa: E501
@@ -65,6 +90,20 @@ def create_webhook_app() -> FastAPI:
         finally:
             log.info("FastAPI lifespan shutdown: removing webhook...")
 
+            if metrics_server is not None:
+                metrics_server.close()
+                await metrics_server.wait_closed()
+
+            try:
+                if ingestor is not None:
+                    await ingestor.stop()
+            except Exception as e:
+                log.error(
+                    "Error stopping webhook ingestor: %s Context: service=webhook_ingest_stop",  # noqa: E501
+                    e,
+                    exc_info=True,
+                )
+
             try:
                 if _antispam_service:
                     await _antispam_service.stop()
@@ -112,8 +151,13 @@ def create_webhook_app() -> FastAPI:
 
     @app.post(config.bot.webhook_path)
     async def telegram_webhook(request: Request):
+        if ingestor is not None:
+            return await _ingest(request)
+
         try:
-            data = await request.json()
+            data, drop_reason = _read_update(await request.body())
+            if drop_reason is not None:
+                return _dropped(drop_reason)
             update = Update.model_validate(data)
             await dp.feed_webhook_update(bot, update)
             return {"ok": True}
@@ -137,4 +181,48 @@ def create_webhook_app() -> FastAPI:
 
             return {"ok": False, "error": "Internal server error"}
 
+    async def _ingest(request: Request):
+        """Minimal validation, buffer, ack - handlers run in the background."""  # noqa: E501
+        assert ingestor is not None
+        if not ingestor.accepting:
+            return ORJSONResponse(
+                {"ok": False, "error": "Not ready"},
+                status_code=503,
+                headers={"Retry-After": "1"},
+            )
+
+        data, drop_reason = _read_update(await request.body())
+        if drop_reason is not None:
+            return _dropped(drop_reason)
+        assert data is not None
+
+        if not ingestor.submit(data):
+            if prefilter is not None:
+                prefilter.forget(data["update_id"])
+            log.warning(
+                "Webhook buffer full, asking Telegram to retry: update_id=%s",
+                data["update_id"],
+            )
+            return ORJSONResponse(
+                {"ok": False, "error": "Too many requests"},
+                status_code=429,
+                headers={"Retry-After": "1"},
+            )
+        return {"ok": True}
+
+    def _read_update(body: bytes):
+        if prefilter is not None:
+            return prefilter.check(body)
+        data = parse_update(body)
+        return data, (DROP_MALFORMED if data is None else None)
+
+    def _dropped(reason: str):
+        if reason == DROP_MALFORMED:
+            system_monitor.increment_error_count()
+            log.warning("Malformed webhook update dropped")
+            return {"ok": False, "error": "Malformed update"}
+
+        log.debug("Webhook update dropped by pre-filter: reason=%s", reason)
+        return {"ok": True}
+
     return app
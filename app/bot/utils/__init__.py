@@ -1,6 +1,17 @@
 __all__ = [
     "try_delete_message",
+    "try_delete_messages",
+    "try_restrict_user",
+    "chat_permissions",
+    "ChatPermissionsCache",
+    "BulkMessageDeleter",
 ]
 
 
-from .message_actions import try_delete_message
+from .bulk_delete import BulkMessageDeleter
+from .chat_permissions import ChatPermissionsCache, chat_permissions
+from .message_actions import (
+    try_delete_message,
+    try_delete_messages,
+    try_restrict_user,
+)
@@ -0,0 +1,106 @@
+"""
+Coalesced message deletion: one deleteMessages call per chat per short window
+"""
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramNotFound,
+)
+
+from logger import get_logger
+from utils import MicroBatcher
+
+log = get_logger(__name__)
+
+# Bot API limit for deleteMessages
+MAX_BULK_DELETE = 100
+
+
+class BulkMessageDeleter:
+    """
+    Collects message ids per chat for up to `max_wait_ms` and deletes them
+    with a single deleteMessages call (at most 100 ids). Each caller gets
+    the outcome for its own message.
+
+    If the bulk call is rejected the batch falls back to one deleteMessage
+    per id, so a single bad id doesn't cost the others; if the method
+    isn't available at all (older Bot API server) bulk deletion is turned
+    off for good. A Forbidden error is raised to every caller of the batch.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        *,
+        max_size: int = MAX_BULK_DELETE,
+        max_wait_ms: int = 200,
+    ) -> None:
+        self.bot = bot
+        self._bulk_supported = True
+        self._batcher: MicroBatcher[int, int, bool] = MicroBatcher(
+            self._flush,
+            max_size=min(max_size, MAX_BULK_DELETE),
+            max_wait_s=max_wait_ms / 1000,
+            name="bulk-delete",
+        )
+
+    async def delete(self, chat_id: int, message_id: int) -> bool:
+        """Delete a message; True once Telegram accepted the deletion."""
+        return await self._batcher.submit(chat_id, message_id)
+
+    async def close(self) -> None:
+        await self._batcher.close()
+
+    async def _flush(self, chat_id: int, message_ids: list[int]) -> list[bool]:
+        if len(message_ids) == 1 or not self._bulk_supported:
+            return await self._delete_each(chat_id, message_ids)
+
+        try:
+            await self.bot.delete_messages(chat_id, message_ids)
+        except TelegramForbiddenError:
+            raise
+        except TelegramNotFound as e:
+            self._bulk_supported = False
+            log.warning(
+                "deleteMessages is not available - using single deletes: %s",
+                e,
+            )
+            return await self._delete_each(chat_id, message_ids)
+        except TelegramBadRequest as e:
+            log.warning(
+                "Bulk delete of %d messages failed in chat_id=%s, retrying one by one: %s",  # noqa: E501
+                len(message_ids),
+                chat_id,
+                e,
+            )
+            return await self._delete_each(chat_id, message_ids)
+
+        log.debug(
+            "Bulk deleted %d messages in chat_id=%s", len(message_ids), chat_id
+        )
+        return [True] * len(message_ids)
+
+    async def _delete_each(
+        self, chat_id: int, message_ids: list[int]
+    ) -> list[bool]:
+        if len(message_ids) == 1:
+            # Let the caller see the real error for its message
+            await self.bot.delete_message(chat_id, message_ids[0])
+            return [True]
+
+        results = []
+        for message_id in message_ids:
+            try:
+                await self.bot.delete_message(chat_id, message_id)
+                results.append(True)
+            except TelegramBadRequest as e:
+                log.warning(
+                    "BadRequest delete chat_id=%s msg_id=%s: %s",
+                    chat_id,
+                    message_id,
+                    e,
+                )
+                results.append(False)
+        return results
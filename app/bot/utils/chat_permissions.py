@@ -0,0 +1,95 @@
+"""
+Per-chat cache of the bot's own member status, so a deletion doesn't need
+a getChatMember call every time
+"""
+
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from aiogram import Bot
+
+from config import config
+from logger import get_logger
+from utils import SingleFlight
+
+log = get_logger(__name__)
+
+
+@dataclass(frozen=True)
+class BotChatPermissions:
+    status: Optional[str]
+    can_delete_messages: bool
+
+    @property
+    def can_delete(self) -> bool:
+        return self.status == "creator" or (
+            self.status == "administrator" and self.can_delete_messages
+        )
+
+
+class ChatPermissionsCache:
+    """
+    TTL cache of the bot's permissions per chat. Concurrent misses for the
+    same chat (e.g. a raid) share one getChatMember call. Entries are
+    dropped on my_chat_member updates and when Telegram rejects a delete,
+    so a permission change is picked up on the next message.
+    """
+
+    def __init__(self, ttl_s: Optional[float] = None) -> None:
+        self._ttl_s = ttl_s
+        self._entries: Dict[
+            Tuple[int, int], Tuple[BotChatPermissions, float]
+        ] = {}
+        self._flights: SingleFlight[Tuple[int, int], BotChatPermissions] = (
+            SingleFlight()
+        )
+
+    @property
+    def ttl_s(self) -> float:
+        if self._ttl_s is not None:
+            return self._ttl_s
+        return config.bot.permissions_cache_ttl_s
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get(self, bot: Bot, chat_id: int) -> BotChatPermissions:
+        # bot.id is parsed from the token, so no getMe call is needed
+        key = (bot.id, chat_id)
+        entry = self._entries.get(key)
+        if entry is not None:
+            permissions, expires_at = entry
+            if time.monotonic() < expires_at:
+                return permissions
+            del self._entries[key]
+
+        return await self._flights.do(key, lambda: self._load(bot, key))
+
+    async def _load(
+        self, bot: Bot, key: Tuple[int, int]
+    ) -> BotChatPermissions:
+        bot_id, chat_id = key
+        member = await bot.get_chat_member(chat_id, bot_id)
+        permissions = BotChatPermissions(
+            status=getattr(member, "status", None),
+            can_delete_messages=bool(
+                getattr(member, "can_delete_messages", False)
+            ),
+        )
+        if self.ttl_s > 0:
+            self._entries[key] = (permissions, time.monotonic() + self.ttl_s)
+        return permissions
+
+    def invalidate(self, chat_id: int, bot_id: Optional[int] = None) -> None:
+        """Forget cached permissions for a chat (for every bot if no id)."""
+        for key in list(self._entries):
+            if key[1] == chat_id and (bot_id is None or key[0] == bot_id):
+                del self._entries[key]
+                log.debug("Bot permissions cache invalidated: chat_id=%s", chat_id)  # noqa: E501
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+chat_permissions = ChatPermissionsCache()
@@ -1,47 +1,71 @@
+from typing import List, Optional
+
 from aiogram import Bot
+from aiogram.types import ChatPermissions
 from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
 
 from logger import get_logger
 from app.antispam.dto import MessageTask
+from app.metrics import DELETIONS
+from .bulk_delete import MAX_BULK_DELETE, BulkMessageDeleter
+from .chat_permissions import chat_permissions
 
 log = get_logger(__name__)
 
 
-async def try_delete_message(bot: Bot, task: MessageTask) -> None:
+async def try_delete_message(
+    bot: Bot,
+    task: MessageTask,
+    deleter: Optional[BulkMessageDeleter] = None,
+) -> bool:
+    """
+    Delete the task's message if the bot is allowed to. With a `deleter`
+    the deletion is coalesced with other deletions in the same chat.
+    Returns True if the message was deleted.
+    """
     try:
-        me = await bot.get_me()
-        member = await bot.get_chat_member(task.telegram_chat_id, me.id)
-
-        can_delete = bool(getattr(member, "can_delete_messages", False))
-        is_owner = getattr(member, "status", None) == "creator"
-        is_admin = getattr(member, "status", None) == "administrator"
+        permissions = await chat_permissions.get(bot, task.telegram_chat_id)
 
-        if not (is_owner or (is_admin and can_delete)):
+        if not permissions.can_delete:
             log.warning(
                 "No permission to delete messages in chat_id=%s (status=%s can_delete=%s)",  # noqa: E501
                 task.telegram_chat_id,
-                getattr(member, "status", None),
-                can_delete,
+                permissions.status,
+                permissions.can_delete_messages,
             )
-            return
+            DELETIONS.inc(kind="message", result="no_permission")
+            return False
 
-        await bot.delete_message(
-            task.telegram_chat_id,
-            task.telegram_message_id
-        )
+        if deleter is not None:
+            deleted = await deleter.delete(
+                task.telegram_chat_id, task.telegram_message_id
+            )
+            if not deleted:
+                DELETIONS.inc(kind="message", result="failed")
+                return False
+        else:
+            await bot.delete_message(
+                task.telegram_chat_id,
+                task.telegram_message_id
+            )
         log.info(
             "Deleted message_id=%s chat_id=%s user_id=%s",
             task.telegram_message_id,
             task.telegram_chat_id,
             task.telegram_user_id,
         )
+        DELETIONS.inc(kind="message", result="deleted")
+        return True
 
     except TelegramForbiddenError:
+        chat_permissions.invalidate(task.telegram_chat_id, bot.id)
         log.warning(
             "Forbidden: cannot delete in chat_id=%s",
             task.telegram_chat_id
         )
     except TelegramBadRequest as e:
+        # Also raised when the bot lost its admin rights
+        chat_permissions.invalidate(task.telegram_chat_id, bot.id)
         log.warning(
             "BadRequest delete chat_id=%s msg_id=%s: %s",
             task.telegram_chat_id,
@@ -50,3 +74,71 @@ async def try_delete_message(bot: Bot, task: MessageTask) -> None:
         )
     except Exception as e:
         log.exception("Unexpected error while trying to delete message: %s", e)
+    DELETIONS.inc(kind="message", result="failed")
+    return False
+
+
+async def try_delete_messages(
+    bot: Bot, chat_id: int, message_ids: List[int]
+) -> bool:
+    """
+    Delete several messages of one chat with deleteMessages (100 ids per
+    call). Messages that are already gone are skipped by Telegram.
+    Returns True if every call succeeded.
+    """
+    try:
+        permissions = await chat_permissions.get(bot, chat_id)
+        if not permissions.can_delete:
+            log.warning(
+                "No permission to delete messages in chat_id=%s (status=%s can_delete=%s)",  # noqa: E501
+                chat_id,
+                permissions.status,
+                permissions.can_delete_messages,
+            )
+            DELETIONS.inc(len(message_ids), kind="bulk", result="no_permission")  # noqa: E501
+            return False
+
+        for i in range(0, len(message_ids), MAX_BULK_DELETE):
+            await bot.delete_messages(
+                chat_id, message_ids[i:i + MAX_BULK_DELETE]
+            )
+        log.info(
+            "Deleted %d messages in chat_id=%s", len(message_ids), chat_id
+        )
+        DELETIONS.inc(len(message_ids), kind="bulk", result="deleted")
+        return True
+
+    except TelegramForbiddenError:
+        chat_permissions.invalidate(chat_id, bot.id)
+        log.warning("Forbidden: cannot delete in chat_id=%s", chat_id)
+    except TelegramBadRequest as e:
+        chat_permissions.invalidate(chat_id, bot.id)
+        log.warning(
+            "BadRequest bulk delete chat_id=%s msg_ids=%s: %s",
+            chat_id,
+            message_ids,
+            e,
+        )
+    except Exception as e:
+        log.exception("Unexpected error while trying to delete messages: %s", e)  # noqa: E501
+    DELETIONS.inc(len(message_ids), kind="bulk", result="failed")
+    return False
+
+
+async def try_restrict_user(bot: Bot, chat_id: int, user_id: int) -> bool:
+    """Take away the user's right to send messages in the chat."""
+    try:
+        await bot.restrict_chat_member(
+            chat_id,
+            user_id,
+            permissions=ChatPermissions(can_send_messages=False),
+        )
+        log.info("Restricted user_id=%s in chat_id=%s", user_id, chat_id)
+        return True
+    except (TelegramForbiddenError, TelegramBadRequest) as e:
+        log.warning(
+            "Cannot restrict user_id=%s in chat_id=%s: %s", user_id, chat_id, e
+        )
+    except Exception as e:
+        log.exception("Unexpected error while trying to restrict user: %s", e)
+    return False
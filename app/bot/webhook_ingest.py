@@ -0,0 +1,115 @@
+"""
+Immediate-ack webhook ingestion: updates are buffered and dispatched by a
+pool of background tasks, so the HTTP response doesn't wait for handlers
+"""
+
+import asyncio
+from typing import Any, Dict
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+
+from app.antispam.utils import get_sentinel
+from app.monitoring import system_monitor
+from logger import get_logger
+
+log = get_logger(__name__)
+
+_SENTINEL = get_sentinel()
+
+
+class WebhookIngestor:
+    """
+    Bounded buffer of raw webhook updates plus `workers` dispatcher tasks
+    that validate them into aiogram Updates and feed the dispatcher.
+
+    submit() never waits: when the buffer is full it returns False and
+    the webhook answers with 429, so Telegram redelivers the update later
+    instead of us queueing without bound.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        dp: Dispatcher,
+        *,
+        buffer_size: int = 1000,
+        workers: int = 8,
+    ) -> None:
+        self.bot = bot
+        self.dp = dp
+        self.workers = workers
+        self.buffer: asyncio.Queue[Dict[str, Any] | object] = asyncio.Queue(
+            maxsize=buffer_size
+        )
+        self._tasks: list[asyncio.Task[None]] = []
+        self._accepting = False
+
+    @property
+    def accepting(self) -> bool:
+        return self._accepting
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._tasks = [
+            asyncio.create_task(
+                self._dispatch_loop(i), name=f"webhook-dispatcher-{i}"
+            )
+            for i in range(self.workers)
+        ]
+        self._accepting = True
+        log.info(
+            "Webhook ingestor started: buffer_size=%s, workers=%s",
+            self.buffer.maxsize,
+            self.workers,
+        )
+
+    async def stop(self) -> None:
+        """Stop accepting updates and finish the buffered ones."""
+        if not self._tasks:
+            return
+        self._accepting = False
+
+        for _ in self._tasks:
+            await self.buffer.put(_SENTINEL)
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+        self._tasks.clear()
+        log.info("Webhook ingestor stopped")
+
+    def submit(self, data: Dict[str, Any]) -> bool:
+        """Buffer a raw update. False if saturated or not running."""
+        if not self._accepting:
+            return False
+        try:
+            self.buffer.put_nowait(data)
+        except asyncio.QueueFull:
+            system_monitor.increment_webhook_rejected()
+            return False
+        system_monitor.set_webhook_buffer_depth(self.buffer.qsize())
+        return True
+
+    async def _dispatch_loop(self, idx: int) -> None:
+        while True:
+            item = await self.buffer.get()
+            try:
+                if item is _SENTINEL:
+                    return
+                await self._dispatch(item)  # type: ignore[arg-type]
+            finally:
+                self.buffer.task_done()
+                system_monitor.set_webhook_buffer_depth(self.buffer.qsize())
+
+    async def _dispatch(self, data: Dict[str, Any]) -> None:
+        try:
+            update = Update.model_validate(data, context={"bot": self.bot})
+            await self.dp.feed_update(self.bot, update)
+        except Exception as e:
+            system_monitor.increment_error_count()
+            log.error(
+                "Error dispatching webhook update: %s Context: service=webhook_dispatcher, update_id=%s",  # noqa: E501
+                e,
+                data.get("update_id"),
+                exc_info=True,
+            )
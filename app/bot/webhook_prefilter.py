@@ -0,0 +1,112 @@
+"""
+Cheap webhook pre-filter: drops updates that no handler would act on
+before they are validated into aiogram Updates
+"""
+
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import orjson
+
+from app.antispam.utils import TTLSet
+from app.monitoring import system_monitor
+from config import config
+
+GROUP_CHAT_TYPES = ("group", "supergroup")
+
+DROP_MALFORMED = "malformed"
+DROP_DUPLICATE = "duplicate"
+DROP_UPDATE_TYPE = "update_type"
+DROP_ADMIN_MESSAGE = "admin_message"
+
+
+def parse_update(body: bytes) -> Optional[Dict[str, Any]]:
+    """Raw webhook body -> update dict, or None if it isn't an update."""
+    try:
+        data = orjson.loads(body)
+    except orjson.JSONDecodeError:
+        return None
+    if not isinstance(data, dict) or not isinstance(data.get("update_id"), int):  # noqa: E501
+        return None
+    return data
+
+
+class UpdatePreFilter:
+    """
+    Looks only at update_id, the update type, chat.type and from.id of the
+    raw JSON body:
+
+    - update types outside `allowed_updates` are dropped;
+    - an update_id seen within `dedupe_ttl_s` is a Telegram redelivery;
+    - group messages of the main admin are skipped by the antispam handler
+      anyway. One per chat every `admin_chat_ttl_s` still goes through so
+      the chat keeps being registered and its title refreshed.
+
+    Every drop is counted per reason in system_monitor.webhook_dropped.
+    """
+
+    def __init__(
+        self,
+        allowed_updates: Optional[Iterable[str]] = None,
+        admin_id: Optional[int] = None,
+        *,
+        dedupe_ttl_s: int = 600,
+        dedupe_max_size: int = 10_000,
+        admin_chat_ttl_s: int = 3600,
+    ) -> None:
+        self.allowed_updates = frozenset(
+            config.bot.allowed_updates
+            if allowed_updates is None
+            else allowed_updates
+        )
+        self.admin_id = config.bot.main_admin_id if admin_id is None else admin_id  # noqa: E501
+        self._seen = TTLSet(ttl_s=dedupe_ttl_s, max_size=dedupe_max_size)
+        self._admin_chats = TTLSet(ttl_s=admin_chat_ttl_s, max_size=1000)
+
+    def check(
+        self, body: bytes
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """
+        Parse the body and decide whether to dispatch it.
+
+        Returns (update data, None) to dispatch, or (data or None, reason)
+        to drop.
+        """
+        data = parse_update(body)
+        if data is None:
+            return self._drop(None, DROP_MALFORMED)
+
+        update_type = next((k for k in data if k != "update_id"), None)
+        if update_type not in self.allowed_updates:
+            return self._drop(data, DROP_UPDATE_TYPE)
+
+        if update_type == "message" and self._is_admin_group_message(
+            data["message"]
+        ):
+            return self._drop(data, DROP_ADMIN_MESSAGE)
+
+        if not self._seen.add_if_new(data["update_id"]):
+            return self._drop(data, DROP_DUPLICATE)
+
+        return data, None
+
+    def forget(self, update_id: int) -> None:
+        """Let a redelivery of an update we could not take through again."""
+        self._seen.discard(update_id)
+
+    def _is_admin_group_message(self, message: Any) -> bool:
+        if not isinstance(message, dict):
+            return False
+        chat = message.get("chat") or {}
+        sender = message.get("from") or {}
+        if chat.get("type") not in GROUP_CHAT_TYPES:
+            return False
+        if sender.get("id") != self.admin_id:
+            return False
+        return not self._admin_chats.add_if_new(chat.get("id"))
+
+    @staticmethod
+    def _drop(
+        data: Optional[Dict[str, Any]], reason: str
+    ) -> Tuple[Optional[Dict[str, Any]], str]:
+        system_monitor.increment_webhook_dropped(reason)
+        return data, reason
@@ -4,7 +4,7 @@ from typing import Optional
 from config import config
 from ai_client.service import AIService
 from app.db import DataBaseHelper
-from app.services.chat_registry import ChatRegistry
+from app.services.chat_registry import ChatRegistry, chat_registry
 from logger import get_logger
 
 log = get_logger(__name__)
@@ -16,6 +16,8 @@ class AppContainer:
     db: DataBaseHelper
     chat_registry: ChatRegistry
     ai_service: Optional[AIService]
+    # Small-model tier of the cascade (config.ai.cascade)
+    ai_small_service: Optional[AIService] = None
 
 
 _container: Optional[AppContainer] = None
@@ -37,23 +39,27 @@ def init_container() -> AppContainer:
     log.info("Initializing database...")
     db.run_migrations()
 
-    log.info("Initializing chat registry with TTL=%d seconds", 3600)
-    chat_registry = ChatRegistry(ttl_seconds=3600)
+    log.info(
+        "Initializing chat registry: ttl=%ss max_size=%s",
+        chat_registry.ttl_s,
+        chat_registry.max_size,
+    )
 
     # Initialize AI service only if it's enabled and configuration is provided
     ai_service = None
+    backends = config.ai.resolved_backends()
     required_ai_fields = [
         ('ai_enabled', config.bot.ai_enabled),
-        ('base_url', config.ai.base_url),
-        ('api_key', config.ai.api_key),
-        ('model', config.ai.model),
+        ('base_url', bool(backends)),
+        ('api_key', all(b.api_key for b in backends)),
+        ('model', all(b.model for b in backends)),
     ]
 
     # Check which fields are missing for better observability
     missing_fields = [field for field, value in required_ai_fields if not value]  # noqa: E501
 
     if all(value for _, value in required_ai_fields):
-        log.info("Initializing AI service with model: %s (AI enabled)", config.ai.model)  # noqa: E501
+        log.info("Initializing AI service with %d backend(s) (AI enabled)", len(backends))  # noqa: E501
         ai_service = AIService()
     elif config.bot.ai_enabled:
         log.warning("AI service is enabled but configuration is incomplete. Missing: %s", missing_fields)  # noqa: E501
@@ -61,8 +67,21 @@ def init_container() -> AppContainer:
     else:
         log.info("AI service is disabled - skipping initialization")
 
+    ai_small_service = None
+    if ai_service is not None and config.ai.cascade.enabled:
+        small_backends = config.ai.resolved_cascade_backends()
+        if small_backends:
+            log.info("Initializing small-model AI tier with %d backend(s)", len(small_backends))  # noqa: E501
+            ai_small_service = AIService(backends=small_backends)
+        else:
+            log.warning("AI cascade is enabled but neither APP_AI_CASCADE_BACKENDS nor APP_AI_CASCADE_MODEL is set - cascade disabled")  # noqa: E501
+
     _container = AppContainer(
-        cfg=config, db=db, chat_registry=chat_registry, ai_service=ai_service
+        cfg=config,
+        db=db,
+        chat_registry=chat_registry,
+        ai_service=ai_service,
+        ai_small_service=ai_small_service,
     )
     log.info(
         "Container initialized successfully with database, chat registry, and AI service"  # noqa: E501
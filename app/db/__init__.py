@@ -2,6 +2,7 @@ __all__ = [
     "DataBaseHelper",
     "Chat",
     "UserState",
+    "SpammerReputation",
 ]
 
 
@@ -9,4 +10,5 @@ from .helper import DataBaseHelper
 from .models import (
     Chat,
     UserState,
+    SpammerReputation,
 )
@@ -1,3 +1,4 @@
+import time
 from pathlib import Path
 
 from alembic import command
@@ -9,14 +10,32 @@ from sqlalchemy.ext.asyncio import (
     AsyncSession,
 )
 from sqlalchemy import event
+from sqlalchemy.orm import Session
 from sqlalchemy.pool import NullPool
 from contextlib import asynccontextmanager
 
+from app.metrics import DB_COMMIT_SECONDS
 from logger import get_logger
 
 log = get_logger(__name__)
 
 
+class TimedSession(Session):
+    """Session whose commits are observed in DB_COMMIT_SECONDS."""
+
+
+@event.listens_for(TimedSession, "before_commit")
+def _commit_started(session: Session) -> None:
+    session.info["commit_started"] = time.perf_counter()
+
+
+@event.listens_for(TimedSession, "after_commit")
+def _commit_finished(session: Session) -> None:
+    started = session.info.pop("commit_started", None)
+    if started is not None:
+        DB_COMMIT_SECONDS.observe(time.perf_counter() - started)
+
+
 class DataBaseHelper:
     def __init__(self, url: str, echo: bool = False, timeout: int = 30):
         if not url.startswith("sqlite"):
@@ -39,6 +58,7 @@ class DataBaseHelper:
 
         self.session_factory: async_sessionmaker[AsyncSession] = async_sessionmaker(
             bind=self.engine,
+            sync_session_class=TimedSession,
             autoflush=False,
             autocommit=False,
             expire_on_commit=False,
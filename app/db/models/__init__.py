@@ -1,8 +1,10 @@
 __all__ = [
     "Chat",
     "UserState",
+    "SpammerReputation",
 ]
 
 
 from .chat import Chat
 from .user_state import UserState
+from .spammer_reputation import SpammerReputation
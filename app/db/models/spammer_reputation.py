@@ -0,0 +1,23 @@
+from datetime import datetime
+
+from sqlalchemy import BigInteger, DateTime, Float, Integer
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+from utils import utc_now
+
+
+class SpammerReputation(Base):
+    """Cross-chat spam record of a Telegram user (decays over time)."""
+
+    telegram_user_id: Mapped[int] = mapped_column(
+        BigInteger, unique=True, index=True, nullable=False
+    )
+    # Decayed score as of last_hit_at
+    score: Mapped[float] = mapped_column(Float, default=0.0, nullable=False)
+    hits: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    last_hit_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=utc_now,
+        nullable=False,
+    )
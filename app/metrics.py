@@ -0,0 +1,400 @@
+"""
+Prometheus-compatible metrics: counters, gauges and latency histograms,
+exposed in the text exposition format at /metrics on a side server
+"""
+
+import asyncio
+import math
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from config import config
+from logger import get_logger
+
+log = get_logger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; covers cache hits (sub-ms) up to slow AI calls
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+# (name suffix, labels, value)
+Sample = Tuple[str, Dict[str, str], float]
+# (name, type, help, samples)
+Family = Tuple[str, str, str, List[Sample]]
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_sample(name: str, labels: Dict[str, str], value: float) -> str:
+    if labels:
+        pairs = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+        return f"{name}{{{pairs}}} {_format_value(value)}"
+    return f"{name} {_format_value(value)}"
+
+
+class _Metric:
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):  # noqa: E501
+        self.name = name
+        self.documentation = documentation
+        self.labelnames: Tuple[str, ...] = tuple(labelnames)
+
+    def _key(self, labels: Dict[str, object]) -> LabelValues:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(
+                f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}"  # noqa: E501
+            )
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def _labels(self, key: LabelValues) -> Dict[str, str]:
+        return dict(zip(self.labelnames, key))
+
+    def samples(self) -> List[Sample]:
+        raise NotImplementedError
+
+    def collect(self) -> Family:
+        return self.name, self.type_name, self.documentation, self.samples()
+
+
+class Counter(_Metric):
+    """Monotonic counter; exported with the `_total` suffix."""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):  # noqa: E501
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: object) -> None:
+        if amount < 0:
+            raise ValueError("Counters can only be increased")
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels: object) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[Sample]:
+        return [
+            ("_total", self._labels(key), value)
+            for key, value in self._values.items()
+        ]
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):  # noqa: E501
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels: object) -> None:
+        self._values[self._key(labels)] = value
+
+    def get(self, **labels: object) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[Sample]:
+        return [
+            ("", self._labels(key), value)
+            for key, value in self._values.items()
+        ]
+
+
+class _HistogramValue:
+    __slots__ = ("buckets", "sum", "count")
+
+    def __init__(self, size: int) -> None:
+        self.buckets = [0] * size
+        self.sum = 0.0
+        self.count = 0
+
+
+class Histogram(_Metric):
+    """
+    Cumulative-bucket histogram, so p50/p95/p99 can be computed with
+    histogram_quantile() on the Prometheus side.
+    """
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets: Tuple[float, ...] = tuple(sorted(buckets))
+        self._values: Dict[LabelValues, _HistogramValue] = {}
+
+    def observe(self, value: float, **labels: object) -> None:
+        key = self._key(labels)
+        hv = self._values.get(key)
+        if hv is None:
+            hv = self._values[key] = _HistogramValue(len(self.buckets))
+        i = bisect_left(self.buckets, value)
+        if i < len(self.buckets):
+            hv.buckets[i] += 1
+        hv.sum += value
+        hv.count += 1
+
+    @contextmanager
+    def time(self, **labels: object) -> Iterator[None]:
+        """
+        Observe the wall time of the `with` block, also on errors. Cancelled
+        blocks (e.g. AI prompts made moot by another hit) are not observed.
+        """
+        started = time.perf_counter()
+        cancelled = False
+        try:
+            yield
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+        finally:
+            if not cancelled:
+                self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels: object) -> int:
+        hv = self._values.get(self._key(labels))
+        return hv.count if hv is not None else 0
+
+    def samples(self) -> List[Sample]:
+        samples: List[Sample] = []
+        for key, hv in self._values.items():
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, n in zip(self.buckets, hv.buckets):
+                cumulative += n
+                samples.append(
+                    ("_bucket", {**labels, "le": _format_value(bound)}, cumulative)  # noqa: E501
+                )
+            samples.append(("_bucket", {**labels, "le": "+Inf"}, hv.count))
+            samples.append(("_sum", labels, hv.sum))
+            samples.append(("_count", labels, hv.count))
+        return samples
+
+
+class MetricsRegistry:
+    """
+    Holds the metrics and renders them. Collectors add families computed
+    at scrape time (e.g. the SystemMonitor counters).
+    """
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], Iterable[Family]]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:  # noqa: E501
+        metric = Counter(name, documentation, labelnames)
+        self.register(metric)
+        return metric
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:  # noqa: E501
+        metric = Gauge(name, documentation, labelnames)
+        self.register(metric)
+        return metric
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self.register(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], Iterable[Family]]) -> None:  # noqa: E501
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        families: List[Family] = [m.collect() for m in self._metrics.values()]
+        for collector in self._collectors:
+            try:
+                families.extend(collector())
+            except Exception as e:
+                log.warning("Metrics collector failed: %s", e)
+
+        lines: List[str] = []
+        for name, type_name, documentation, samples in families:
+            lines.append(f"# HELP {name} {_escape(documentation)}")
+            lines.append(f"# TYPE {name} {type_name}")
+            for suffix, labels, value in samples:
+                lines.append(_format_sample(name + suffix, labels, value))
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+QUEUE_WAIT_SECONDS = registry.histogram(
+    "tgantispam_queue_wait_seconds",
+    "Time an anti-spam task waited in the queue before a worker took it",
+)
+QUEUE_DEPTH = registry.gauge(
+    "tgantispam_queue_depth",
+    "Anti-spam tasks waiting in the queue",
+)
+STAGE_SECONDS = registry.histogram(
+    "tgantispam_stage_seconds",
+    "Latency of one stage of message processing",
+    ["stage"],
+)
+MESSAGE_SECONDS = registry.histogram(
+    "tgantispam_message_seconds",
+    "Total processing time of a message by a worker",
+    ["result"],
+)
+AI_REQUEST_SECONDS = registry.histogram(
+    "tgantispam_ai_request_seconds",
+    "Latency of AI scoring per prompt index ('combined' for one request with all prompts)",  # noqa: E501
+    ["prompt", "tier"],
+)
+DB_COMMIT_SECONDS = registry.histogram(
+    "tgantispam_db_commit_seconds",
+    "Latency of database commits (including the final flush)",
+)
+DELETIONS = registry.counter(
+    "tgantispam_deletions",
+    "Messages the bot tried to delete",
+    ["kind", "result"],
+)
+
+
+def _system_monitor_families() -> Iterable[Family]:
+    """Export the SystemMonitor counters (admin /metrics command) as gauges."""  # noqa: E501
+    from app.monitoring import system_monitor
+
+    for attr, value in vars(system_monitor).items():
+        if attr.startswith("_"):
+            continue
+        name = f"tgantispam_monitor_{attr}"
+        if isinstance(value, bool):
+            continue
+        if isinstance(value, (int, float)):
+            yield name, "gauge", f"SystemMonitor.{attr}", [("", {}, value)]
+        elif isinstance(value, str):
+            yield name, "gauge", f"SystemMonitor.{attr}", [
+                ("", {"value": value}, 1)
+            ]
+        elif isinstance(value, dict):
+            yield name, "gauge", f"SystemMonitor.{attr}", [
+                ("", {"key": str(k)}, v) for k, v in sorted(value.items())
+            ]
+
+
+registry.add_collector(_system_monitor_families)
+
+
+def render_metrics() -> str:
+    return registry.render()
+
+
+async def _handle_scrape(
+    reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+) -> None:
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+        # Skip the headers, the request has no body we care about
+        while True:
+            line = await asyncio.wait_for(reader.readline(), timeout=5)
+            if line in (b"\r\n", b"\n", b""):
+                break
+
+        parts = request_line.split()
+        path = parts[1].split(b"?", 1)[0] if len(parts) >= 2 else b""
+        if parts[:1] == [b"GET"] and path == b"/metrics":
+            status, content_type = "200 OK", CONTENT_TYPE
+            body = render_metrics().encode()
+        else:
+            status, content_type = "404 Not Found", "text/plain"
+            body = b"Not Found\n"
+
+        writer.write(
+            (
+                f"HTTP/1.1 {status}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                "Connection: close\r\n\r\n"
+            ).encode()
+            + body
+        )
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    except Exception as e:
+        log.warning("Error serving metrics: %s", e)
+    finally:
+        writer.close()
+
+
+async def start_metrics_server(
+    port: int, host: Optional[str] = "127.0.0.1"
+) -> asyncio.Server:
+    """
+    Serve GET /metrics on a side port, apart from the public webhook app.
+    Close the returned server on shutdown.
+    """
+    server = await asyncio.start_server(_handle_scrape, host, port)
+    log.info("Metrics available at http://%s:%s/metrics", host, port)
+    return server
+
+
+async def start_configured_metrics_server() -> Optional[asyncio.Server]:
+    """The side server if metrics are enabled; errors are only logged."""
+    if not config.bot.metrics_enabled:
+        return None
+    try:
+        return await start_metrics_server(
+            config.bot.metrics_port, host=config.bot.metrics_host
+        )
+    except OSError as e:
+        log.error(
+            "Error starting metrics server: %s Context: service=metrics, port=%s",  # noqa: E501
+            e,
+            config.bot.metrics_port,
+        )
+        return None
@@ -5,6 +5,7 @@ Monitoring utilities for system metrics and statistics
 import time
 from datetime import datetime
 from dataclasses import dataclass, field
+from typing import Dict
 
 from sqlalchemy import func, select
 
@@ -30,6 +31,33 @@ class SystemMetrics:
     ai_enabled: bool
     antispam_queue_size: int
     antispam_workers: int
+    ai_circuit_state: str = "closed"
+    ai_circuit_transitions: int = 0
+    ai_circuit_rejections: int = 0
+    ai_concurrency_limit: int = 0
+    ai_hedged_requests: int = 0
+    ai_failovers: int = 0
+    ai_requests_coalesced: int = 0
+    ai_deadline_exceeded: int = 0
+    ai_cascade_decisions: int = 0
+    ai_cascade_escalations: int = 0
+    spam_history_purged: int = 0
+    reputation_blocked: int = 0
+    trusted_shortcuts: int = 0
+    joins_recorded: int = 0
+    chat_cache_hits: int = 0
+    chat_cache_misses: int = 0
+    chat_cache_evictions: int = 0
+    chat_cache_db_loads: int = 0
+    telegram_queue_depth: int = 0
+    telegram_queue_peak: int = 0
+    telegram_retry_after: int = 0
+    webhook_buffer_depth: int = 0
+    webhook_buffer_peak: int = 0
+    webhook_rejected: int = 0
+    webhook_dropped: Dict[str, int] = field(default_factory=dict)
+    update_enqueue_latency_avg_ms: float = 0.0
+    update_enqueue_latency_max_ms: float = 0.0
     timestamp: datetime = field(default_factory=utc_now)
 
 
@@ -42,6 +70,34 @@ class SystemMonitor:
         self.error_count = 0
         self.spam_blocked_count = 0
         self.ai_requests_count = 0
+        self.ai_circuit_state = "closed"
+        self.ai_circuit_transitions = 0
+        self.ai_circuit_rejections = 0
+        self.ai_concurrency_limit = 0
+        self.ai_hedged_requests = 0
+        self.ai_failovers = 0
+        self.ai_requests_coalesced = 0
+        self.ai_deadline_exceeded = 0
+        self.ai_cascade_decisions = 0
+        self.ai_cascade_escalations = 0
+        self.spam_history_purged = 0
+        self.reputation_blocked = 0
+        self.trusted_shortcuts = 0
+        self.joins_recorded = 0
+        self.chat_cache_hits = 0
+        self.chat_cache_misses = 0
+        self.chat_cache_evictions = 0
+        self.chat_cache_db_loads = 0
+        self.telegram_queue_depth = 0
+        self.telegram_queue_peak = 0
+        self.telegram_retry_after = 0
+        self.webhook_buffer_depth = 0
+        self.webhook_buffer_peak = 0
+        self.webhook_rejected = 0
+        self.webhook_dropped: Dict[str, int] = {}
+        self.update_enqueue_latency_avg_ms = 0.0
+        self.update_enqueue_latency_max_ms = 0.0
+        self._update_enqueue_count = 0
         self._last_metrics = {}
 
     def increment_request_count(self):
@@ -56,10 +112,110 @@ class SystemMonitor:
         """Increment the spam blocked counter."""
         self.spam_blocked_count += 1
 
+    def increment_spam_history_purged(self, count: int):
+        """Count earlier messages of a spammer deleted together with the spam."""  # noqa: E501
+        self.spam_history_purged += count
+
+    def increment_reputation_blocked(self):
+        """Increment the counter of messages of known spammers deleted without AI."""  # noqa: E501
+        self.reputation_blocked += 1
+
+    def increment_trusted_shortcuts(self):
+        """Count group messages dropped early (trusted sender / inactive chat)."""  # noqa: E501
+        self.trusted_shortcuts += 1
+
+    def increment_joins_recorded(self, count: int):
+        """Count member joins written from chat_member updates."""
+        self.joins_recorded += count
+
+    def increment_chat_cache_hits(self):
+        """Increment the counter of chat lookups served from memory."""
+        self.chat_cache_hits += 1
+
+    def increment_chat_cache_misses(self):
+        """Increment the counter of chat lookups not found in memory."""
+        self.chat_cache_misses += 1
+
+    def increment_chat_cache_evictions(self):
+        """Increment the counter of chats dropped from the full cache."""
+        self.chat_cache_evictions += 1
+
+    def increment_chat_cache_db_loads(self):
+        """Increment the counter of chat queries (shared misses count once)."""  # noqa: E501
+        self.chat_cache_db_loads += 1
+
     def increment_ai_requests_count(self):
         """Increment the AI requests counter."""
         self.ai_requests_count += 1
 
+    def set_ai_circuit_state(self, state: str):
+        """Record an AI circuit breaker state transition."""
+        self.ai_circuit_state = state
+        self.ai_circuit_transitions += 1
+
+    def increment_ai_circuit_rejections(self):
+        """Increment the counter of AI requests rejected by the open circuit."""  # noqa: E501
+        self.ai_circuit_rejections += 1
+
+    def set_ai_concurrency_limit(self, limit: int):
+        """Record the current AI concurrency limit."""
+        self.ai_concurrency_limit = limit
+
+    def increment_ai_hedged_requests(self):
+        """Increment the counter of hedged (duplicate) AI requests."""
+        self.ai_hedged_requests += 1
+
+    def increment_ai_failovers(self):
+        """Increment the counter of AI requests retried on another backend."""  # noqa: E501
+        self.ai_failovers += 1
+
+    def increment_ai_requests_coalesced(self):
+        """Increment the counter of AI requests served by an identical in-flight one."""  # noqa: E501
+        self.ai_requests_coalesced += 1
+
+    def increment_ai_deadline_exceeded(self):
+        """Increment the counter of messages whose AI verdict missed the deadline."""  # noqa: E501
+        self.ai_deadline_exceeded += 1
+
+    def record_ai_cascade(self, escalated: bool):
+        """Record a small-model cascade decision and whether it escalated."""
+        self.ai_cascade_decisions += 1
+        if escalated:
+            self.ai_cascade_escalations += 1
+
+    def set_telegram_queue_depth(self, depth: int):
+        """Record the number of Bot API requests waiting to be sent."""
+        self.telegram_queue_depth = depth
+        self.telegram_queue_peak = max(self.telegram_queue_peak, depth)
+
+    def increment_telegram_retry_after(self):
+        """Increment the counter of Bot API flood-control (429) responses."""  # noqa: E501
+        self.telegram_retry_after += 1
+
+    def set_webhook_buffer_depth(self, depth: int):
+        """Record the number of webhook updates waiting for dispatch."""
+        self.webhook_buffer_depth = depth
+        self.webhook_buffer_peak = max(self.webhook_buffer_peak, depth)
+
+    def increment_webhook_rejected(self):
+        """Increment the counter of webhook updates refused with 429 (buffer full)."""  # noqa: E501
+        self.webhook_rejected += 1
+
+    def observe_update_enqueue_latency(self, seconds: float):
+        """Record the delay between fetching an update and queueing its task."""  # noqa: E501
+        ms = seconds * 1000
+        self._update_enqueue_count += 1
+        self.update_enqueue_latency_avg_ms += (
+            ms - self.update_enqueue_latency_avg_ms
+        ) / self._update_enqueue_count
+        self.update_enqueue_latency_max_ms = max(
+            self.update_enqueue_latency_max_ms, ms
+        )
+
+    def increment_webhook_dropped(self, reason: str):
+        """Count a webhook update dropped by the pre-filter, per reason."""
+        self.webhook_dropped[reason] = self.webhook_dropped.get(reason, 0) + 1
+
     def get_uptime(self) -> float:
         """Get system uptime in seconds."""
         return time.time() - self.start_time
@@ -105,6 +261,33 @@ class SystemMonitor:
             ai_enabled=ai_enabled,
             antispam_queue_size=antispam_queue_size,
             antispam_workers=antispam_workers,
+            ai_circuit_state=self.ai_circuit_state,
+            ai_circuit_transitions=self.ai_circuit_transitions,
+            ai_circuit_rejections=self.ai_circuit_rejections,
+            ai_concurrency_limit=self.ai_concurrency_limit,
+            ai_hedged_requests=self.ai_hedged_requests,
+            ai_failovers=self.ai_failovers,
+            ai_requests_coalesced=self.ai_requests_coalesced,
+            ai_deadline_exceeded=self.ai_deadline_exceeded,
+            ai_cascade_decisions=self.ai_cascade_decisions,
+            ai_cascade_escalations=self.ai_cascade_escalations,
+            spam_history_purged=self.spam_history_purged,
+            reputation_blocked=self.reputation_blocked,
+            trusted_shortcuts=self.trusted_shortcuts,
+            joins_recorded=self.joins_recorded,
+            chat_cache_hits=self.chat_cache_hits,
+            chat_cache_misses=self.chat_cache_misses,
+            chat_cache_evictions=self.chat_cache_evictions,
+            chat_cache_db_loads=self.chat_cache_db_loads,
+            telegram_queue_depth=self.telegram_queue_depth,
+            telegram_queue_peak=self.telegram_queue_peak,
+            telegram_retry_after=self.telegram_retry_after,
+            webhook_buffer_depth=self.webhook_buffer_depth,
+            webhook_buffer_peak=self.webhook_buffer_peak,
+            webhook_rejected=self.webhook_rejected,
+            webhook_dropped=dict(self.webhook_dropped),
+            update_enqueue_latency_avg_ms=self.update_enqueue_latency_avg_ms,
+            update_enqueue_latency_max_ms=self.update_enqueue_latency_max_ms,
         )
 
         self._last_metrics = metrics
@@ -118,16 +301,51 @@ class SystemMonitor:
         hours = (uptime_seconds % 86400) // 3600
         minutes = (uptime_seconds % 3600) // 60
         uptime_str = f"{days}d {hours}h {minutes}m"
+        webhook_dropped = (
+            ", ".join(
+                f"{reason}: {count}"
+                for reason, count in sorted(metrics.webhook_dropped.items())
+            )
+            or "0"
+        )
 
         report = (
             "📊 <b>System Metrics Report</b>\n\n"
             f"⏱️ <b>Uptime:</b> {uptime_str}\n"
             f"📥 <b>Messages Processed:</b> {metrics.requests_processed}\n"
             f"❌ <b>Errors Encountered:</b> {metrics.errors_encountered}\n"
-            f"🛡️ <b>Spam Blocked:</b> {metrics.spam_messages_blocked}\n"
-            f"✅ <b>Trusted Users:</b> {metrics.trusted_users}\n"
+            f"🛡️ <b>Spam Blocked:</b> {metrics.spam_messages_blocked} "
+            f"(+{metrics.spam_history_purged} earlier messages)\n"
+            f"<b>Known Spammers Blocked:</b> {metrics.reputation_blocked}\n"
+            f"✅ <b>Trusted Users:</b> {metrics.trusted_users} "
+            f"(skipped early: {metrics.trusted_shortcuts})\n"
+            f"<b>Member Joins Recorded:</b> {metrics.joins_recorded}\n"
             f"<b>AI Enabled:</b> {'Yes' if metrics.ai_enabled else 'No'}\n"
-            f"<b>AI Requests:</b> {metrics.ai_requests_made}\n"
+            f"<b>AI Requests:</b> {metrics.ai_requests_made} "
+            f"(coalesced: {metrics.ai_requests_coalesced})\n"
+            f"<b>AI Circuit:</b> {metrics.ai_circuit_state} "
+            f"(transitions: {metrics.ai_circuit_transitions}, "
+            f"rejected: {metrics.ai_circuit_rejections})\n"
+            f"<b>AI Concurrency Limit:</b> {metrics.ai_concurrency_limit}\n"
+            f"<b>AI Hedged / Failovers:</b> {metrics.ai_hedged_requests} / "
+            f"{metrics.ai_failovers}\n"
+            f"<b>AI Deadline Exceeded:</b> {metrics.ai_deadline_exceeded}\n"
+            f"<b>AI Cascade Escalations:</b> {metrics.ai_cascade_escalations} "
+            f"of {metrics.ai_cascade_decisions}\n"
+            f"<b>Telegram Outbound Queue:</b> {metrics.telegram_queue_depth} "
+            f"(peak: {metrics.telegram_queue_peak}, "
+            f"429s: {metrics.telegram_retry_after})\n"
+            f"<b>Webhook Buffer:</b> {metrics.webhook_buffer_depth} "
+            f"(peak: {metrics.webhook_buffer_peak}, "
+            f"rejected: {metrics.webhook_rejected})\n"
+            f"<b>Webhook Pre-filtered:</b> {webhook_dropped}\n"
+            f"<b>Update → Queue Latency:</b> "
+            f"{metrics.update_enqueue_latency_avg_ms:.1f} ms avg "
+            f"(max: {metrics.update_enqueue_latency_max_ms:.1f} ms)\n"
+            f"<b>Chat Cache:</b> {metrics.chat_cache_hits} hits / "
+            f"{metrics.chat_cache_misses} misses "
+            f"(DB loads: {metrics.chat_cache_db_loads}, "
+            f"evicted: {metrics.chat_cache_evictions})\n"
             f"<b>Queue Size:</b> {metrics.antispam_queue_size}\n"
             f"<b>Workers:</b> {metrics.antispam_workers}\n"
         )
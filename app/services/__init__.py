@@ -1,8 +1,16 @@
 __all__ = [
     "get_or_create_user_state",
     "get_chat_by_telegram_id",
+    "chat_registry",
+    "is_known_spammer",
+    "record_spam_hit",
+    "spammer_reputation",
+    "trusted_senders",
 ]
 
 
 from .user import get_or_create_user_state
-from .chat_cached import get_chat_by_telegram_id
+from .chat import get_chat_by_telegram_id
+from .chat_registry import chat_registry
+from .reputation import is_known_spammer, record_spam_hit, spammer_reputation
+from .trusted_index import trusted_senders
@@ -1,41 +1,123 @@
+"""
+Chat state cache: the one place chats are looked up and registered, so a
+message costs at most one chat query
+"""
+
 import time
-from dataclasses import dataclass
-from typing import Optional
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from typing import Optional, Tuple
 
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import update
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.models.chat import Chat
-from app.services import get_chat_by_telegram_id
+from app.monitoring import system_monitor
+from app.services.chat import get_chat_by_telegram_id
+from config import config
 from logger import get_logger
+from utils import SingleFlight
 
 
 log = get_logger(__name__)
 
 
-@dataclass
-class ChatCacheEntry:
-    last_seen_ts: float
+@dataclass(frozen=True)
+class ChatState:
+    """Snapshot of the chat row; safe to share between sessions."""
+
+    id: int
+    telegram_chat_id: int
     title: Optional[str]
+    is_active: bool
+    enable_ai_check: bool
+    cleanup_mentions: bool
+    cleanup_links: bool
+    cleanup_emojis: bool
+    allowed_link_domains: Tuple[str, ...] = ()
+
+    @classmethod
+    def from_model(cls, chat: Chat) -> "ChatState":
+        return cls(
+            id=chat.id,
+            telegram_chat_id=chat.telegram_chat_id,
+            title=chat.title,
+            is_active=chat.is_active,
+            enable_ai_check=chat.enable_ai_check,
+            cleanup_mentions=chat.cleanup_mentions,
+            cleanup_links=chat.cleanup_links,
+            cleanup_emojis=chat.cleanup_emojis,
+            allowed_link_domains=tuple(chat.allowed_link_domains or ()),
+        )
 
 
 class ChatRegistry:
     """
-    In-memory cache to avoid DB hits on every message.
-    Cache key: telegram_chat_id
+    Bounded LRU of ChatState by telegram_chat_id.
+
+    - Concurrent misses for the same chat share one query.
+    - Unknown chats are remembered for `negative_ttl_s`, so registering
+      a new chat is a single INSERT.
+    - Admin panel changes must call invalidate(); otherwise entries are
+      reloaded after `ttl_s`.
+
+    Hits, misses, evictions and DB loads are counted in system_monitor.
     """
 
-    def __init__(self, ttl_seconds: int = 3600):
-        self.ttl = ttl_seconds
-        self._cache: dict[int, ChatCacheEntry] = {}
+    def __init__(
+        self,
+        ttl_s: Optional[float] = None,
+        max_size: Optional[int] = None,
+        negative_ttl_s: Optional[float] = None,
+    ) -> None:
+        self._ttl_s = ttl_s
+        self._max_size = max_size
+        self._negative_ttl_s = negative_ttl_s
+        # {telegram_chat_id: (state or None if unknown, expires_at)}
+        self._entries: OrderedDict[int, Tuple[Optional[ChatState], float]] = (
+            OrderedDict()
+        )
+        self._flights: SingleFlight[int, Optional[ChatState]] = SingleFlight()
+
+    @property
+    def ttl_s(self) -> float:
+        if self._ttl_s is not None:
+            return self._ttl_s
+        return config.bot.chat_cache_ttl_s
+
+    @property
+    def max_size(self) -> int:
+        if self._max_size is not None:
+            return self._max_size
+        return config.bot.chat_cache_max_size
+
+    @property
+    def negative_ttl_s(self) -> float:
+        if self._negative_ttl_s is not None:
+            return self._negative_ttl_s
+        return config.bot.chat_cache_negative_ttl_s
 
-    def _is_fresh(self, chat_id: int) -> bool:
-        e = self._cache.get(chat_id)
-        return bool(e and (time.time() - e.last_seen_ts) < self.ttl)
+    def __len__(self) -> int:
+        return len(self._entries)
 
-    def touch(self, chat_id: int, title: Optional[str]) -> None:
-        self._cache[chat_id] = ChatCacheEntry(last_seen_ts=time.time(), title=title)
-        log.debug("Cache entry updated: chat_id=%s, title=%r", chat_id, title)
+    async def get(
+        self, session: AsyncSession, telegram_chat_id: int
+    ) -> Optional[ChatState]:
+        """Cached chat state, None if the chat isn't registered."""
+        entry = self._entries.get(telegram_chat_id)
+        if entry is not None:
+            state, expires_at = entry
+            if time.monotonic() < expires_at:
+                self._entries.move_to_end(telegram_chat_id)
+                system_monitor.increment_chat_cache_hits()
+                return state
+            del self._entries[telegram_chat_id]
+
+        system_monitor.increment_chat_cache_misses()
+        return await self._flights.do(
+            telegram_chat_id, lambda: self._load(session, telegram_chat_id)
+        )
 
     async def ensure_chat(
         self,
@@ -43,51 +125,107 @@ class ChatRegistry:
         telegram_chat_id: int,
         title: Optional[str],
         default_is_active: bool = False,
-    ) -> None:
-        # If we saw this chat recently, skip DB entirely
-        if self._is_fresh(telegram_chat_id):
-            log.debug("Chat cache hit: telegram_chat_id=%s", telegram_chat_id)
-            return
+    ) -> Optional[ChatState]:
+        """
+        Register the chat if it's new and keep its title up to date.
+        Commits its own changes. None only if creation failed.
+        """
+        state = await self.get(session, telegram_chat_id)
+
+        if state is None:
+            return await self._create(
+                session, telegram_chat_id, title, default_is_active
+            )
+
+        if title and title != (state.title or None):
+            log.info(
+                "Updating chat title: telegram_chat_id=%s old=%r new=%r",
+                telegram_chat_id,
+                state.title,
+                title,
+            )
+            await session.execute(
+                update(Chat).where(Chat.id == state.id).values(title=title)
+            )
+            await session.commit()
+            state = replace(state, title=title)
+            self._remember(telegram_chat_id, state)
+
+        return state
 
-        log.debug(
-            "Chat cache miss: telegram_chat_id=%s, checking DB", telegram_chat_id
-        )  # noqa: E501
+    def invalidate(self, telegram_chat_id: int) -> None:
+        self._entries.pop(telegram_chat_id, None)
+        log.debug("Chat cache invalidated: telegram_chat_id=%s", telegram_chat_id)  # noqa: E501
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    async def _load(
+        self, session: AsyncSession, telegram_chat_id: int
+    ) -> Optional[ChatState]:
+        system_monitor.increment_chat_cache_db_loads()
         chat = await get_chat_by_telegram_id(session, telegram_chat_id)
-        if chat is None:
-            try:
-                log.info(
-                    "Creating new chat: telegram_chat_id=%s title=%r is_active=%s",  # noqa: E501
-                    telegram_chat_id,
-                    title,
-                    default_is_active,
-                )
-                chat = Chat(
-                    telegram_chat_id=telegram_chat_id,
-                    title=title,
-                    is_active=default_is_active,
-                )
-                session.add(chat)
-                await session.flush()
-                await session.commit()
-                log.info(
-                    "Successfully created chat: telegram_chat_id=%s",
-                    telegram_chat_id,  # noqa: E501
-                )
-            except IntegrityError:
-                log.warning(
-                    "Chat creation race condition: telegram_chat_id=%s already exists",  # noqa: E501
-                    telegram_chat_id,
-                )
-                await session.rollback()
-        else:
-            if title and title != (chat.title or None):
-                log.info(
-                    "Updating chat title: telegram_chat_id=%s old=%r new=%r",  # noqa: E501
+        state = ChatState.from_model(chat) if chat is not None else None
+        self._remember(telegram_chat_id, state)
+        return state
+
+    async def _create(
+        self,
+        session: AsyncSession,
+        telegram_chat_id: int,
+        title: Optional[str],
+        is_active: bool,
+    ) -> Optional[ChatState]:
+        log.info(
+            "Creating new chat: telegram_chat_id=%s title=%r is_active=%s",
+            telegram_chat_id,
+            title,
+            is_active,
+        )
+        chat = Chat(
+            telegram_chat_id=telegram_chat_id,
+            title=title,
+            is_active=is_active,
+            enable_ai_check=config.bot.ai_enabled,
+            cleanup_mentions=True,
+            cleanup_links=True,
+            cleanup_emojis=False,  # Default to disabled initially
+        )
+        try:
+            session.add(chat)
+            await session.flush()
+            await session.commit()
+        except IntegrityError:
+            log.warning(
+                "Chat creation race condition: telegram_chat_id=%s already exists",  # noqa: E501
+                telegram_chat_id,
+            )
+            await session.rollback()
+            self.invalidate(telegram_chat_id)
+            state = await self._load(session, telegram_chat_id)
+            if state is None:
+                log.error(
+                    "Chat create race lost, but chat still missing: %s",
                     telegram_chat_id,
-                    chat.title,
-                    title,
                 )
-                chat.title = title
-                await session.commit()
+            return state
+
+        state = ChatState.from_model(chat)
+        self._remember(telegram_chat_id, state)
+        return state
+
+    def _remember(
+        self, telegram_chat_id: int, state: Optional[ChatState]
+    ) -> None:
+        ttl_s = self.ttl_s if state is not None else self.negative_ttl_s
+        if ttl_s <= 0:
+            self._entries.pop(telegram_chat_id, None)
+            return
+        self._entries[telegram_chat_id] = (state, time.monotonic() + ttl_s)
+        self._entries.move_to_end(telegram_chat_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            system_monitor.increment_chat_cache_evictions()
+
 
-        self.touch(telegram_chat_id, title)
+chat_registry = ChatRegistry()
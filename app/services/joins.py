@@ -0,0 +1,120 @@
+"""
+Member join times from chat_member updates, written in batches
+"""
+
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.db import UserState
+from app.monitoring import system_monitor
+from app.services.chat_registry import chat_registry
+from logger import get_logger
+from utils import MicroBatcher, ensure_utc_timezone
+
+log = get_logger(__name__)
+
+
+@dataclass(frozen=True)
+class MemberJoin:
+    telegram_chat_id: int
+    telegram_user_id: int
+    joined_at: datetime
+    chat_title: Optional[str] = None
+
+
+class JoinRecorder:
+    """
+    Collects joins for up to `max_wait_ms` (or `max_size` joins) and
+    upserts them into user_states with one statement, so UserState.joined_at
+    is the real join time rather than the first message.
+
+    record() doesn't wait for the write; a rejoin moves joined_at forward,
+    valid_messages are kept.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        *,
+        max_size: int = 100,
+        max_wait_ms: int = 500,
+    ) -> None:
+        self._session_factory = session_factory
+        self._batcher: MicroBatcher[None, MemberJoin, None] = MicroBatcher(
+            self._flush,
+            max_size=max_size,
+            max_wait_s=max_wait_ms / 1000,
+            name="join-recorder",
+        )
+        self._pending: set[asyncio.Task[None]] = set()
+
+    def record(self, join: MemberJoin) -> None:
+        task = asyncio.create_task(self._submit(join))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def close(self) -> None:
+        """Write what is still buffered."""
+        # Let freshly recorded joins reach the batcher first
+        await asyncio.sleep(0)
+        await self._batcher.close()
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+
+    async def _submit(self, join: MemberJoin) -> None:
+        try:
+            await self._batcher.submit(None, join)
+        except Exception as e:
+            log.error(
+                "Error recording member join: %s Context: service=join_recorder, chat_id=%s, user_id=%s",  # noqa: E501
+                e,
+                join.telegram_chat_id,
+                join.telegram_user_id,
+            )
+
+    async def _flush(self, _key: None, joins: list[MemberJoin]) -> list[None]:
+        async with self._session_factory() as session:
+            # Latest join per (chat, user) within the batch
+            rows: dict[tuple[int, int], datetime] = {}
+            for join in joins:
+                chat = await chat_registry.ensure_chat(
+                    session, join.telegram_chat_id, join.chat_title
+                )
+                if chat is None:
+                    continue
+                key = (chat.id, join.telegram_user_id)
+                joined_at = ensure_utc_timezone(join.joined_at)
+                if key not in rows or rows[key] < joined_at:
+                    rows[key] = joined_at
+
+            if rows:
+                stmt = insert(UserState).values(
+                    [
+                        {
+                            "chat_id": chat_id,
+                            "telegram_user_id": user_id,
+                            "joined_at": joined_at,
+                            "valid_messages": 0,
+                        }
+                        for (chat_id, user_id), joined_at in rows.items()
+                    ]
+                )
+                await session.execute(
+                    stmt.on_conflict_do_update(
+                        index_elements=[
+                            UserState.chat_id,
+                            UserState.telegram_user_id,
+                        ],
+                        set_={"joined_at": stmt.excluded.joined_at},
+                    )
+                )
+                await session.commit()
+
+        system_monitor.increment_joins_recorded(len(rows))
+        log.debug("Recorded %d member joins", len(rows))
+        return [None] * len(joins)
@@ -0,0 +1,170 @@
+"""
+Cross-chat spammer reputation: in-memory scores backed by the
+spammer_reputations table
+"""
+
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import event, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.db import SpammerReputation
+from config import config
+from logger import get_logger
+from utils import ensure_utc_timezone, utc_now
+
+log = get_logger(__name__)
+
+# session.info key of the scores written but not committed yet
+_PENDING = "reputation_pending"
+
+
+class SpammerReputationService:
+    """
+    Spam hits per telegram_user_id across all managed chats. Every hit
+    adds 1 to the user's score, and the score halves every
+    config.bot.reputation_half_life_h hours. Users whose decayed score is
+    at least config.bot.reputation_threshold are known offenders.
+
+    All writes go through this service, so an entry in memory (including
+    "no record") is authoritative; the table is read once per user and
+    keeps the scores across restarts. A new score reaches the memory only
+    once the session that wrote it commits; until then only that session
+    sees it.
+    """
+
+    def __init__(self, max_users: int = 50_000):
+        self.max_users = max_users
+        # {telegram_user_id: (score, as_of)}
+        self._cache: OrderedDict[int, tuple[float, datetime]] = OrderedDict()
+
+    @staticmethod
+    def _decayed(score: float, as_of: datetime, now: datetime) -> float:
+        if score <= 0:
+            return 0.0
+        half_life_s = config.bot.reputation_half_life_h * 3600
+        if half_life_s <= 0:
+            return score
+        elapsed = max(0.0, (now - ensure_utc_timezone(as_of)).total_seconds())
+        return score * 0.5 ** (elapsed / half_life_s)
+
+    def _remember(self, user_id: int, score: float, as_of: datetime) -> None:
+        self._cache[user_id] = (score, as_of)
+        self._cache.move_to_end(user_id)
+        while len(self._cache) > self.max_users:
+            self._cache.popitem(last=False)
+
+    async def _load(
+        self, session: AsyncSession, user_id: int
+    ) -> tuple[float, datetime]:
+        pending = session.info.get(_PENDING)
+        if pending and user_id in pending:
+            return pending[user_id]
+
+        entry = self._cache.get(user_id)
+        if entry is not None:
+            self._cache.move_to_end(user_id)
+            return entry
+
+        res = await session.execute(
+            select(SpammerReputation.score, SpammerReputation.last_hit_at).where(  # noqa: E501
+                SpammerReputation.telegram_user_id == user_id
+            )
+        )
+        row = res.one_or_none()
+        entry = (row.score, row.last_hit_at) if row else (0.0, utc_now())
+        self._remember(user_id, *entry)
+        return entry
+
+    async def get_score(
+        self,
+        session: AsyncSession,
+        user_id: int,
+        now: Optional[datetime] = None,
+    ) -> float:
+        """Current (decayed) score of the user."""
+        score, as_of = await self._load(session, user_id)
+        return self._decayed(score, as_of, now or utc_now())
+
+    async def is_known_spammer(
+        self, session: AsyncSession, user_id: int
+    ) -> bool:
+        score = await self.get_score(session, user_id)
+        return score >= config.bot.reputation_threshold
+
+    async def record_spam_hit(
+        self,
+        session: AsyncSession,
+        user_id: int,
+        now: Optional[datetime] = None,
+    ) -> float:
+        """
+        Add a spam hit and upsert the user's row (committed by the
+        caller). Returns the new score.
+        """
+        now = now or utc_now()
+        score = await self.get_score(session, user_id, now) + 1.0
+
+        stmt = insert(SpammerReputation).values(
+            telegram_user_id=user_id, score=score, hits=1, last_hit_at=now
+        )
+        await session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[SpammerReputation.telegram_user_id],
+                set_={
+                    "score": score,
+                    "hits": SpammerReputation.hits + 1,
+                    "last_hit_at": now,
+                },
+            )
+        )
+        self._remember_on_commit(session, user_id, score, now)
+        log.debug("Spam hit recorded: user_id=%s score=%.2f", user_id, score)
+        return score
+
+    def _remember_on_commit(
+        self,
+        session: AsyncSession,
+        user_id: int,
+        score: float,
+        as_of: datetime,
+    ) -> None:
+        """Cache the score once the caller commits; forget it on rollback."""
+        pending = session.info.get(_PENDING)
+        if pending is None:
+            pending = session.info[_PENDING] = {}
+            sync_session = session.sync_session
+            event.listen(sync_session, "after_commit", self._committed)
+            event.listen(sync_session, "after_rollback", self._rolled_back)
+        pending[user_id] = (score, as_of)
+
+    def _committed(self, session: Session) -> None:
+        pending = session.info.get(_PENDING, {})
+        for user_id, entry in pending.items():
+            self._remember(user_id, *entry)
+        pending.clear()
+
+    @staticmethod
+    def _rolled_back(session: Session) -> None:
+        session.info.get(_PENDING, {}).clear()
+
+    def forget(self, user_id: int) -> None:
+        """Drop the in-memory entry (e.g. after editing the table by hand)."""  # noqa: E501
+        self._cache.pop(user_id, None)
+
+
+spammer_reputation = SpammerReputationService()
+
+
+async def is_known_spammer(session: AsyncSession, telegram_user_id: int) -> bool:  # noqa: E501
+    """True if the user was caught spamming recently in any managed chat."""
+    return await spammer_reputation.is_known_spammer(session, telegram_user_id)
+
+
+async def record_spam_hit(session: AsyncSession, telegram_user_id: int) -> float:  # noqa: E501
+    """Record a confirmed spam message of the user."""
+    return await spammer_reputation.record_spam_hit(session, telegram_user_id)
@@ -0,0 +1,88 @@
+"""
+In-memory index of group messages the antispam worker would wave through
+anyway: trusted (chat, user) pairs and inactive chats
+"""
+
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from config import config
+
+SKIP_TRUSTED = "trusted"
+SKIP_INACTIVE_CHAT = "inactive_chat"
+
+
+class TrustedSenderIndex:
+    """
+    Filled by the message processor as it reaches its verdicts, read by an
+    outer dispatcher middleware that drops such messages before any
+    sanitizing, DB session or routing work.
+
+    Entries expire after `ttl_s` (config.bot.trusted_index_ttl_s), so chat
+    registration and title refreshes still happen now and then; the
+    admin panel drops a chat's entries when its settings change.
+    """
+
+    def __init__(
+        self, ttl_s: Optional[float] = None, max_size: int = 100_000
+    ) -> None:
+        self._ttl_s = ttl_s
+        self.max_size = max_size
+        self._trusted: OrderedDict[Tuple[int, int], float] = OrderedDict()
+        self._inactive_chats: OrderedDict[int, float] = OrderedDict()
+
+    @property
+    def ttl_s(self) -> float:
+        if self._ttl_s is not None:
+            return self._ttl_s
+        return config.bot.trusted_index_ttl_s
+
+    def __len__(self) -> int:
+        return len(self._trusted) + len(self._inactive_chats)
+
+    def mark_trusted(self, chat_id: int, user_id: int) -> None:
+        self._put(self._trusted, (chat_id, user_id))
+
+    def mark_inactive_chat(self, chat_id: int) -> None:
+        self._put(self._inactive_chats, chat_id)
+
+    def forget_chat(self, chat_id: int) -> None:
+        """Drop everything known about the chat (its settings changed)."""
+        self._inactive_chats.pop(chat_id, None)
+        for key in [k for k in self._trusted if k[0] == chat_id]:
+            del self._trusted[key]
+
+    def clear(self) -> None:
+        self._trusted.clear()
+        self._inactive_chats.clear()
+
+    def skip_reason(self, chat_id: int, user_id: int) -> Optional[str]:
+        """Why a message of the user in the chat needs no moderation."""
+        now = time.monotonic()
+        if self._is_fresh(self._inactive_chats, chat_id, now):
+            return SKIP_INACTIVE_CHAT
+        if self._is_fresh(self._trusted, (chat_id, user_id), now):
+            return SKIP_TRUSTED
+        return None
+
+    def _put(self, entries: OrderedDict, key: object) -> None:
+        if self.ttl_s <= 0:
+            return
+        entries[key] = time.monotonic() + self.ttl_s
+        entries.move_to_end(key)
+        while len(entries) > self.max_size:
+            entries.popitem(last=False)
+
+    @staticmethod
+    def _is_fresh(entries: OrderedDict, key: object, now: float) -> bool:
+        expires_at = entries.get(key)
+        if expires_at is None:
+            return False
+        if expires_at <= now:
+            del entries[key]
+            return False
+        return True
+
+
+trusted_senders = TrustedSenderIndex()
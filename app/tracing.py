@@ -0,0 +1,318 @@
+"""
+Lightweight tracing spans for the moderation pipeline
+"""
+
+import contextvars
+import hashlib
+import random
+import time
+from typing import Any, Dict, List, Optional, Union
+
+from config import config
+from logger import get_logger
+
+log = get_logger(__name__)
+
+
+class Span:
+    """
+    One timed step of a trace. Ids are hex strings in the OpenTelemetry
+    format (32-char trace id, 16-char span id).
+    """
+
+    __slots__ = (
+        "name",
+        "trace_id",
+        "span_id",
+        "parent",
+        "start_ns",
+        "end_ns",
+        "attributes",
+        "error",
+        "handle",
+    )
+
+    sampled = True
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent: Optional["Span"] = None,
+        attributes: Optional[Dict[str, Any]] = None,
+        start_ns: Optional[int] = None,
+    ) -> None:
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent = parent
+        self.start_ns = time.time_ns() if start_ns is None else start_ns
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, Any] = attributes or {}
+        self.error: Optional[str] = None
+        # Exporter-specific object (e.g. the OpenTelemetry span)
+        self.handle: Any = None
+
+    @property
+    def parent_id(self) -> Optional[str]:
+        return self.parent.span_id if self.parent is not None else None
+
+    @property
+    def duration_ms(self) -> float:
+        end_ns = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end_ns - self.start_ns) / 1e6
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+
+class _NoopSpan:
+    """Returned when the trace isn't sampled; every call is a no-op."""
+
+    __slots__ = ()
+
+    sampled = False
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+AnySpan = Union[Span, _NoopSpan]
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar(  # noqa: E501
+    "current_span", default=None
+)
+
+
+class _NoopScope:
+    __slots__ = ()
+
+    def __enter__(self) -> _NoopSpan:
+        return NOOP_SPAN
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+
+_NOOP_SCOPE = _NoopScope()
+
+
+class _SpanScope:
+    """Makes the span current for the `with` block and ends it on exit."""
+
+    __slots__ = ("_tracer", "_span", "_token")
+
+    def __init__(self, tracer: "Tracer", span: Span) -> None:
+        self._tracer = tracer
+        self._span = span
+        self._token: Optional[contextvars.Token] = None
+
+    def __enter__(self) -> Span:
+        self._token = _current_span.set(self._span)
+        self._tracer._started(self._span)
+        return self._span
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        if exc_type is not None:
+            self._span.error = exc_type.__name__
+        if self._token is not None:
+            _current_span.reset(self._token)
+        self._tracer._ended(self._span)
+        return False
+
+
+class SpanExporter:
+    """Receives spans as they start and end."""
+
+    def on_start(self, span: Span) -> None:
+        pass
+
+    def on_end(self, span: Span) -> None:
+        pass
+
+
+class LogSpanExporter(SpanExporter):
+    """One log line per finished span."""
+
+    def on_end(self, span: Span) -> None:
+        attributes = " ".join(f"{k}={v}" for k, v in span.attributes.items())
+        log.info(
+            "Span %s duration_ms=%.1f trace_id=%s span_id=%s parent_id=%s error=%s %s",  # noqa: E501
+            span.name,
+            span.duration_ms,
+            span.trace_id,
+            span.span_id,
+            span.parent_id,
+            span.error,
+            attributes,
+        )
+
+
+class OpenTelemetrySpanExporter(SpanExporter):
+    """
+    Mirrors spans into the OpenTelemetry API, so the configured SDK
+    exporter (OTLP, Jaeger, ...) receives them with the same parent/child
+    structure. Without an SDK the API's spans are no-ops.
+    """
+
+    def __init__(self) -> None:
+        from opentelemetry import trace
+
+        self._trace = trace
+        self._tracer = trace.get_tracer("tgantispambot")
+
+    def on_start(self, span: Span) -> None:
+        context = None
+        if span.parent is not None and span.parent.handle is not None:
+            context = self._trace.set_span_in_context(span.parent.handle)
+        span.handle = self._tracer.start_span(
+            span.name, context=context, start_time=span.start_ns
+        )
+
+    def on_end(self, span: Span) -> None:
+        otel_span = span.handle
+        if otel_span is None:
+            return
+        for key, value in span.attributes.items():
+            if isinstance(value, (bool, int, float, str)):
+                otel_span.set_attribute(key, value)
+        otel_span.set_attribute("tgantispam.trace_id", span.trace_id)
+        if span.error is not None:
+            otel_span.set_status(
+                self._trace.Status(self._trace.StatusCode.ERROR, span.error)
+            )
+        otel_span.end(end_time=span.end_ns)
+
+
+def _make_exporter(name: str) -> SpanExporter:
+    if name == "otel":
+        try:
+            return OpenTelemetrySpanExporter()
+        except ImportError:
+            log.warning(
+                "opentelemetry is not installed - logging spans instead"
+            )
+    return LogSpanExporter()
+
+
+def trace_id_for(telegram_chat_id: int, telegram_message_id: int) -> str:
+    """Same trace id for every piece of work on one message."""
+    key = f"{telegram_chat_id}:{telegram_message_id}".encode()
+    return hashlib.blake2b(key, digest_size=16).hexdigest()
+
+
+class Tracer:
+    """
+    Starts traces per (chat_id, msg_id) and child spans under the current
+    span. Only `sample_rate` of messages are traced; the rest get a shared
+    no-op span, so unsampled work costs one context variable lookup.
+    """
+
+    def __init__(
+        self,
+        sample_rate: Optional[float] = None,
+        exporters: Optional[List[SpanExporter]] = None,
+    ) -> None:
+        self._sample_rate = sample_rate
+        self._exporters = exporters
+
+    @property
+    def sample_rate(self) -> float:
+        if self._sample_rate is not None:
+            return self._sample_rate
+        return config.bot.tracing_sample_rate
+
+    @property
+    def exporters(self) -> List[SpanExporter]:
+        if self._exporters is None:
+            self._exporters = [_make_exporter(config.bot.tracing_exporter)]
+        return self._exporters
+
+    @staticmethod
+    def current() -> Optional[Span]:
+        return _current_span.get()
+
+    def start_trace(
+        self,
+        name: str,
+        telegram_chat_id: int,
+        telegram_message_id: int,
+        **attributes: Any,
+    ) -> Union[_SpanScope, _NoopScope]:
+        """Root span of the message's trace, if the message is sampled."""
+        rate = self.sample_rate
+        if rate <= 0:
+            return _NOOP_SCOPE
+
+        trace_id = trace_id_for(telegram_chat_id, telegram_message_id)
+        # Decided by the trace id, so a redelivered update is sampled the
+        # same way
+        if rate < 1 and int(trace_id[:8], 16) >= rate * 0x100000000:
+            return _NOOP_SCOPE
+
+        attributes["chat_id"] = telegram_chat_id
+        attributes["msg_id"] = telegram_message_id
+        return _SpanScope(self, Span(name, trace_id, None, attributes))
+
+    def span(
+        self,
+        name: str,
+        parent: Optional[AnySpan] = None,
+        **attributes: Any,
+    ) -> Union[_SpanScope, _NoopScope]:
+        """
+        Child of `parent` (for work picked up from a queue) or of the
+        current span; a no-op outside a sampled trace.
+        """
+        if parent is None:
+            parent = _current_span.get()
+        if parent is None or not parent.sampled:
+            return _NOOP_SCOPE
+        assert isinstance(parent, Span)
+        return _SpanScope(self, Span(name, parent.trace_id, parent, attributes))  # noqa: E501
+
+    def record(
+        self,
+        name: str,
+        duration_s: float,
+        parent: Optional[AnySpan] = None,
+        **attributes: Any,
+    ) -> None:
+        """Add an already finished span, e.g. the time a task sat in a queue."""  # noqa: E501
+        if parent is None:
+            parent = _current_span.get()
+        if parent is None or not parent.sampled:
+            return
+        assert isinstance(parent, Span)
+        end_ns = time.time_ns()
+        span = Span(
+            name,
+            parent.trace_id,
+            parent,
+            attributes,
+            start_ns=end_ns - int(duration_s * 1e9),
+        )
+        self._started(span)
+        span.end_ns = end_ns
+        self._ended(span)
+
+    def _started(self, span: Span) -> None:
+        for exporter in self.exporters:
+            try:
+                exporter.on_start(span)
+            except Exception as e:
+                log.warning("Span exporter failed: %s", e)
+
+    def _ended(self, span: Span) -> None:
+        if span.end_ns is None:
+            span.end_ns = time.time_ns()
+        for exporter in self.exporters:
+            try:
+                exporter.on_end(span)
+            except Exception as e:
+                log.warning("Span exporter failed: %s", e)
+
+
+tracer = Tracer()
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import List, Literal, Optional
 from pydantic import BaseModel
 
 
@@ -9,6 +9,61 @@ class AIHttpConfig(BaseModel):
     max_keepalive_connections: int = 20
     keepalive_expiry_s: float = 30.0
 
+    # Adaptive (AIMD) concurrency between min and max, starting at
+    # `concurrency`. Disabled -> fixed `concurrency` limit.
+    adaptive_concurrency: bool = False
+    min_concurrency: int = 1
+    max_concurrency: int = 20
+    latency_target_s: float = 10.0
+
+    # Circuit breaker: open after N consecutive failures (0 - disabled),
+    # probe again after reset timeout
+    breaker_failure_threshold: int = 5
+    breaker_reset_s: float = 30.0
+
+
+class AIBatchConfig(BaseModel):
+    enabled: bool = False
+    max_size: int = 8
+    max_wait_ms: int = 50
+
+
+class AIBackendConfig(BaseModel):
+    base_url: str
+    # Fall back to the top-level api_key / model when not set
+    api_key: Optional[str] = None
+    model: Optional[str] = None
+    # Name used in logs and metrics, defaults to the URL host
+    name: Optional[str] = None
+    # Per-backend concurrency, defaults to http.concurrency
+    concurrency: Optional[int] = None
+
+
+class AIRoutingConfig(BaseModel):
+    # least_outstanding - fewest in-flight requests relative to the limit
+    # ewma              - lowest smoothed latency, weighted by load
+    strategy: Literal["least_outstanding", "ewma"] = "least_outstanding"
+    # Send a duplicate request to another backend when the first one is
+    # slower than the backend's observed p95 latency
+    hedge_enabled: bool = False
+    # Hedge delay used until enough latency samples are collected
+    hedge_default_ms: int = 2000
+    # Retry a failed request (network error, timeout, HTTP error,
+    # open circuit) on the next backend
+    failover: bool = True
+
+
+class AICascadeConfig(BaseModel):
+    # Score with a small, fast model first and escalate to the main
+    # model only when its score is close to spam_threshold
+    enabled: bool = False
+    # Small-model backends (api_key defaults to the top-level one, model
+    # to `model` below). Empty -> main backends with `model` below
+    backends: List[AIBackendConfig] = []
+    model: Optional[str] = None
+    # Escalate when threshold - band <= small score < threshold + band
+    uncertainty_band: float = 0.15
+
 
 class AIConfig(BaseModel):
     base_url: Optional[str] = None
@@ -16,4 +71,77 @@ class AIConfig(BaseModel):
     model: Optional[str] = None
     temperature: float = 0.2
     spam_threshold: float = 0.3
+    # sequential - run prompts one by one, stop on the first hit
+    # parallel   - fire all prompts at once, cancel the rest on the first hit
+    # combined   - one request scoring all prompts, per-prompt fallback
+    prompt_mode: Literal["sequential", "parallel", "combined"] = "sequential"
+    # text    - the model answers with a number, parsed from the output
+    # logprob - the model answers YES/NO with a single token, the spam
+    #           probability is P(YES) from the token logprobs
+    score_mode: Literal["text", "logprob"] = "text"
+    # Output cap per expected score (max_tokens / num_predict), 0 - no cap.
+    # Opt-in: reasoning models need room to think before the answer
+    max_output_tokens: int = 0
+    # Stop sequences for single-score requests (multi-score answers span
+    # several lines, so they are never cut by stop sequences)
+    stop_sequences: List[str] = []
+    # Stream single-score answers and close the stream as soon as a
+    # complete number has arrived
+    stream: bool = False
+    # Time budget (seconds) for the AI verdict on one message, counted
+    # from enqueue; prompts that can't finish in time are skipped and the
+    # message is kept. Opt-in: 0 - no budget
+    message_budget_s: float = 0.0
+    # Identical requests in flight at the same time share one backend call.
+    # Shared calls run with the full HTTP timeout, not the time left
+    coalesce_requests: bool = True
+    # Several backends (e.g. a few Ollama boxes plus a hosted fallback).
+    # Empty -> a single backend from base_url / api_key / model
+    backends: List[AIBackendConfig] = []
+    routing: AIRoutingConfig = AIRoutingConfig()
+    cascade: AICascadeConfig = AICascadeConfig()
     http: AIHttpConfig = AIHttpConfig()
+    batch: AIBatchConfig = AIBatchConfig()
+
+    def _with_defaults(
+        self, backends: List[AIBackendConfig], model: Optional[str]
+    ) -> List[AIBackendConfig]:
+        return [
+            b.model_copy(
+                update={
+                    "api_key": b.api_key or self.api_key,
+                    "model": b.model or model,
+                }
+            )
+            for b in backends
+        ]
+
+    def resolved_backends(self) -> List[AIBackendConfig]:
+        """Configured backends with api_key / model defaults filled in."""
+        if self.backends:
+            return self._with_defaults(self.backends, self.model)
+        if self.base_url:
+            return [
+                AIBackendConfig(
+                    base_url=self.base_url,
+                    api_key=self.api_key,
+                    model=self.model,
+                )
+            ]
+        return []
+
+    def resolved_cascade_backends(self) -> List[AIBackendConfig]:
+        """
+        Small-model tier backends with defaults filled in. Without own
+        backends the tier reuses the main endpoints with cascade.model.
+        """
+        if self.cascade.backends:
+            return self._with_defaults(
+                self.cascade.backends, self.cascade.model or self.model
+            )
+        if self.cascade.model:
+            return [
+                b.model_copy(update={"model": self.cascade.model})
+                for b in self.resolved_backends()
+            ]
+        return []
@@ -4,7 +4,12 @@ from pydantic import BaseModel
 
 
 class BotConfig(BaseModel):
-    allowed_updates: List[str] = ["message", "callback_query"]
+    allowed_updates: List[str] = [
+        "message",
+        "callback_query",
+        "my_chat_member",
+        "chat_member",
+    ]
 
     token: Optional[str] = None
     mode: Literal["polling", "webhook"] = "polling"
@@ -13,6 +18,29 @@ class BotConfig(BaseModel):
 
     webhook_url: Optional[str] = None
     webhook_path: str = "/webhook/bot/"
+    # Ack webhook updates right away and dispatch them in the background
+    webhook_ingest_enabled: bool = False
+    webhook_ingest_buffer_size: int = 1000
+    webhook_ingest_workers: int = 8
+    # Drop irrelevant/duplicate webhook updates before full validation
+    webhook_prefilter_enabled: bool = True
+
+    # Polling: getUpdates long-poll timeout and batch size (1-100), and how
+    # many updates are handled concurrently (0 - no limit)
+    polling_timeout_s: int = 10
+    polling_limit: int = 100
+    polling_concurrency: int = 64
+
+    # Prometheus metrics at /metrics on a side server, never on the public
+    # webhook app; the endpoint has no authentication
+    metrics_enabled: bool = False
+    metrics_host: str = "127.0.0.1"
+    metrics_port: int = 9090
+
+    # Share of messages traced from handler to commit (0 - off, 1 - all);
+    # spans go to the log or to OpenTelemetry
+    tracing_sample_rate: float = 0.0
+    tracing_exporter: Literal["log", "otel"] = "log"
 
     main_admin_id: Optional[int] = None
 
@@ -27,3 +55,50 @@ class BotConfig(BaseModel):
     ai_enabled: bool = False
 
     max_emojis: int = 5
+
+    # Chat settings cache (entries; unknown chats are remembered for
+    # chat_cache_negative_ttl_s)
+    chat_cache_ttl_s: int = 3600
+    chat_cache_max_size: int = 10000
+    chat_cache_negative_ttl_s: int = 60
+
+    # How long the bot's own permissions in a chat are trusted before
+    # asking Telegram again (0 - no caching)
+    permissions_cache_ttl_s: int = 300
+
+    # Coalesce deletions per chat into deleteMessages calls
+    bulk_delete_enabled: bool = False
+    bulk_delete_max_size: int = 100
+    bulk_delete_max_wait_ms: int = 200
+
+    # Recent messages remembered per (chat, user); when one is spam the
+    # others from the last `spam_history_window_s` are deleted too
+    spam_history_size: int = 10
+    spam_history_window_s: int = 120
+
+    # Cross-chat spammer reputation: AI spam hits per user, halving every
+    # reputation_half_life_h; at reputation_threshold the user's messages
+    # are deleted without AI in every chat. Opt-in: AI false positives then
+    # affect every chat
+    reputation_enabled: bool = False
+    reputation_threshold: float = 3.0
+    reputation_half_life_h: float = 72.0
+    reputation_restrict: bool = False
+
+    # Drop group messages of trusted members / in inactive chats in an
+    # outer middleware; entries are re-checked after trusted_index_ttl_s
+    trusted_index_enabled: bool = True
+    trusted_index_ttl_s: int = 600
+
+    # Record real join times from chat_member updates (batched upserts)
+    join_tracking_enabled: bool = True
+    join_batch_max_size: int = 100
+    join_batch_max_wait_ms: int = 500
+
+    # Outbound Bot API scheduler (token buckets + flood control)
+    outbound_rate_limit_enabled: bool = True
+    outbound_global_rate: float = 30.0
+    outbound_global_burst: int = 30
+    outbound_chat_rate: float = 3.0
+    outbound_chat_burst: int = 20
+    outbound_max_retries: int = 2
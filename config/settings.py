@@ -1,10 +1,11 @@
-from typing import Optional, Literal
+from typing import List, Optional, Literal
 import re
 from urllib.parse import urlparse
 
 from pydantic import field_validator, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+from .ai_client import AIBackendConfig
 from .config import Config
 
 LogLevel = Literal["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]
@@ -31,6 +32,18 @@ class Settings(BaseSettings):
     bot_token: Optional[str] = None
     bot_mode: Optional[Literal["polling", "webhook"]] = "polling"
     webhook_url: Optional[str] = None
+    webhook_ingest_enabled: Optional[bool] = None
+    webhook_ingest_buffer_size: Optional[int] = None
+    webhook_ingest_workers: Optional[int] = None
+    webhook_prefilter_enabled: Optional[bool] = None
+    polling_timeout_s: Optional[int] = None
+    polling_limit: Optional[int] = None
+    polling_concurrency: Optional[int] = None
+    metrics_enabled: Optional[bool] = None
+    metrics_host: Optional[str] = None
+    metrics_port: Optional[int] = None
+    tracing_sample_rate: Optional[float] = None
+    tracing_exporter: Optional[Literal["log", "otel"]] = None
 
     # Chat settings
     main_admin_id: Optional[int] = None
@@ -42,6 +55,32 @@ class Settings(BaseSettings):
     antispam_workers: Optional[int] = 8
     fun_commands_enabled: Optional[bool] = None
     antispam_max_emojis: Optional[int] = None
+    antispam_permissions_cache_ttl_s: Optional[int] = None
+    chat_cache_ttl_s: Optional[int] = None
+    chat_cache_max_size: Optional[int] = None
+    chat_cache_negative_ttl_s: Optional[int] = None
+    antispam_bulk_delete_enabled: Optional[bool] = None
+    antispam_bulk_delete_max_size: Optional[int] = None
+    antispam_bulk_delete_max_wait_ms: Optional[int] = None
+    antispam_spam_history_size: Optional[int] = None
+    antispam_spam_history_window_s: Optional[int] = None
+    antispam_reputation_enabled: Optional[bool] = None
+    antispam_reputation_threshold: Optional[float] = None
+    antispam_reputation_half_life_h: Optional[float] = None
+    antispam_reputation_restrict: Optional[bool] = None
+    antispam_trusted_index_enabled: Optional[bool] = None
+    antispam_trusted_index_ttl_s: Optional[int] = None
+    antispam_join_tracking_enabled: Optional[bool] = None
+    antispam_join_batch_max_size: Optional[int] = None
+    antispam_join_batch_max_wait_ms: Optional[int] = None
+
+    # Outbound Telegram API scheduler
+    telegram_rate_limit_enabled: Optional[bool] = None
+    telegram_global_rate: Optional[float] = None
+    telegram_global_burst: Optional[int] = None
+    telegram_chat_rate: Optional[float] = None
+    telegram_chat_burst: Optional[int] = None
+    telegram_max_retries: Optional[int] = None
 
     # AI settings
     ai_base_url: Optional[str] = None
@@ -50,12 +89,44 @@ class Settings(BaseSettings):
     ai_enabled: Optional[bool] = None
     ai_temperature: Optional[float] = None
     ai_spam_threshold: Optional[float] = None
+    ai_prompt_mode: Optional[
+        Literal["sequential", "parallel", "combined"]
+    ] = None
+    ai_score_mode: Optional[Literal["text", "logprob"]] = None
+    ai_max_output_tokens: Optional[int] = None
+    ai_stop_sequences: Optional[List[str]] = None
+    ai_stream: Optional[bool] = None
+    ai_coalesce_requests: Optional[bool] = None
+    ai_message_budget_s: Optional[float] = None
+
+    ai_backends: Optional[List[AIBackendConfig]] = None
+    ai_routing_strategy: Optional[
+        Literal["least_outstanding", "ewma"]
+    ] = None
+    ai_hedge_enabled: Optional[bool] = None
+    ai_hedge_default_ms: Optional[int] = None
+    ai_failover: Optional[bool] = None
+
+    ai_cascade_enabled: Optional[bool] = None
+    ai_cascade_backends: Optional[List[AIBackendConfig]] = None
+    ai_cascade_model: Optional[str] = None
+    ai_cascade_uncertainty_band: Optional[float] = None
+
+    ai_batch_enabled: Optional[bool] = None
+    ai_batch_max_size: Optional[int] = None
+    ai_batch_max_wait_ms: Optional[int] = None
 
     http_concurrency: Optional[int] = None
     http_timeout_s: Optional[int] = None
     http_max_connections: Optional[int] = None
     http_max_keepalive_connections: Optional[int] = None
     http_keep_alive_expiry_s: Optional[int] = None
+    http_adaptive_concurrency: Optional[bool] = None
+    http_min_concurrency: Optional[int] = None
+    http_max_concurrency: Optional[int] = None
+    http_latency_target_s: Optional[float] = None
+    http_breaker_failure_threshold: Optional[int] = None
+    http_breaker_reset_s: Optional[float] = None
 
     @field_validator("bot_token")
     @classmethod
@@ -81,16 +152,43 @@ class Settings(BaseSettings):
     @field_validator(
         "db_timeout",
         "run_port",
+        "webhook_ingest_buffer_size",
+        "webhook_ingest_workers",
+        "polling_timeout_s",
+        "polling_limit",
+        "polling_concurrency",
+        "metrics_port",
         "main_admin_id",
         "min_minutes_in_chat",
         "min_valid_messages",
         "antispam_queue_size",
         "antispam_workers",
+        "antispam_permissions_cache_ttl_s",
+        "chat_cache_ttl_s",
+        "chat_cache_max_size",
+        "chat_cache_negative_ttl_s",
+        "antispam_bulk_delete_max_size",
+        "antispam_bulk_delete_max_wait_ms",
+        "antispam_spam_history_size",
+        "antispam_spam_history_window_s",
+        "antispam_trusted_index_ttl_s",
+        "antispam_join_batch_max_size",
+        "antispam_join_batch_max_wait_ms",
+        "telegram_global_burst",
+        "telegram_chat_burst",
+        "telegram_max_retries",
+        "ai_max_output_tokens",
+        "ai_hedge_default_ms",
+        "ai_batch_max_size",
+        "ai_batch_max_wait_ms",
         "http_concurrency",
         "http_timeout_s",
         "http_max_connections",
         "http_max_keepalive_connections",
         "http_keep_alive_expiry_s",
+        "http_min_concurrency",
+        "http_max_concurrency",
+        "http_breaker_failure_threshold",
     )
     @classmethod
     def validate_non_negative_ints(cls, v: Optional[int], info):
@@ -100,6 +198,22 @@ class Settings(BaseSettings):
             raise ValueError(f"{info.field_name} must be >= 0")
         return v
 
+    @field_validator("polling_limit")
+    @classmethod
+    def validate_polling_limit(cls, v: Optional[int]) -> Optional[int]:
+        if v is not None and not 1 <= v <= 100:
+            raise ValueError("polling_limit must be between 1 and 100")
+        return v
+
+    @field_validator("tracing_sample_rate")
+    @classmethod
+    def validate_tracing_sample_rate(
+        cls, v: Optional[float]
+    ) -> Optional[float]:
+        if v is not None and not 0 <= v <= 1:
+            raise ValueError("tracing_sample_rate must be between 0 and 1")
+        return v
+
     @model_validator(mode="after")
     def validate_required_and_mode(self):
         # Required env vars
@@ -147,6 +261,34 @@ class Settings(BaseSettings):
         config.bot.mode = self.bot_mode or "polling"
         if self.webhook_url is not None:
             config.bot.webhook_url = self.webhook_url
+        if self.webhook_ingest_enabled is not None:
+            config.bot.webhook_ingest_enabled = self.webhook_ingest_enabled
+        if self.webhook_ingest_buffer_size is not None:
+            config.bot.webhook_ingest_buffer_size = (
+                self.webhook_ingest_buffer_size
+            )
+        if self.webhook_ingest_workers is not None:
+            config.bot.webhook_ingest_workers = self.webhook_ingest_workers
+        if self.webhook_prefilter_enabled is not None:
+            config.bot.webhook_prefilter_enabled = self.webhook_prefilter_enabled  # noqa: E501
+
+        # Polling
+        if self.polling_timeout_s is not None:
+            config.bot.polling_timeout_s = self.polling_timeout_s
+        if self.polling_limit is not None:
+            config.bot.polling_limit = self.polling_limit
+        if self.polling_concurrency is not None:
+            config.bot.polling_concurrency = self.polling_concurrency
+        if self.metrics_enabled is not None:
+            config.bot.metrics_enabled = self.metrics_enabled
+        if self.metrics_host is not None:
+            config.bot.metrics_host = self.metrics_host
+        if self.metrics_port is not None:
+            config.bot.metrics_port = self.metrics_port
+        if self.tracing_sample_rate is not None:
+            config.bot.tracing_sample_rate = self.tracing_sample_rate
+        if self.tracing_exporter is not None:
+            config.bot.tracing_exporter = self.tracing_exporter
 
         # Chat gating
         if self.min_minutes_in_chat is not None:
@@ -163,6 +305,80 @@ class Settings(BaseSettings):
             config.bot.fun_commands_enabled = self.fun_commands_enabled
         if self.antispam_max_emojis is not None:
             config.bot.max_emojis = self.antispam_max_emojis
+        if self.antispam_permissions_cache_ttl_s is not None:
+            config.bot.permissions_cache_ttl_s = (
+                self.antispam_permissions_cache_ttl_s
+            )
+        if self.chat_cache_ttl_s is not None:
+            config.bot.chat_cache_ttl_s = self.chat_cache_ttl_s
+        if self.chat_cache_max_size is not None:
+            config.bot.chat_cache_max_size = self.chat_cache_max_size
+        if self.chat_cache_negative_ttl_s is not None:
+            config.bot.chat_cache_negative_ttl_s = self.chat_cache_negative_ttl_s  # noqa: E501
+        if self.antispam_bulk_delete_enabled is not None:
+            config.bot.bulk_delete_enabled = self.antispam_bulk_delete_enabled
+        if self.antispam_bulk_delete_max_size is not None:
+            config.bot.bulk_delete_max_size = (
+                self.antispam_bulk_delete_max_size
+            )
+        if self.antispam_bulk_delete_max_wait_ms is not None:
+            config.bot.bulk_delete_max_wait_ms = (
+                self.antispam_bulk_delete_max_wait_ms
+            )
+        if self.antispam_spam_history_size is not None:
+            config.bot.spam_history_size = self.antispam_spam_history_size
+        if self.antispam_spam_history_window_s is not None:
+            config.bot.spam_history_window_s = (
+                self.antispam_spam_history_window_s
+            )
+        if self.antispam_reputation_enabled is not None:
+            config.bot.reputation_enabled = self.antispam_reputation_enabled
+        if self.antispam_reputation_threshold is not None:
+            config.bot.reputation_threshold = (
+                self.antispam_reputation_threshold
+            )
+        if self.antispam_reputation_half_life_h is not None:
+            config.bot.reputation_half_life_h = (
+                self.antispam_reputation_half_life_h
+            )
+        if self.antispam_reputation_restrict is not None:
+            config.bot.reputation_restrict = self.antispam_reputation_restrict
+        if self.antispam_trusted_index_enabled is not None:
+            config.bot.trusted_index_enabled = (
+                self.antispam_trusted_index_enabled
+            )
+        if self.antispam_trusted_index_ttl_s is not None:
+            config.bot.trusted_index_ttl_s = self.antispam_trusted_index_ttl_s
+        if self.antispam_join_tracking_enabled is not None:
+            config.bot.join_tracking_enabled = (
+                self.antispam_join_tracking_enabled
+            )
+        if not config.bot.join_tracking_enabled:
+            config.bot.allowed_updates = [
+                u for u in config.bot.allowed_updates if u != "chat_member"
+            ]
+        if self.antispam_join_batch_max_size is not None:
+            config.bot.join_batch_max_size = self.antispam_join_batch_max_size
+        if self.antispam_join_batch_max_wait_ms is not None:
+            config.bot.join_batch_max_wait_ms = (
+                self.antispam_join_batch_max_wait_ms
+            )
+
+        # Outbound Telegram API scheduler
+        if self.telegram_rate_limit_enabled is not None:
+            config.bot.outbound_rate_limit_enabled = (
+                self.telegram_rate_limit_enabled
+            )
+        if self.telegram_global_rate is not None:
+            config.bot.outbound_global_rate = self.telegram_global_rate
+        if self.telegram_global_burst is not None:
+            config.bot.outbound_global_burst = self.telegram_global_burst
+        if self.telegram_chat_rate is not None:
+            config.bot.outbound_chat_rate = self.telegram_chat_rate
+        if self.telegram_chat_burst is not None:
+            config.bot.outbound_chat_burst = self.telegram_chat_burst
+        if self.telegram_max_retries is not None:
+            config.bot.outbound_max_retries = self.telegram_max_retries
 
         # AI
         if self.ai_base_url is not None:
@@ -177,6 +393,52 @@ class Settings(BaseSettings):
             config.ai.temperature = self.ai_temperature
         if self.ai_spam_threshold is not None:
             config.ai.spam_threshold = self.ai_spam_threshold
+        if self.ai_prompt_mode is not None:
+            config.ai.prompt_mode = self.ai_prompt_mode
+        if self.ai_score_mode is not None:
+            config.ai.score_mode = self.ai_score_mode
+        if self.ai_max_output_tokens is not None:
+            config.ai.max_output_tokens = self.ai_max_output_tokens
+        if self.ai_stop_sequences is not None:
+            config.ai.stop_sequences = self.ai_stop_sequences
+        if self.ai_stream is not None:
+            config.ai.stream = self.ai_stream
+        if self.ai_coalesce_requests is not None:
+            config.ai.coalesce_requests = self.ai_coalesce_requests
+        if self.ai_message_budget_s is not None:
+            config.ai.message_budget_s = self.ai_message_budget_s
+
+        # AI backends routing
+        if self.ai_backends is not None:
+            config.ai.backends = self.ai_backends
+        if self.ai_routing_strategy is not None:
+            config.ai.routing.strategy = self.ai_routing_strategy
+        if self.ai_hedge_enabled is not None:
+            config.ai.routing.hedge_enabled = self.ai_hedge_enabled
+        if self.ai_hedge_default_ms is not None:
+            config.ai.routing.hedge_default_ms = self.ai_hedge_default_ms
+        if self.ai_failover is not None:
+            config.ai.routing.failover = self.ai_failover
+
+        # AI small/large model cascade
+        if self.ai_cascade_enabled is not None:
+            config.ai.cascade.enabled = self.ai_cascade_enabled
+        if self.ai_cascade_backends is not None:
+            config.ai.cascade.backends = self.ai_cascade_backends
+        if self.ai_cascade_model is not None:
+            config.ai.cascade.model = self.ai_cascade_model
+        if self.ai_cascade_uncertainty_band is not None:
+            config.ai.cascade.uncertainty_band = (
+                self.ai_cascade_uncertainty_band
+            )
+
+        # AI micro-batching
+        if self.ai_batch_enabled is not None:
+            config.ai.batch.enabled = self.ai_batch_enabled
+        if self.ai_batch_max_size is not None:
+            config.ai.batch.max_size = self.ai_batch_max_size
+        if self.ai_batch_max_wait_ms is not None:
+            config.ai.batch.max_wait_ms = self.ai_batch_max_wait_ms
 
         # HTTP (AI client)
         if self.http_concurrency is not None:
@@ -191,6 +453,20 @@ class Settings(BaseSettings):
             )
         if self.http_keep_alive_expiry_s is not None:
             config.ai.http.keepalive_expiry_s = self.http_keep_alive_expiry_s
+        if self.http_adaptive_concurrency is not None:
+            config.ai.http.adaptive_concurrency = self.http_adaptive_concurrency
+        if self.http_min_concurrency is not None:
+            config.ai.http.min_concurrency = self.http_min_concurrency
+        if self.http_max_concurrency is not None:
+            config.ai.http.max_concurrency = self.http_max_concurrency
+        if self.http_latency_target_s is not None:
+            config.ai.http.latency_target_s = self.http_latency_target_s
+        if self.http_breaker_failure_threshold is not None:
+            config.ai.http.breaker_failure_threshold = (
+                self.http_breaker_failure_threshold
+            )
+        if self.http_breaker_reset_s is not None:
+            config.ai.http.breaker_reset_s = self.http_breaker_reset_s
 
         return config
 
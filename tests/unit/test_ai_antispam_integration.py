@@ -1,9 +1,16 @@
+import time
+
 import pytest
 from unittest.mock import AsyncMock, Mock, patch
 from app.antispam.service import AntiSpamService
 from app.antispam.dto import MessageTask
+from app.antispam.processors.message_processor import MessageProcessor
+from app.monitoring import system_monitor
+from ai_client.models import AIDeadlineExceededError
 from ai_client.service import AIService
 from app.antispam.scoring.ai_scorer import AIScorer
+from config import config
+from utils import utc_now
 
 
 class TestAIAntiSpamIntegration:
@@ -113,3 +120,227 @@ class TestAIAntiSpamIntegration:
         assert AIScorer.extract_score("-1.0") is None  # negative values
         assert AIScorer.extract_score("1.5") is None  # values > 1.0
         assert AIScorer.extract_score("2.0") is None  # values > 1.0
+
+    @pytest.mark.asyncio
+    async def test_combined_score_extraction(self):
+        """Test parsing of combined-prompt output with one score per policy."""
+        assert AIScorer.extract_scores("P1=0.1\nP2=0.8\nP3=0.0", 3) == [0.1, 0.8, 0.0]
+        # Order and separators are not strict
+        assert AIScorer.extract_scores("P2: 0.5\nP1: 0.2\nP3: 1", 3) == [0.2, 0.5, 1.0]
+        # Bare numbers in order are accepted as a fallback
+        assert AIScorer.extract_scores("0.1\n0.2\n0.3", 3) == [0.1, 0.2, 0.3]
+        # Missing policy, out of range values and garbage are rejected
+        assert AIScorer.extract_scores("P1=0.1\nP2=0.8", 3) is None
+        assert AIScorer.extract_scores("P1=0.1\nP2=7\nP3=0.0", 3) is None
+        assert AIScorer.extract_scores("I think it is spam", 3) is None
+        assert AIScorer.extract_scores("", 3) is None
+
+
+class TestMessageDeadline:
+    @pytest.mark.asyncio
+    async def test_enqueue_sets_deadline(self):
+        """Test that the time budget starts when the message is enqueued."""
+        service = AntiSpamService(AsyncMock(), ai_service=None)
+        task = MessageTask(
+            telegram_chat_id=123, telegram_message_id=1, telegram_user_id=2
+        )
+
+        with patch.object(config.ai, "message_budget_s", 15.0):
+            before = time.monotonic()
+            await service.enqueue(task)
+
+        queued = service.queue.get_nowait()
+        assert before + 15.0 <= queued.deadline <= time.monotonic() + 15.0
+
+    @pytest.mark.asyncio
+    async def test_no_deadline_without_budget(self):
+        """Test that APP_AI_MESSAGE_BUDGET_S=0 disables the deadline."""
+        service = AntiSpamService(AsyncMock(), ai_service=None)
+        task = MessageTask(
+            telegram_chat_id=123, telegram_message_id=1, telegram_user_id=2
+        )
+
+        with patch.object(config.ai, "message_budget_s", 0):
+            await service.enqueue(task)
+
+        assert service.queue.get_nowait().deadline is None
+
+    @pytest.mark.asyncio
+    async def test_deadline_exceeded_is_recorded_and_fail_permissive(self):
+        """Test that a missed deadline keeps the message and doesn't add trust."""
+        processor = MessageProcessor(AsyncMock(), ai_service=AsyncMock())
+        processor._ai_moderator.first_score_over_threshold = AsyncMock(
+            side_effect=AIDeadlineExceededError("late")
+        )
+        processor._notifier.notify = AsyncMock()
+        session = AsyncMock()
+        user_state = Mock(valid_messages=0)
+        task = MessageTask(
+            telegram_chat_id=123, telegram_message_id=1, telegram_user_id=2
+        )
+        exceeded = system_monitor.ai_deadline_exceeded
+
+        result = await processor._process_with_ai(session, task, user_state)
+
+        assert result is True
+        assert user_state.valid_messages == 0
+        assert system_monitor.ai_deadline_exceeded == exceeded + 1
+        processor._notifier.notify.assert_not_called()
+
+
+class TestSpamHistoryPurge:
+    @pytest.mark.asyncio
+    async def test_spam_purges_senders_recent_messages(self):
+        """Test that a spammer's queued messages are deleted in one call."""
+        bot = AsyncMock()
+        bot.id = 1000
+        member = Mock(status="creator", can_delete_messages=True)
+        bot.get_chat_member.return_value = member
+        service = AntiSpamService(bot, ai_service=None, workers=1)
+
+        processed = []
+
+        async def process_message(session, task):
+            processed.append(task.telegram_message_id)
+            if task.telegram_message_id == 3:
+                await service._message_processor._spam_detected(task)
+                return False
+            return True
+
+        service._message_processor.process_message = process_message
+
+        for mid in (1, 2, 3, 4, 6):
+            await service.enqueue(
+                MessageTask(
+                    telegram_chat_id=-50,
+                    telegram_message_id=mid,
+                    telegram_user_id=7,
+                )
+            )
+        # Another user's message in the same chat is left alone
+        await service.enqueue(
+            MessageTask(
+                telegram_chat_id=-50, telegram_message_id=5, telegram_user_id=8
+            )
+        )
+
+        session_factory = Mock(return_value=AsyncMock())
+        purged = system_monitor.spam_history_purged
+        await service.start(session_factory)
+        await service.queue.join()
+        await service.stop()
+
+        # 1 and 2 were already judged valid and stay
+        assert processed == [1, 2, 3, 5]
+        bot.delete_messages.assert_called_once_with(-50, [4, 6])
+        assert system_monitor.spam_history_purged == purged + 2
+        assert len(service._purged._data) == 0
+
+    @pytest.mark.asyncio
+    async def test_rule_based_delete_does_not_purge(self):
+        bot = AsyncMock()
+        service = AntiSpamService(bot, ai_service=None, workers=1)
+        chat = Mock(is_active=True, cleanup_links=True, cleanup_mentions=False)  # noqa: E501
+        user_state = Mock(valid_messages=0, joined_at=None)
+
+        for mid in (1, 2):
+            await service.enqueue(
+                MessageTask(
+                    telegram_chat_id=-50,
+                    telegram_message_id=mid,
+                    telegram_user_id=7,
+                    text="https://example.com",
+                )
+            )
+
+        with patch(
+            "app.antispam.processors.message_processor.chat_registry.ensure_chat",  # noqa: E501
+            AsyncMock(return_value=chat),
+        ), patch(
+            "app.antispam.processors.message_processor.get_or_create_user_state",  # noqa: E501
+            AsyncMock(return_value=user_state),
+        ), patch(
+            "app.antispam.processors.message_processor.ensure_utc_timezone",
+            Mock(return_value=utc_now()),
+        ), patch(
+            "app.antispam.processors.message_processor.has_links",
+            Mock(return_value=True),
+        ), patch(
+            "app.antispam.processors.message_processor.try_delete_message",
+            AsyncMock(return_value=True),
+        ) as delete, patch.object(config.bot, "reputation_enabled", False):
+            session_factory = Mock(return_value=AsyncMock())
+            await service.start(session_factory)
+            await service.queue.join()
+            await service.stop()
+
+        # Both links are cleaned up one by one, neither purges the other
+        assert delete.await_count == 2
+        bot.delete_messages.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_history_disabled(self):
+        bot = AsyncMock()
+        with patch.object(config.bot, "spam_history_size", 0):
+            service = AntiSpamService(bot, ai_service=None)
+        await service.enqueue(
+            MessageTask(
+                telegram_chat_id=-50, telegram_message_id=1, telegram_user_id=7
+            )
+        )
+
+        await service._purge_recent_messages(
+            MessageTask(
+                telegram_chat_id=-50, telegram_message_id=2, telegram_user_id=7
+            )
+        )
+
+        bot.delete_messages.assert_not_called()
+
+
+class TestSpammerReputation:
+    @pytest.mark.asyncio
+    async def test_ai_hit_is_recorded(self):
+        processor = MessageProcessor(AsyncMock(), ai_service=AsyncMock())
+        processor._ai_moderator.first_score_over_threshold = AsyncMock(
+            return_value=Mock(prompt_index=0, score=0.9)
+        )
+        task = MessageTask(
+            telegram_chat_id=123, telegram_message_id=1, telegram_user_id=2
+        )
+
+        with patch(
+            "app.antispam.processors.message_processor.try_delete_message",
+            AsyncMock(return_value=True),
+        ), patch(
+            "app.antispam.processors.message_processor.record_spam_hit",
+            AsyncMock(),
+        ) as record, patch.object(config.bot, "reputation_enabled", True):
+            result = await processor._process_with_ai(
+                AsyncMock(), task, Mock(valid_messages=0)
+            )
+
+        assert result is False
+        record.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_known_spammer_is_deleted_and_restricted(self):
+        bot = AsyncMock()
+        processor = MessageProcessor(bot, ai_service=AsyncMock())
+        processor._ai_moderator.first_score_over_threshold = AsyncMock()
+        task = MessageTask(
+            telegram_chat_id=123, telegram_message_id=1, telegram_user_id=2
+        )
+        blocked = system_monitor.reputation_blocked
+
+        with patch(
+            "app.antispam.processors.message_processor.try_delete_message",
+            AsyncMock(return_value=True),
+        ) as delete, patch.object(config.bot, "reputation_restrict", True):
+            result = await processor._delete_known_spammer(task)
+
+        assert result is False
+        delete.assert_awaited_once()
+        bot.restrict_chat_member.assert_awaited_once()
+        processor._ai_moderator.first_score_over_threshold.assert_not_called()
+        assert system_monitor.reputation_blocked == blocked + 1
@@ -0,0 +1,150 @@
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from ai_client.breaker import CircuitBreaker, CircuitState
+from ai_client.limiter import AdaptiveConcurrencyLimiter
+from ai_client.models import AICircuitOpenError
+
+
+class TestAdaptiveConcurrencyLimiter:
+    @pytest.mark.asyncio
+    async def test_fixed_limit_bounds_concurrency(self):
+        """Test that min == max behaves like a semaphore."""
+        limiter = AdaptiveConcurrencyLimiter(initial=2, min_limit=2, max_limit=2)
+        running = 0
+        peak = 0
+
+        async def work():
+            nonlocal running, peak
+            async with limiter.slot() as outcome:
+                running += 1
+                peak = max(peak, running)
+                await asyncio.sleep(0.01)
+                running -= 1
+                outcome.ok = True
+
+        await asyncio.gather(*(work() for _ in range(6)))
+
+        assert peak == 2
+        assert limiter.limit == 2
+        assert limiter.in_flight == 0
+
+    @pytest.mark.asyncio
+    async def test_limit_grows_on_fast_successes(self):
+        """Test additive increase on successful fast requests."""
+        limiter = AdaptiveConcurrencyLimiter(
+            initial=1, min_limit=1, max_limit=10, latency_target_s=5.0
+        )
+
+        for _ in range(10):
+            async with limiter.slot() as outcome:
+                outcome.ok = True
+
+        assert limiter.limit > 1
+
+    @pytest.mark.asyncio
+    async def test_limit_shrinks_on_errors(self):
+        """Test multiplicative decrease on failed requests."""
+        changes = []
+        limiter = AdaptiveConcurrencyLimiter(
+            initial=10,
+            min_limit=1,
+            max_limit=10,
+            latency_target_s=5.0,
+            on_limit_change=changes.append,
+        )
+
+        async with limiter.slot():
+            pass  # outcome.ok stays False
+
+        assert limiter.limit == 7
+        assert changes == [7]
+
+    @pytest.mark.asyncio
+    async def test_cancelled_request_does_not_change_limit(self):
+        """Test that caller cancellation is not treated as a backend error."""
+        limiter = AdaptiveConcurrencyLimiter(initial=5, min_limit=1, max_limit=10)
+
+        async def work():
+            async with limiter.slot():
+                await asyncio.sleep(10)
+
+        task = asyncio.create_task(work())
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        assert limiter.limit == 5
+        assert limiter.in_flight == 0
+
+
+class TestCircuitBreaker:
+    def test_opens_after_consecutive_failures(self):
+        """Test that the breaker opens after the failure threshold."""
+        states = []
+        breaker = CircuitBreaker(
+            failure_threshold=2, reset_timeout_s=30.0, on_state_change=states.append
+        )
+
+        breaker.record_failure()
+        breaker.before_request()
+        breaker.record_failure()
+
+        assert breaker.state is CircuitState.OPEN
+        assert breaker.is_open()
+        assert states == [CircuitState.OPEN]
+        with pytest.raises(AICircuitOpenError):
+            breaker.before_request()
+
+    def test_success_resets_failure_count(self):
+        """Test that non-consecutive failures don't open the breaker."""
+        breaker = CircuitBreaker(failure_threshold=2)
+
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+
+        assert breaker.state is CircuitState.CLOSED
+
+    def test_half_open_probe_closes_on_success(self):
+        """Test that a single probe is allowed after the reset timeout."""
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout_s=30.0)
+
+        with patch("ai_client.breaker.time.monotonic", return_value=100.0):
+            breaker.record_failure()
+
+        with patch("ai_client.breaker.time.monotonic", return_value=131.0):
+            breaker.before_request()
+            assert breaker.state is CircuitState.HALF_OPEN
+            # Only one probe at a time
+            with pytest.raises(AICircuitOpenError):
+                breaker.before_request()
+
+        breaker.record_success()
+        assert breaker.state is CircuitState.CLOSED
+
+    def test_half_open_probe_reopens_on_failure(self):
+        """Test that a failed probe opens the breaker again."""
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout_s=30.0)
+
+        with patch("ai_client.breaker.time.monotonic", return_value=100.0):
+            breaker.record_failure()
+        with patch("ai_client.breaker.time.monotonic", return_value=131.0):
+            breaker.before_request()
+            breaker.record_failure()
+
+            assert breaker.state is CircuitState.OPEN
+            assert breaker.is_open()
+
+    def test_disabled_breaker_never_opens(self):
+        """Test that failure_threshold=0 disables the breaker."""
+        breaker = CircuitBreaker(failure_threshold=0)
+
+        for _ in range(10):
+            breaker.record_failure()
+
+        breaker.before_request()
+        assert breaker.state is CircuitState.CLOSED
@@ -0,0 +1,285 @@
+import asyncio
+import math
+from unittest.mock import patch
+
+import pytest
+
+from ai_client.models import AIHTTPError, AIResponseFormatError
+from app.antispam.ai.moderator import AIModerator
+from app.antispam.dto import MessageTask
+from app.monitoring import system_monitor
+from config import config
+from prompts import PROMPTS
+
+
+def prompt_index_of(prompt: str) -> int:
+    """Find which policy file the built prompt was made from."""
+    for i in range(len(PROMPTS)):
+        if prompt.startswith(PROMPTS.get(i)):
+            return i
+    raise AssertionError("Unknown prompt")
+
+
+class FakeAIService:
+    """AI service stub returning a fixed score and delay per prompt index."""
+
+    def __init__(
+        self,
+        scores: dict[int, str],
+        delays: dict[int, float] = None,
+        combined: str = None,
+        logprobs: dict[int, object] = None,
+    ):
+        self.scores = scores
+        self.delays = delays or {}
+        self.combined = combined
+        self.logprobs = logprobs or {}
+        self.logprob_calls: list[int] = []
+        self.combined_calls = 0
+        self.started: list[int] = []
+        self.finished: list[int] = []
+        self.cancelled: list[int] = []
+
+    async def one_shot(self, user_text: str, *, extra=None, **kwargs) -> str:
+        if "POLICY P1" in user_text:
+            self.combined_calls += 1
+            return self.combined
+        i = prompt_index_of(user_text)
+        self.started.append(i)
+        try:
+            await asyncio.sleep(self.delays.get(i, 0))
+        except asyncio.CancelledError:
+            self.cancelled.append(i)
+            raise
+        self.finished.append(i)
+        result = self.scores.get(i, "0.0")
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    async def top_logprobs(self, user_text: str, *, extra=None, top=5, **kwargs):
+        assert "Return ONLY YES or NO" in user_text
+        i = prompt_index_of(user_text)
+        self.logprob_calls.append(i)
+        result = self.logprobs.get(i, {"NO": -0.01, "YES": -5.0})
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+@pytest.fixture
+def task():
+    return MessageTask(
+        telegram_chat_id=-100,
+        telegram_message_id=1,
+        telegram_user_id=42,
+        text="write me in DM for details",
+    )
+
+
+@pytest.fixture
+def prompt_mode(monkeypatch):
+    def _set(mode: str):
+        monkeypatch.setattr(config.ai, "prompt_mode", mode)
+        monkeypatch.setattr(config.ai, "spam_threshold", 0.5)
+
+    return _set
+
+
+class TestAIModeratorPromptModes:
+    @pytest.mark.asyncio
+    async def test_sequential_stops_on_first_hit(self, task, prompt_mode):
+        prompt_mode("sequential")
+        service = FakeAIService(scores={0: "0.9"})
+
+        hit = await AIModerator(service).first_score_over_threshold(task)
+
+        assert hit.prompt_index == 0
+        assert hit.score == 0.9
+        assert service.started == [0]
+
+    @pytest.mark.asyncio
+    async def test_parallel_fires_all_prompts(self, task, prompt_mode):
+        prompt_mode("parallel")
+        service = FakeAIService(scores={})
+
+        hit = await AIModerator(service).first_score_over_threshold(task)
+
+        assert hit is None
+        assert sorted(service.started) == list(range(len(PROMPTS)))
+
+    @pytest.mark.asyncio
+    async def test_parallel_cancels_remaining_prompts_on_hit(
+        self, task, prompt_mode
+    ):
+        prompt_mode("parallel")
+        last = len(PROMPTS) - 1
+        service = FakeAIService(
+            scores={last: "0.8"},
+            delays={i: 5.0 for i in range(last)},
+        )
+
+        hit = await asyncio.wait_for(
+            AIModerator(service).first_score_over_threshold(task), timeout=1.0
+        )
+
+        assert hit.prompt_index == last
+        assert hit.score == 0.8
+        assert sorted(service.cancelled) == list(range(last))
+
+    @pytest.mark.asyncio
+    async def test_parallel_hit_wins_over_failed_prompt(self, task, prompt_mode):
+        prompt_mode("parallel")
+        service = FakeAIService(
+            scores={0: RuntimeError("boom"), 1: "0.7"},
+            delays={1: 0.01},
+        )
+
+        hit = await AIModerator(service).first_score_over_threshold(task)
+
+        assert hit.prompt_index == 1
+
+    @pytest.mark.asyncio
+    async def test_parallel_reraises_error_without_hit(self, task, prompt_mode):
+        prompt_mode("parallel")
+        service = FakeAIService(scores={0: RuntimeError("boom")})
+
+        with pytest.raises(RuntimeError, match="boom"):
+            await AIModerator(service).first_score_over_threshold(task)
+
+    @pytest.mark.asyncio
+    async def test_combined_uses_single_request(self, task, prompt_mode):
+        prompt_mode("combined")
+        lines = "\n".join(f"P{i + 1}=0.1" for i in range(len(PROMPTS)))
+        lines = lines.replace("P2=0.1", "P2=0.9")
+        service = FakeAIService(scores={}, combined=lines)
+
+        hit = await AIModerator(service).first_score_over_threshold(task)
+
+        assert hit.prompt_index == 1
+        assert hit.score == 0.9
+        assert service.combined_calls == 1
+        assert service.started == []
+
+    @pytest.mark.asyncio
+    async def test_combined_falls_back_to_per_prompt_calls(
+        self, task, prompt_mode
+    ):
+        prompt_mode("combined")
+        service = FakeAIService(scores={2: "0.6"}, combined="not a score")
+
+        hit = await AIModerator(service).first_score_over_threshold(task)
+
+        assert hit.prompt_index == 2
+        assert service.combined_calls == 1
+        assert service.started == [0, 1, 2]
+
+
+class TestAIModeratorLogprobScoring:
+    @pytest.mark.asyncio
+    async def test_logprob_scores_against_threshold(self, task, prompt_mode):
+        prompt_mode("sequential")
+        service = FakeAIService(
+            scores={},
+            logprobs={1: {"YES": math.log(0.72), " yes": math.log(0.08), "NO": math.log(0.2)}},  # noqa: E501
+        )
+
+        with patch.object(config.ai, "score_mode", "logprob"):
+            hit = await AIModerator(service).first_score_over_threshold(task)
+
+        assert hit.prompt_index == 1
+        assert hit.score == pytest.approx(0.8)
+        assert service.logprob_calls == [0, 1]
+        assert service.started == []
+
+    @pytest.mark.asyncio
+    async def test_falls_back_to_text_without_logprobs(self, task, prompt_mode):
+        prompt_mode("sequential")
+        service = FakeAIService(
+            scores={0: "0.1", 1: "0.1", 2: "0.1"},
+            logprobs={0: AIResponseFormatError("no logprobs")},
+        )
+        moderator = AIModerator(service)
+
+        with patch.object(config.ai, "score_mode", "logprob"):
+            assert await moderator.first_score_over_threshold(task) is None
+            assert await moderator.first_score_over_threshold(task) is None
+
+        # Backend asked for logprobs only once, then text scoring only
+        assert service.logprob_calls == [0]
+        assert service.started == [0, 1, 2, 0, 1, 2]
+
+    @pytest.mark.asyncio
+    async def test_no_yes_no_candidates_uses_text_score(self, task, prompt_mode):
+        prompt_mode("sequential")
+        service = FakeAIService(
+            scores={0: "0.9"}, logprobs={0: {"Maybe": -0.1}}
+        )
+
+        with patch.object(config.ai, "score_mode", "logprob"):
+            hit = await AIModerator(service).first_score_over_threshold(task)
+
+        assert hit.prompt_index == 0
+        assert hit.score == 0.9
+
+
+class TestAIModeratorCascade:
+    @pytest.mark.asyncio
+    async def test_confident_small_scores_are_not_escalated(
+        self, task, prompt_mode
+    ):
+        prompt_mode("sequential")
+        small = FakeAIService(scores={0: "0.05", 1: "0.95"})
+        large = FakeAIService(scores={})
+        escalations = system_monitor.ai_cascade_escalations
+        decisions = system_monitor.ai_cascade_decisions
+
+        hit = await AIModerator(large, small).first_score_over_threshold(task)
+
+        assert hit.prompt_index == 1
+        assert hit.score == 0.95
+        assert large.started == []
+        assert system_monitor.ai_cascade_decisions == decisions + 2
+        assert system_monitor.ai_cascade_escalations == escalations
+
+    @pytest.mark.asyncio
+    async def test_uncertain_small_score_escalates(self, task, prompt_mode):
+        prompt_mode("sequential")
+        small = FakeAIService(scores={0: "0.55"})
+        large = FakeAIService(scores={0: "0.9"})
+        escalations = system_monitor.ai_cascade_escalations
+
+        hit = await AIModerator(large, small).first_score_over_threshold(task)
+
+        assert hit.prompt_index == 0
+        assert hit.score == 0.9
+        assert small.started == [0]
+        assert large.started == [0]
+        assert system_monitor.ai_cascade_escalations == escalations + 1
+
+    @pytest.mark.asyncio
+    async def test_small_model_failure_escalates(self, task, prompt_mode):
+        prompt_mode("sequential")
+        small = FakeAIService(scores={0: AIHTTPError("down"), 1: "0.0", 2: "0.0"})
+        large = FakeAIService(scores={0: "0.1"})
+
+        hit = await AIModerator(large, small).first_score_over_threshold(task)
+
+        assert hit is None
+        assert large.started == [0]
+
+    @pytest.mark.asyncio
+    async def test_combined_escalates_whole_request(self, task, prompt_mode):
+        prompt_mode("combined")
+        uncertain = "\n".join(f"P{i + 1}=0.1" for i in range(len(PROMPTS)))
+        uncertain = uncertain.replace("P2=0.1", "P2=0.4")
+        confident = uncertain.replace("P2=0.4", "P2=0.8")
+        small = FakeAIService(scores={}, combined=uncertain)
+        large = FakeAIService(scores={}, combined=confident)
+
+        hit = await AIModerator(large, small).first_score_over_threshold(task)
+
+        assert hit.prompt_index == 1
+        assert hit.score == 0.8
+        assert small.combined_calls == 1
+        assert large.combined_calls == 1
@@ -0,0 +1,698 @@
+import asyncio
+import time
+
+import httpx
+import orjson
+import pytest
+from unittest.mock import patch
+
+from app.monitoring import system_monitor
+from ai_client.adapters import OllamaChatAdapter
+from ai_client.backend import AIBackend
+from ai_client.models import (
+    AIDeadlineExceededError,
+    AIHTTPError,
+    AIResponseFormatError,
+)
+from ai_client.router import BackendRouter
+from ai_client.service import AIService
+from app.antispam.scoring import AIScorer
+from config import config
+from config.ai_client import AIBackendConfig
+
+
+def mock_client(handler) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+@pytest.fixture
+def ai_config(monkeypatch):
+    def _set(base_url: str, model: str = "test-model", api_key: str = "key"):
+        monkeypatch.setattr(config.ai, "base_url", base_url)
+        monkeypatch.setattr(config.ai, "model", model)
+        monkeypatch.setattr(config.ai, "api_key", api_key)
+
+    return _set
+
+
+class TestAIServiceRequestTemplate:
+    @pytest.mark.asyncio
+    async def test_openai_request_is_built_from_template(self, ai_config):
+        """Test that the resolved URL/headers are used for every request."""
+        ai_config("https://api.example.com/v1")
+        requests = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            return httpx.Response(
+                200, json={"choices": [{"message": {"content": "0.4"}}]}
+            )
+
+        service = AIService()
+        service._client = mock_client(handler)
+
+        assert await service.one_shot("first", extra={"temperature": 0.1}) == "0.4"
+        assert await service.one_shot("second") == "0.4"
+
+        assert [str(r.url) for r in requests] == [
+            "https://api.example.com/v1/chat/completions"
+        ] * 2
+        assert requests[0].headers["Authorization"] == "Bearer key"
+        assert b'"temperature":0.1' in requests[0].content.replace(b" ", b"")
+        assert b"temperature" not in requests[1].content
+        assert b'"content":"second"' in requests[1].content.replace(b" ", b"")
+
+    @pytest.mark.asyncio
+    async def test_provider_resolved_once_per_reload(self, ai_config):
+        """Test that the docker check is not repeated for every request."""
+        ai_config("http://localhost:11434")
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(200, json={"message": {"content": "0.1"}})
+
+        with patch.object(
+            OllamaChatAdapter, "_is_running_inside_docker", return_value=False
+        ) as docker_check:
+            service = AIService()
+            service._client = mock_client(handler)
+
+            for _ in range(3):
+                assert await service.one_shot("hi") == "0.1"
+
+        assert docker_check.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_provider_is_resolved_at_construction(self, ai_config):
+        """Test that config changes apply to services created afterwards."""
+        ai_config("https://api.example.com")
+        service = AIService()
+
+        ai_config("http://ollama:11434/api/chat")
+
+        [backend] = service.backends
+        assert backend.template.url == "https://api.example.com/v1/chat/completions"  # noqa: E501
+        [backend] = AIService().backends
+        assert isinstance(backend.adapter, OllamaChatAdapter)
+        assert backend.template.url == "http://ollama:11434/api/chat"
+
+
+class TestAIServiceOutputLimits:
+    @pytest.mark.asyncio
+    async def test_openai_caps_and_stop_sequences(self, ai_config):
+        """Test that output caps map to OpenAI max_tokens / stop."""
+        ai_config("https://api.example.com/v1")
+        payloads = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            payloads.append(orjson.loads(request.content))
+            return httpx.Response(
+                200, json={"choices": [{"message": {"content": "0.4"}}]}
+            )
+
+        service = AIService()
+        service._client = mock_client(handler)
+        await service.one_shot("hi", max_tokens=8, stop=["\n"])
+
+        assert payloads[0]["max_tokens"] == 8
+        assert payloads[0]["stop"] == ["\n"]
+
+    @pytest.mark.asyncio
+    async def test_ollama_caps_go_to_options(self, ai_config):
+        """Test that output caps map to Ollama options.num_predict / stop."""
+        ai_config("http://ollama:11434/api/chat")
+        payloads = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            payloads.append(orjson.loads(request.content))
+            return httpx.Response(200, json={"message": {"content": "0.1"}})
+
+        service = AIService()
+        service._client = mock_client(handler)
+        await service.one_shot("hi", max_tokens=8, stop=["\n"])
+
+        assert payloads[0]["options"] == {"num_predict": 8, "stop": ["\n"]}
+        assert payloads[0]["stream"] is False
+
+
+class TestAIServiceStreaming:
+    @pytest.mark.asyncio
+    async def test_openai_stream_closed_after_complete_number(self, ai_config):
+        """Test that the SSE stream is abandoned once the score is complete."""
+        ai_config("https://api.example.com/v1")
+        sent = []
+
+        def chunk(text: str) -> bytes:
+            data = {"choices": [{"delta": {"content": text}, "finish_reason": None}]}
+            return b"data: " + orjson.dumps(data) + b"\n\n"
+
+        async def body():
+            for part in ["0", ".8", "5", "\n", "Because ", "it ", "is ", "spam"]:
+                sent.append(part)
+                yield chunk(part)
+            yield b"data: [DONE]\n\n"
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            assert orjson.loads(request.content)["stream"] is True
+            return httpx.Response(200, content=body())
+
+        service = AIService()
+        service._client = mock_client(handler)
+
+        text = await service.stream_until("hi", AIScorer.has_complete_score)
+
+        assert AIScorer.extract_score(text) == 0.85
+        assert "spam" not in sent
+
+    @pytest.mark.asyncio
+    async def test_ollama_stream_until_done(self, ai_config):
+        """Test NDJSON streaming when the number is only complete at the end."""
+        ai_config("http://ollama:11434/api/chat")
+
+        lines = [
+            {"message": {"content": "0."}, "done": False},
+            {"message": {"content": "3"}, "done": False},
+            {"message": {"content": ""}, "done": True},
+        ]
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(
+                200, content=b"".join(orjson.dumps(line) + b"\n" for line in lines)
+            )
+
+        service = AIService()
+        service._client = mock_client(handler)
+
+        text = await service.stream_until("hi", AIScorer.has_complete_score)
+
+        assert AIScorer.extract_score(text) == 0.3
+
+    def test_has_complete_score(self):
+        """Test that a number is complete only once it can't grow any more."""
+        assert not AIScorer.has_complete_score("0")
+        assert not AIScorer.has_complete_score("0.")
+        assert not AIScorer.has_complete_score("0.8")
+        assert AIScorer.has_complete_score("0.85\n")
+        assert AIScorer.has_complete_score("Score: 1 ")
+
+
+class TestAIServiceLogprobs:
+    @pytest.mark.asyncio
+    async def test_openai_top_logprobs_single_token(self, ai_config):
+        """Test that logprob requests generate one token and parse candidates."""
+        ai_config("https://api.example.com/v1")
+        payloads = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            payloads.append(orjson.loads(request.content))
+            top = [{"token": "YES", "logprob": -0.1}, {"token": "NO", "logprob": -2.4}]  # noqa: E501
+            return httpx.Response(
+                200,
+                json={
+                    "choices": [
+                        {
+                            "message": {"content": "YES"},
+                            "logprobs": {"content": [{"token": "YES", "top_logprobs": top}]},  # noqa: E501
+                        }
+                    ]
+                },
+            )
+
+        service = AIService()
+        service._client = mock_client(handler)
+
+        top = await service.top_logprobs("hi", top=5)
+
+        assert top == {"YES": -0.1, "NO": -2.4}
+        assert payloads[0]["max_tokens"] == 1
+        assert payloads[0]["logprobs"] is True
+        assert payloads[0]["top_logprobs"] == 5
+
+    @pytest.mark.asyncio
+    async def test_missing_logprobs_raise_format_error(self, ai_config):
+        """Test that a backend without logprob support is reported."""
+        ai_config("http://ollama:11434/api/chat")
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(200, json={"message": {"content": "YES"}})
+
+        service = AIService()
+        service._client = mock_client(handler)
+
+        with pytest.raises(AIResponseFormatError):
+            await service.top_logprobs("hi")
+
+    @pytest.mark.asyncio
+    async def test_rejected_logprob_request_is_remembered(self, ai_config):
+        """Test that a 4xx on a logprob request marks the backend unsupported."""  # noqa: E501
+        ai_config("https://api.example.com/v1")
+        requests = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            if "top_logprobs" in orjson.loads(request.content):
+                return httpx.Response(400, json={"error": "logprobs unsupported"})  # noqa: E501
+            return openai_reply("0.1")
+
+        service = AIService()
+        service._client = mock_client(handler)
+
+        with pytest.raises(AIResponseFormatError):
+            await service.top_logprobs("hi")
+        with pytest.raises(AIResponseFormatError):
+            await service.top_logprobs("hi")
+
+        # Not sent again, and not counted against the backend's health
+        assert len(requests) == 1
+        assert not service.logprobs_supported
+        assert not service.circuit_open
+        assert await service.one_shot("hi") == "0.1"
+
+    @pytest.mark.asyncio
+    async def test_rate_limited_logprob_request_is_not_unsupported(
+        self, ai_config
+    ):
+        ai_config("https://api.example.com/v1")
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(429, json={"error": "slow down"})
+
+        service = AIService()
+        service._client = mock_client(handler)
+
+        with pytest.raises(AIHTTPError):
+            await service.top_logprobs("hi")
+
+        assert service.logprobs_supported
+
+
+def backend_configs(*hosts: str) -> list[AIBackendConfig]:
+    return [
+        AIBackendConfig(base_url=f"https://{host}/v1", api_key="key", model="m")
+        for host in hosts
+    ]
+
+
+def openai_reply(content: str) -> httpx.Response:
+    return httpx.Response(200, json={"choices": [{"message": {"content": content}}]})  # noqa: E501
+
+
+class TestAIServiceRouting:
+    @pytest.mark.asyncio
+    async def test_failover_to_next_backend(self, monkeypatch):
+        """Test that a failing backend's request is retried on another one."""
+        monkeypatch.setattr(config.ai.routing, "failover", True)
+        monkeypatch.setattr(config.ai.routing, "hedge_enabled", False)
+        failovers = system_monitor.ai_failovers
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            if request.url.host == "a":
+                return httpx.Response(503, text="overloaded")
+            return openai_reply("0.2")
+
+        service = AIService(backends=backend_configs("a", "b"))
+        service._client = mock_client(handler)
+
+        assert await service.one_shot("hi") == "0.2"
+        assert system_monitor.ai_failovers == failovers + 1
+
+    @pytest.mark.asyncio
+    async def test_logprobs_move_on_to_a_backend_that_supports_them(
+        self, monkeypatch
+    ):
+        monkeypatch.setattr(config.ai.routing, "failover", False)
+        monkeypatch.setattr(config.ai.routing, "hedge_enabled", False)
+        hosts = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            hosts.append(request.url.host)
+            if request.url.host == "a":
+                return httpx.Response(400, json={"error": "logprobs unsupported"})  # noqa: E501
+            top = [{"token": "YES", "logprob": -0.1}]
+            return httpx.Response(
+                200,
+                json={
+                    "choices": [
+                        {
+                            "message": {"content": "YES"},
+                            "logprobs": {"content": [{"token": "YES", "top_logprobs": top}]},  # noqa: E501
+                        }
+                    ]
+                },
+            )
+
+        service = AIService(backends=backend_configs("a", "b"))
+        service._client = mock_client(handler)
+        a, b = service.backends
+        # Make "a" the preferred backend
+        b.ewma_latency_s = 5.0
+
+        assert await service.top_logprobs("hi") == {"YES": -0.1}
+        assert await service.top_logprobs("hi") == {"YES": -0.1}
+
+        # "a" is asked once, then skipped without a request
+        assert hosts == ["a", "b", "b"]
+        assert not a.logprobs_supported
+        assert service.logprobs_supported
+        assert not service.circuit_open
+
+    @pytest.mark.asyncio
+    async def test_no_failover_when_disabled(self, monkeypatch):
+        """Test that the first backend error is raised with failover off."""
+        monkeypatch.setattr(config.ai.routing, "failover", False)
+        monkeypatch.setattr(config.ai.routing, "hedge_enabled", False)
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(503, text="overloaded")
+
+        service = AIService(backends=backend_configs("a", "b"))
+        service._client = mock_client(handler)
+
+        with pytest.raises(AIHTTPError):
+            await service.one_shot("hi")
+
+    @pytest.mark.asyncio
+    async def test_hedged_request_to_second_backend(self, monkeypatch):
+        """Test that a slow backend is hedged and the fast answer wins."""
+        monkeypatch.setattr(config.ai.routing, "hedge_enabled", True)
+        monkeypatch.setattr(config.ai.routing, "hedge_default_ms", 20)
+        hedged = system_monitor.ai_hedged_requests
+        cancelled = []
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            if request.url.host == "slow":
+                try:
+                    await asyncio.sleep(5)
+                except asyncio.CancelledError:
+                    cancelled.append(request.url.host)
+                    raise
+                return openai_reply("0.9")
+            return openai_reply("0.1")
+
+        service = AIService(backends=backend_configs("slow", "fast"))
+        service._client = mock_client(handler)
+
+        result = await asyncio.wait_for(service.one_shot("hi"), timeout=1.0)
+
+        assert result == "0.1"
+        assert system_monitor.ai_hedged_requests == hedged + 1
+        assert cancelled == ["slow"]
+        assert all(b.outstanding == 0 for b in service.backends)
+
+    @pytest.mark.asyncio
+    async def test_open_circuit_backend_is_skipped(self, monkeypatch):
+        """Test that backends with an open circuit get no traffic."""
+        monkeypatch.setattr(config.ai.routing, "hedge_enabled", False)
+        hosts = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            hosts.append(request.url.host)
+            return openai_reply("0.1")
+
+        service = AIService(backends=backend_configs("a", "b"))
+        service._client = mock_client(handler)
+        a, _ = service.backends
+        for _ in range(a.breaker.failure_threshold):
+            a.breaker.record_failure()
+
+        for _ in range(3):
+            await service.one_shot("hi")
+
+        assert hosts == ["b"] * 3
+        assert not service.circuit_open
+
+
+class TestBackendRouter:
+    def test_least_outstanding_prefers_idle_backend(self):
+        """Test that load relative to the limit decides the backend."""
+        a, b = (AIBackend(cfg) for cfg in backend_configs("a", "b"))
+        a.outstanding = 3
+        router = BackendRouter([a, b], strategy="least_outstanding")
+
+        assert router.pick() is b
+        assert router.pick(exclude=[b]) is a
+
+    def test_ewma_prefers_fast_backend(self):
+        """Test that the smoothed latency decides the backend."""
+        a, b = (AIBackend(cfg) for cfg in backend_configs("a", "b"))
+        a.ewma_latency_s = 2.0
+        b.ewma_latency_s = 0.5
+        router = BackendRouter([a, b], strategy="ewma")
+
+        assert router.pick() is b
+
+        # A fast backend stops winning once requests queue up on it
+        b.outstanding = 4
+        assert router.pick() is a
+
+    def test_hedge_delay_uses_p95(self):
+        """Test that the hedge delay follows observed latencies."""
+        [backend] = (AIBackend(cfg) for cfg in backend_configs("a"))
+        assert backend.hedge_delay_s(2.0) == 2.0
+
+        for i in range(100):
+            backend._record_latency(i / 100)
+
+        assert backend.hedge_delay_s(2.0) == pytest.approx(0.94)
+
+
+class TestAIServiceCoalescing:
+    @pytest.mark.asyncio
+    async def test_identical_requests_share_one_call(self, ai_config, monkeypatch):  # noqa: E501
+        """Test that a burst of identical prompts hits the backend once."""
+        ai_config("https://api.example.com/v1")
+        monkeypatch.setattr(config.ai, "coalesce_requests", True)
+        requests_before = system_monitor.ai_requests_count
+        coalesced_before = system_monitor.ai_requests_coalesced
+        hits = 0
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            nonlocal hits
+            hits += 1
+            await asyncio.sleep(0.01)
+            return openai_reply("0.9")
+
+        service = AIService()
+        service._client = mock_client(handler)
+
+        results = await asyncio.gather(
+            *(service.one_shot("raid", extra={"temperature": 0.2}) for _ in range(10)),  # noqa: E501
+            service.one_shot("other"),
+        )
+
+        assert results == ["0.9"] * 11
+        assert hits == 2
+        assert system_monitor.ai_requests_count == requests_before + 2
+        assert system_monitor.ai_requests_coalesced == coalesced_before + 9
+
+    @pytest.mark.asyncio
+    async def test_late_joiner_keeps_its_own_deadline(
+        self, ai_config, monkeypatch
+    ):
+        """Test that a shared call isn't bound to the first caller's deadline."""  # noqa: E501
+        ai_config("https://api.example.com/v1")
+        monkeypatch.setattr(config.ai, "coalesce_requests", True)
+        hits = 0
+        timeouts = []
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            nonlocal hits
+            hits += 1
+            timeouts.append(request.extensions["timeout"]["read"])
+            await asyncio.sleep(0.2)
+            return openai_reply("0.9")
+
+        service = AIService()
+        service._client = mock_client(handler)
+
+        async def late_joiner() -> str:
+            await asyncio.sleep(0.01)
+            return await service.one_shot(
+                "raid", deadline=time.monotonic() + 2.0
+            )
+
+        first, late = await asyncio.gather(
+            service.one_shot("raid", deadline=time.monotonic() + 0.05),
+            late_joiner(),
+            return_exceptions=True,
+        )
+
+        assert isinstance(first, AIDeadlineExceededError)
+        assert late == "0.9"
+        assert hits == 1
+        assert timeouts == [config.ai.http.timeout_s]
+
+    @pytest.mark.asyncio
+    async def test_streams_share_only_with_the_same_predicate(
+        self, ai_config, monkeypatch
+    ):
+        """Test that a stream cut short for one caller isn't handed to another."""  # noqa: E501
+        ai_config("https://api.example.com/v1")
+        monkeypatch.setattr(config.ai, "coalesce_requests", True)
+        hits = 0
+
+        def chunk(text: str) -> bytes:
+            data = {"choices": [{"delta": {"content": text}, "finish_reason": None}]}  # noqa: E501
+            return b"data: " + orjson.dumps(data) + b"\n\n"
+
+        async def body():
+            await asyncio.sleep(0.01)
+            for part in ["0", ".8", "5", "\n", "Because ", "spam"]:
+                yield chunk(part)
+            yield b"data: [DONE]\n\n"
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            nonlocal hits
+            hits += 1
+            return httpx.Response(200, content=body())
+
+        service = AIService()
+        service._client = mock_client(handler)
+
+        def first_token(text: str) -> bool:
+            return bool(text)
+
+        score, score_again, token = await asyncio.gather(
+            service.stream_until("raid", AIScorer.has_complete_score),
+            service.stream_until("raid", AIScorer.has_complete_score),
+            service.stream_until("raid", first_token),
+        )
+
+        assert score == score_again == "0.85\n"
+        assert token == "0"
+        assert hits == 2
+
+    @pytest.mark.asyncio
+    async def test_coalescing_can_be_disabled(self, ai_config, monkeypatch):
+        """Test that every request is sent when coalescing is off."""
+        ai_config("https://api.example.com/v1")
+        monkeypatch.setattr(config.ai, "coalesce_requests", False)
+        hits = 0
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            nonlocal hits
+            hits += 1
+            await asyncio.sleep(0.01)
+            return openai_reply("0.9")
+
+        service = AIService()
+        service._client = mock_client(handler)
+
+        await asyncio.gather(*(service.one_shot("raid") for _ in range(3)))
+
+        assert hits == 3
+
+
+class TestAIServiceDeadline:
+    @pytest.mark.asyncio
+    async def test_expired_deadline_sends_nothing(self, ai_config):
+        """Test that a request past its deadline is not sent at all."""
+        ai_config("https://api.example.com/v1")
+        hits = 0
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            nonlocal hits
+            hits += 1
+            return openai_reply("0.1")
+
+        service = AIService()
+        service._client = mock_client(handler)
+
+        with pytest.raises(AIDeadlineExceededError):
+            await service.one_shot("hi", deadline=time.monotonic() - 1)
+
+        assert hits == 0
+
+    @pytest.mark.asyncio
+    async def test_http_timeout_follows_remaining_time(
+        self, ai_config, monkeypatch
+    ):
+        """Test that the HTTP timeout is cut to the time left."""
+        ai_config("https://api.example.com/v1")
+        # Shared (coalesced) calls always get the full timeout
+        monkeypatch.setattr(config.ai, "coalesce_requests", False)
+        timeouts = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            timeouts.append(request.extensions["timeout"]["read"])
+            return openai_reply("0.1")
+
+        service = AIService()
+        service._client = mock_client(handler)
+
+        await service.one_shot("hi", deadline=time.monotonic() + 2.0)
+        await service.one_shot("hi")
+
+        assert 0 < timeouts[0] <= 2.0
+        assert timeouts[1] == config.ai.http.timeout_s
+
+    @pytest.mark.asyncio
+    async def test_deadline_timeout_is_not_a_backend_failure(
+        self, ai_config, monkeypatch
+    ):
+        """Test that running out of budget doesn't trip the breaker."""
+        ai_config("https://api.example.com/v1")
+        monkeypatch.setattr(config.ai, "coalesce_requests", False)
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            raise httpx.ReadTimeout("timed out", request=request)
+
+        service = AIService()
+        service._client = mock_client(handler)
+        [backend] = service.backends
+        # Usually fast, but its p95 doesn't fit into the 1s left
+        backend.ewma_latency_s = 0.5
+        backend._latencies.extend([0.5] * 15 + [3.0] * 5)
+        limit = backend.limiter.limit
+
+        for _ in range(backend.breaker.failure_threshold + 1):
+            with pytest.raises(AIDeadlineExceededError):
+                await service.one_shot("hi", deadline=time.monotonic() + 1.0)
+
+        assert not service.circuit_open
+        assert backend.limiter.limit == limit
+
+    @pytest.mark.asyncio
+    async def test_hung_backend_opens_circuit_under_budget(
+        self, ai_config, monkeypatch
+    ):
+        """Test that timeouts within the message budget still count as failures."""  # noqa: E501
+        ai_config("https://api.example.com/v1")
+        monkeypatch.setattr(config.ai, "message_budget_s", 20.0)
+        assert config.ai.message_budget_s < config.ai.http.timeout_s
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            raise httpx.ReadTimeout("timed out", request=request)
+
+        service = AIService()
+        service._client = mock_client(handler)
+        [backend] = service.backends
+
+        for _ in range(backend.breaker.failure_threshold):
+            with pytest.raises(AIHTTPError):
+                await service.one_shot(
+                    "hi",
+                    deadline=time.monotonic() + config.ai.message_budget_s,
+                )
+
+        assert service.circuit_open
+
+    @pytest.mark.asyncio
+    async def test_request_skipped_when_backend_too_slow(self, ai_config):
+        """Test that a prompt that can't finish in budget is skipped."""
+        ai_config("https://api.example.com/v1")
+        hits = 0
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            nonlocal hits
+            hits += 1
+            return openai_reply("0.1")
+
+        service = AIService()
+        service._client = mock_client(handler)
+        [backend] = service.backends
+        backend.ewma_latency_s = 5.0
+
+        with pytest.raises(AIDeadlineExceededError):
+            await service.one_shot("hi", deadline=time.monotonic() + 1.0)
+
+        assert hits == 0
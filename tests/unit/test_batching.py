@@ -0,0 +1,170 @@
+import asyncio
+import time
+
+import pytest
+
+from ai_client.models import AIDeadlineExceededError
+from app.antispam.ai.moderator import AIModerator
+from app.antispam.scoring.batch_scorer import AIBatchScorer
+from config import config
+from utils import MicroBatcher
+
+
+class TestMicroBatcher:
+    @pytest.mark.asyncio
+    async def test_flushes_when_batch_is_full(self):
+        """Test that a full batch is flushed without waiting for the timer."""
+        calls = []
+
+        async def flush(key, items):
+            calls.append((key, list(items)))
+            return [item * 10 for item in items]
+
+        batcher = MicroBatcher(flush, max_size=3, max_wait_s=10.0)
+
+        results = await asyncio.wait_for(
+            asyncio.gather(*(batcher.submit("k", i) for i in range(3))),
+            timeout=1.0,
+        )
+
+        assert results == [0, 10, 20]
+        assert calls == [("k", [0, 1, 2])]
+
+    @pytest.mark.asyncio
+    async def test_flushes_after_max_wait(self):
+        """Test that a partial batch is flushed once the window expires."""
+        calls = []
+
+        async def flush(key, items):
+            calls.append((key, list(items)))
+            return list(items)
+
+        batcher = MicroBatcher(flush, max_size=100, max_wait_s=0.01)
+
+        results = await asyncio.gather(batcher.submit("a", 1), batcher.submit("a", 2))
+
+        assert results == [1, 2]
+        assert calls == [("a", [1, 2])]
+
+    @pytest.mark.asyncio
+    async def test_batches_are_kept_per_key(self):
+        """Test that items with different keys never share a batch."""
+        calls = []
+
+        async def flush(key, items):
+            calls.append((key, list(items)))
+            return list(items)
+
+        batcher = MicroBatcher(flush, max_size=100, max_wait_s=0.01)
+
+        await asyncio.gather(batcher.submit(0, "x"), batcher.submit(1, "y"))
+
+        assert sorted(calls) == [(0, ["x"]), (1, ["y"])]
+
+    @pytest.mark.asyncio
+    async def test_flush_error_is_delivered_to_every_caller(self):
+        """Test that a failing flush fails all waiting callers."""
+
+        async def flush(key, items):
+            raise RuntimeError("backend down")
+
+        batcher = MicroBatcher(flush, max_size=2, max_wait_s=10.0)
+
+        results = await asyncio.gather(
+            batcher.submit("k", 1), batcher.submit("k", 2), return_exceptions=True
+        )
+
+        assert all(isinstance(r, RuntimeError) for r in results)
+
+
+class FakeAIService:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.prompts = []
+        self.deadlines = []
+
+    async def one_shot(self, user_text, *, extra=None, deadline=None, **kwargs):  # noqa: E501
+        self.prompts.append(user_text)
+        self.deadlines.append(deadline)
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+class TestAIBatchScorer:
+    @pytest.mark.asyncio
+    async def test_scores_are_demultiplexed_per_message(self):
+        """Test that one batched request yields a score per message."""
+        service = FakeAIService(["M1=0.1\nM2=0.9"])
+        scorer = AIBatchScorer(service, max_size=2, max_wait_ms=1000)
+
+        scores = await asyncio.gather(scorer.score("hi", 0), scorer.score("buy now", 0))
+
+        assert scores == [0.1, 0.9]
+        assert "<<<BEGIN MESSAGE M2>>>" in service.prompts[-1]
+
+    @pytest.mark.asyncio
+    async def test_falls_back_to_single_requests(self):
+        """Test that an unparseable batch is re-scored message by message."""
+        service = FakeAIService(["garbage", "0.2", "0.8"])
+        scorer = AIBatchScorer(service, max_size=2, max_wait_ms=1000)
+
+        scores = await asyncio.gather(scorer.score("hi", 0), scorer.score("buy now", 0))
+
+        assert scores == [0.2, 0.8]
+        assert len(service.prompts) == 3
+
+    @pytest.mark.asyncio
+    async def test_expired_messages_are_left_out(self):
+        """Test that a batch drops expired messages and keeps the earliest deadline."""  # noqa: E501
+        service = FakeAIService(["M1=0.1\nM2=0.9"])
+        scorer = AIBatchScorer(service, max_size=3, max_wait_ms=1000)
+        now = time.monotonic()
+
+        async def expires_while_queued():
+            return await scorer.score("old", 0, deadline=now + 0.01)
+
+        expired = asyncio.create_task(expires_while_queued())
+        await asyncio.sleep(0.02)
+        scores = await asyncio.gather(
+            scorer.score("hi", 0, deadline=now + 5),
+            scorer.score("buy now", 0, deadline=now + 10),
+        )
+
+        assert scores == [0.1, 0.9]
+        with pytest.raises(AIDeadlineExceededError):
+            await expired
+        assert "old" not in service.prompts[0]
+        assert service.deadlines == [now + 5]
+
+    @pytest.mark.asyncio
+    async def test_batch_too_slow_for_earliest_deadline(self):
+        """Test that the others are scored alone when the batch can't fit."""
+        too_slow = AIDeadlineExceededError("too slow")
+        service = FakeAIService([too_slow, too_slow, "0.2"])
+        scorer = AIBatchScorer(service, max_size=2, max_wait_ms=1000)
+        now = time.monotonic()
+
+        urgent, patient = await asyncio.gather(
+            scorer.score("hi", 0, deadline=now + 0.05),
+            scorer.score("buy now", 0, deadline=now + 10),
+            return_exceptions=True,
+        )
+
+        assert isinstance(urgent, AIDeadlineExceededError)
+        assert patient == 0.2
+        assert service.deadlines == [now + 0.05, now + 0.05, now + 10]
+
+    @pytest.mark.asyncio
+    async def test_moderator_close_flushes_pending_batches(self, monkeypatch):
+        monkeypatch.setattr(config.ai.batch, "enabled", True)
+        monkeypatch.setattr(config.ai.batch, "max_wait_ms", 60_000)
+        service = FakeAIService(["0.7"])
+        moderator = AIModerator(service)
+
+        pending = asyncio.create_task(moderator._large.batch_scorer.score("hi", 0))  # noqa: E501
+        await asyncio.sleep(0)
+        await asyncio.wait_for(moderator.close(), timeout=1.0)
+
+        assert await asyncio.wait_for(pending, timeout=1.0) == 0.7
@@ -1,185 +1,171 @@
+import asyncio
+
 import pytest
-from unittest.mock import AsyncMock, MagicMock, patch
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.exc import IntegrityError
-from app.services.chat_registry import ChatRegistry, ChatCacheEntry
+import pytest_asyncio
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base import Base
 from app.db.models.chat import Chat
+from app.monitoring import system_monitor
+from app.services.chat_registry import ChatRegistry, ChatState
 
 
-class TestChatCacheEntry:
-    def test_cache_entry_creation(self):
-        """Test that ChatCacheEntry is created correctly."""
-        entry = ChatCacheEntry(last_seen_ts=12345.0, title="Test Chat")
+@pytest_asyncio.fixture
+async def session_maker():
+    """Create an in-memory SQLite database for testing."""
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:", echo=False)
 
-        assert entry.last_seen_ts == 12345.0
-        assert entry.title == "Test Chat"
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
 
+    yield sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
-class TestChatRegistry:
-    def test_is_fresh_with_valid_entry(self):
-        """Test that _is_fresh returns True for recent entries."""
-        registry = ChatRegistry(ttl_seconds=3600)
-        chat_id = 12345
-
-        # Create an entry with recent timestamp
-        registry._cache[chat_id] = ChatCacheEntry(
-            last_seen_ts=1000000.0, title="Test Chat"
-        )
+    await engine.dispose()
 
-        # Mock time.time to return a time within TTL
-        with patch("app.services.chat_registry.time.time", return_value=1000001.0):
-            assert registry._is_fresh(chat_id) is True
 
-    def test_is_fresh_with_expired_entry(self):
-        """Test that _is_fresh returns False for expired entries."""
-        registry = ChatRegistry(ttl_seconds=3600)
-        chat_id = 12345
+def registry(**kwargs) -> ChatRegistry:
+    params = dict(ttl_s=3600, max_size=100, negative_ttl_s=60)
+    params.update(kwargs)
+    return ChatRegistry(**params)
 
-        # Create an entry with old timestamp
-        registry._cache[chat_id] = ChatCacheEntry(
-            last_seen_ts=1000000.0, title="Test Chat"
+
+class TestChatState:
+    def test_from_model(self):
+        chat = Chat(
+            id=1,
+            telegram_chat_id=-100,
+            title="Test Chat",
+            is_active=True,
+            enable_ai_check=False,
+            cleanup_mentions=True,
+            cleanup_links=False,
+            cleanup_emojis=True,
+            allowed_link_domains=["example.com"],
         )
 
-        # Mock time.time to return a time beyond TTL
-        with patch("app.services.chat_registry.time.time", return_value=2000001.0):
-            assert registry._is_fresh(chat_id) is False
+        state = ChatState.from_model(chat)
+
+        assert state.telegram_chat_id == -100
+        assert state.is_active is True
+        assert state.allowed_link_domains == ("example.com",)
+
+
+class TestChatRegistry:
+    @pytest.mark.asyncio
+    async def test_ensure_chat_creates_new_chat(self, session_maker):
+        chats = registry()
+
+        async with session_maker() as session:
+            state = await chats.ensure_chat(session, -100, "New Chat")
+
+        assert state.title == "New Chat"
+        assert state.is_active is False
+        assert state.cleanup_links is True
+
+        async with session_maker() as session:
+            row = (
+                await session.execute(select(Chat).where(Chat.telegram_chat_id == -100))  # noqa: E501
+            ).scalar_one()
+            assert row.id == state.id
+
+    @pytest.mark.asyncio
+    async def test_one_query_per_chat(self, session_maker):
+        chats = registry()
+        loads = system_monitor.chat_cache_db_loads
+        hits = system_monitor.chat_cache_hits
+
+        async with session_maker() as session:
+            # Unknown chat: one load, then the handler and the worker
+            # both see the cached state
+            await chats.ensure_chat(session, -100, "Chat")
+            await chats.ensure_chat(session, -100, "Chat")
+            assert (await chats.get(session, -100)).title == "Chat"
+
+        assert system_monitor.chat_cache_db_loads == loads + 1
+        assert system_monitor.chat_cache_hits == hits + 2
 
-    def test_touch_updates_cache(self):
-        """Test that touch updates the cache entry."""
-        registry = ChatRegistry(ttl_seconds=3600)
-        chat_id = 12345
-        title = "Updated Title"
+    @pytest.mark.asyncio
+    async def test_unknown_chat_is_cached_negatively(self, session_maker):
+        chats = registry()
+        loads = system_monitor.chat_cache_db_loads
 
-        # Mock time.time to return a specific value
-        with patch("app.services.chat_registry.time.time", return_value=123456.0):
-            registry.touch(chat_id, title)
+        async with session_maker() as session:
+            assert await chats.get(session, -100) is None
+            assert await chats.get(session, -100) is None
 
-        assert chat_id in registry._cache
-        assert registry._cache[chat_id].last_seen_ts == 123456.0
-        assert registry._cache[chat_id].title == title
+        assert system_monitor.chat_cache_db_loads == loads + 1
 
     @pytest.mark.asyncio
-    async def test_ensure_chat_skips_fresh_cache(self):
-        """Test that ensure_chat skips DB operations when cache is fresh."""
-        registry = ChatRegistry(ttl_seconds=3600)
-        session = AsyncMock(spec=AsyncSession)
-
-        chat_id = 12345
-        title = "Test Chat"
-
-        # Add entry to cache to make it fresh
-        registry._cache[chat_id] = ChatCacheEntry(last_seen_ts=1000000.0, title=title)
-
-        # Mock time.time to return a time within TTL
-        with patch("app.services.chat_registry.time.time", return_value=1000001.0):
-            await registry.ensure_chat(
-                session=session,
-                telegram_chat_id=chat_id,
-                title=title,
-                default_is_active=False,
+    async def test_concurrent_misses_share_one_load(self, session_maker):
+        chats = registry()
+        async with session_maker() as session:
+            await chats.ensure_chat(session, -100, "Chat")
+        chats.invalidate(-100)
+        loads = system_monitor.chat_cache_db_loads
+
+        async with session_maker() as session:
+            states = await asyncio.gather(
+                *(chats.get(session, -100) for _ in range(5))
             )
 
-        # Verify that no DB operations were performed
-        session.execute.assert_not_called()
-        session.add.assert_not_called()
-        session.commit.assert_not_called()
+        assert {s.title for s in states} == {"Chat"}
+        assert system_monitor.chat_cache_db_loads == loads + 1
 
     @pytest.mark.asyncio
-    async def test_ensure_chat_creates_new_chat(self):
-        """Test that ensure_chat creates a new chat when it doesn't exist."""
-        registry = ChatRegistry(ttl_seconds=3600)
-        session = AsyncMock(spec=AsyncSession)
-
-        chat_id = 12345
-        title = "New Test Chat"
-
-        # Mock the get_chat_by_telegram_id to return None (chat doesn't exist)
-        with patch(
-            "app.services.chat_registry.get_chat_by_telegram_id",
-            AsyncMock(return_value=None),
-        ):
-            with patch(
-                "app.services.chat_registry.time.time", side_effect=[500000.0, 500001.0]
-            ):  # For cache check and touch
-                await registry.ensure_chat(
-                    session=session,
-                    telegram_chat_id=chat_id,
-                    title=title,
-                    default_is_active=True,
-                )
-
-        # Verify that a new chat was created and added to session
-        assert session.add.call_count == 1
-        added_chat = session.add.call_args[0][0]
-        assert isinstance(added_chat, Chat)
-        assert added_chat.telegram_chat_id == chat_id
-        assert added_chat.title == title
-        assert added_chat.is_active is True  # default_is_active was True
-
-        # Verify flush and commit were called
-        session.flush.assert_called_once()
-        session.commit.assert_called_once()
+    async def test_title_change_is_persisted(self, session_maker):
+        chats = registry()
+
+        async with session_maker() as session:
+            await chats.ensure_chat(session, -100, "Old Title")
+            state = await chats.ensure_chat(session, -100, "New Title")
+
+        assert state.title == "New Title"
+        chats.invalidate(-100)
+        async with session_maker() as session:
+            assert (await chats.get(session, -100)).title == "New Title"
 
     @pytest.mark.asyncio
-    async def test_ensure_chat_updates_existing_chat_title(self):
-        """Test that ensure_chat updates title when changed."""
-        registry = ChatRegistry(ttl_seconds=3600)
-        session = AsyncMock(spec=AsyncSession)
-
-        chat_id = 12345
-        old_title = "Old Title"
-        new_title = "New Title"
-
-        # Create a mock chat
-        mock_chat = MagicMock(spec=Chat)
-        mock_chat.title = old_title
-
-        # Mock the get_chat_by_telegram_id to return an existing chat
-        with patch(
-            "app.services.chat_registry.get_chat_by_telegram_id",
-            AsyncMock(return_value=mock_chat),
-        ):
-            with patch(
-                "app.services.chat_registry.time.time", side_effect=[500000.0, 500001.0]
-            ):  # For cache check and touch
-                await registry.ensure_chat(
-                    session=session,
-                    telegram_chat_id=chat_id,
-                    title=new_title,
-                    default_is_active=False,
-                )
-
-        # Verify that the chat title was updated
-        assert mock_chat.title == new_title
-        session.commit.assert_called_once()
+    async def test_invalidate_picks_up_admin_changes(self, session_maker):
+        chats = registry()
+
+        async with session_maker() as session:
+            state = await chats.ensure_chat(session, -100, "Chat")
+            chat = await session.get(Chat, state.id)
+            chat.is_active = True
+            await session.commit()
+
+            assert (await chats.get(session, -100)).is_active is False
+            chats.invalidate(-100)
+            assert (await chats.get(session, -100)).is_active is True
 
     @pytest.mark.asyncio
-    async def test_ensure_chat_handles_integrity_error(self):
-        """Test that ensure_chat handles IntegrityError gracefully."""
-        registry = ChatRegistry(ttl_seconds=3600)
-        session = AsyncMock(spec=AsyncSession)
-
-        chat_id = 12345
-        title = "Test Chat"
-
-        # Mock the get_chat_by_telegram_id to return None (chat doesn't exist)
-        with patch(
-            "app.services.chat_registry.get_chat_by_telegram_id",
-            AsyncMock(return_value=None),
-        ):
-            # Make session.add raise an IntegrityError
-            session.add.side_effect = IntegrityError("Duplicate entry", [], {})
-
-            with patch("app.services.chat_registry.time.time", return_value=500000.0):
-                await registry.ensure_chat(
-                    session=session,
-                    telegram_chat_id=chat_id,
-                    title=title,
-                    default_is_active=False,
-                )
-
-        # Verify that rollback was called
-        session.rollback.assert_called_once()
-        # Ensure cache was updated with the correct title
-        assert chat_id in registry._cache
-        assert registry._cache[chat_id].title == title
+    async def test_lru_is_bounded(self, session_maker):
+        chats = registry(max_size=2)
+        evictions = system_monitor.chat_cache_evictions
+
+        async with session_maker() as session:
+            for chat_id in (-1, -2, -3):
+                await chats.get(session, chat_id)
+
+        assert list(chats._entries) == [-2, -3]
+        assert system_monitor.chat_cache_evictions == evictions + 1
+
+    @pytest.mark.asyncio
+    async def test_creation_race_reloads_existing_chat(self, session_maker):
+        chats = registry()
+
+        async with session_maker() as session:
+            assert await chats.get(session, -100) is None
+
+        # Another writer registers the chat while it's cached as unknown
+        async with session_maker() as session:
+            session.add(Chat(telegram_chat_id=-100, title="Existing"))
+            await session.commit()
+
+        async with session_maker() as session:
+            state = await chats.ensure_chat(session, -100, None)
+
+        assert state is not None
+        assert state.title == "Existing"
@@ -0,0 +1,50 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.bot.middleware import db_session
+from app.bot.middleware.db_session import DbSessionMiddleware
+from app.db.helper import DataBaseHelper
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    helper = DataBaseHelper(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+    monkeypatch.setattr(db_session, "get_db", lambda: helper)
+    return helper
+
+
+class TestDbSessionMiddleware:
+    @pytest.mark.asyncio
+    async def test_handlers_get_a_plain_session(self, db):
+        seen = {}
+
+        async def handler(event, data):
+            session = data["session"]
+            seen["session"] = session
+            # No connection until the first statement
+            seen["in_transaction"] = session.in_transaction()
+            return (await session.execute(text("SELECT 1"))).scalar()
+
+        assert await DbSessionMiddleware()(handler, object(), {}) == 1
+        assert isinstance(seen["session"], AsyncSession)
+        assert not seen["in_transaction"]
+        await db.dispose()
+
+    @pytest.mark.asyncio
+    async def test_session_rolls_back_on_error(self, db):
+        async with db.session() as session:
+            await session.execute(text("CREATE TABLE t (id INTEGER)"))
+            await session.commit()
+
+        async def handler(event, data):
+            await data["session"].execute(text("INSERT INTO t VALUES (1)"))
+            raise RuntimeError("boom")
+
+        with pytest.raises(RuntimeError):
+            await DbSessionMiddleware()(handler, object(), {})
+
+        async with db.session() as session:
+            res = await session.execute(text("SELECT COUNT(*) FROM t"))
+            assert res.scalar() == 0
+        await db.dispose()
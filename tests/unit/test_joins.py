@@ -0,0 +1,86 @@
+from datetime import timedelta
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db import UserState
+from app.db.base import Base
+from app.monitoring import system_monitor
+from app.services.chat_registry import chat_registry
+from app.services.joins import JoinRecorder, MemberJoin
+from utils import ensure_utc_timezone, utc_now
+
+
+@pytest_asyncio.fixture
+async def session_maker():
+    """Create an in-memory SQLite database for testing."""
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:", echo=False)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    chat_registry.clear()
+    yield sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    chat_registry.clear()
+
+    await engine.dispose()
+
+
+async def user_states(session_maker) -> dict[int, UserState]:
+    async with session_maker() as session:
+        rows = (await session.execute(select(UserState))).scalars().all()
+    return {row.telegram_user_id: row for row in rows}
+
+
+class TestJoinRecorder:
+    @pytest.mark.asyncio
+    async def test_joins_are_written_in_one_batch(self, session_maker):
+        recorder = JoinRecorder(session_maker, max_size=100, max_wait_ms=1000)  # noqa: E501
+        joined_at = utc_now() - timedelta(days=30)
+        recorded = system_monitor.joins_recorded
+
+        for user_id in (1, 2, 3):
+            recorder.record(MemberJoin(-100, user_id, joined_at, "Chat"))
+        await recorder.close()
+
+        states = await user_states(session_maker)
+        assert sorted(states) == [1, 2, 3]
+        assert ensure_utc_timezone(states[1].joined_at) == joined_at
+        assert states[1].valid_messages == 0
+        assert system_monitor.joins_recorded == recorded + 3
+
+    @pytest.mark.asyncio
+    async def test_rejoin_moves_join_time_and_keeps_messages(self, session_maker):  # noqa: E501
+        recorder = JoinRecorder(session_maker, max_size=1, max_wait_ms=0)
+        first = utc_now() - timedelta(days=30)
+        recorder.record(MemberJoin(-100, 1, first))
+        await recorder.close()
+
+        async with session_maker() as session:
+            state = (await session.execute(select(UserState))).scalar_one()
+            state.valid_messages = 3
+            await session.commit()
+
+        second = utc_now()
+        recorder.record(MemberJoin(-100, 1, second))
+        await recorder.close()
+
+        state = (await user_states(session_maker))[1]
+        assert ensure_utc_timezone(state.joined_at) == second
+        assert state.valid_messages == 3
+
+    @pytest.mark.asyncio
+    async def test_latest_join_in_batch_wins(self, session_maker):
+        recorder = JoinRecorder(session_maker, max_size=100, max_wait_ms=1000)  # noqa: E501
+        earlier = utc_now() - timedelta(hours=2)
+        later = utc_now() - timedelta(hours=1)
+
+        recorder.record(MemberJoin(-100, 1, later))
+        recorder.record(MemberJoin(-100, 1, earlier))
+        await recorder.close()
+
+        state = (await user_states(session_maker))[1]
+        assert ensure_utc_timezone(state.joined_at) == later
@@ -1,16 +1,34 @@
+import asyncio
+
 import pytest
 from unittest.mock import AsyncMock, MagicMock
 from aiogram import Bot
 from aiogram.types import User
-from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+from aiogram.exceptions import (
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramNotFound,
+)
+from app.bot.handlers.my_chat_member import bot_membership_changed
+from app.bot.utils import BulkMessageDeleter, chat_permissions
 from app.bot.utils.message_actions import try_delete_message
 from app.antispam.dto import MessageTask
+from app.antispam.service import AntiSpamService
+from config import config
+
+
+@pytest.fixture(autouse=True)
+def clear_permissions_cache():
+    chat_permissions.clear()
+    yield
+    chat_permissions.clear()
 
 
 @pytest.fixture
 def bot():
     """Create a mock bot instance."""
     bot = AsyncMock(spec=Bot)
+    bot.id = 12345
     bot.get_me.return_value = User(id=12345, is_bot=True, first_name="TestBot")
     return bot
 
@@ -50,7 +68,7 @@ class TestTryDeleteMessage:
         """Test message is deleted when bot has appropriate permissions."""
         bot.get_chat_member.return_value = create_chat_member(status, can_delete)
 
-        await try_delete_message(bot, spam_task)
+        assert await try_delete_message(bot, spam_task) is True
 
         bot.delete_message.assert_called_once_with(11111, 22222)
 
@@ -104,3 +122,156 @@ class TestTryDeleteMessage:
 
         # Should not attempt to delete if permission check fails
         bot.delete_message.assert_not_called()
+
+
+class TestChatPermissionsCache:
+    @pytest.mark.asyncio
+    async def test_permissions_are_cached_per_chat(self, bot, spam_task):
+        """Test that repeated deletions cost one API call each."""
+        bot.get_chat_member.return_value = create_chat_member("administrator", True)
+
+        for _ in range(3):
+            await try_delete_message(bot, spam_task)
+
+        bot.get_me.assert_not_called()
+        bot.get_chat_member.assert_called_once_with(11111, 12345)
+        assert bot.delete_message.call_count == 3
+
+    @pytest.mark.asyncio
+    async def test_ttl_zero_disables_cache(self, bot, spam_task, monkeypatch):
+        monkeypatch.setattr(config.bot, "permissions_cache_ttl_s", 0)
+        bot.get_chat_member.return_value = create_chat_member("creator")
+
+        await try_delete_message(bot, spam_task)
+        await try_delete_message(bot, spam_task)
+
+        assert bot.get_chat_member.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_rejected_delete_invalidates_cache(self, bot, spam_task):
+        """Test that lost admin rights are picked up on the next message."""
+        bot.get_chat_member.side_effect = [
+            create_chat_member("administrator", True),
+            create_chat_member("member"),
+        ]
+        bot.delete_message.side_effect = TelegramForbiddenError(
+            message="Forbidden", method="deleteMessage"
+        )
+
+        await try_delete_message(bot, spam_task)
+        await try_delete_message(bot, spam_task)
+
+        assert bot.get_chat_member.call_count == 2
+        bot.delete_message.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_my_chat_member_update_invalidates_cache(self, bot, spam_task):
+        bot.get_chat_member.return_value = create_chat_member("creator")
+        await try_delete_message(bot, spam_task)
+        assert len(chat_permissions) == 1
+
+        event = MagicMock()
+        event.chat.id = 11111
+        event.new_chat_member.user.id = 12345
+        await bot_membership_changed(event)
+
+        assert len(chat_permissions) == 0
+
+
+def task_for(message_id: int, chat_id: int = 11111) -> MessageTask:
+    return MessageTask(
+        telegram_chat_id=chat_id,
+        telegram_message_id=message_id,
+        telegram_user_id=33333,
+        text="spam",
+    )
+
+
+class TestBulkMessageDeleter:
+    @pytest.mark.asyncio
+    async def test_coalesces_deletions_per_chat(self, bot):
+        bot.get_chat_member.return_value = create_chat_member("creator")
+        deleter = BulkMessageDeleter(bot, max_wait_ms=10)
+
+        results = await asyncio.gather(
+            try_delete_message(bot, task_for(1), deleter),
+            try_delete_message(bot, task_for(2), deleter),
+            try_delete_message(bot, task_for(3, chat_id=22222), deleter),
+        )
+
+        assert results == [True, True, True]
+        bot.delete_messages.assert_called_once_with(11111, [1, 2])
+        bot.delete_message.assert_called_once_with(22222, 3)
+
+    @pytest.mark.asyncio
+    async def test_batch_is_capped_at_bot_api_limit(self, bot):
+        deleter = BulkMessageDeleter(bot, max_size=500, max_wait_ms=10_000)
+
+        await asyncio.wait_for(
+            asyncio.gather(*(deleter.delete(11111, i) for i in range(100))),
+            timeout=1.0,
+        )
+
+        bot.delete_messages.assert_called_once_with(11111, list(range(100)))
+
+    @pytest.mark.asyncio
+    async def test_rejected_bulk_falls_back_to_single_deletes(self, bot):
+        bot.delete_messages.side_effect = TelegramBadRequest(
+            message="Bad Request", method="deleteMessages"
+        )
+        bot.delete_message.side_effect = [
+            True,
+            TelegramBadRequest(message="Message not found", method="deleteMessage"),
+        ]
+        deleter = BulkMessageDeleter(bot, max_wait_ms=10)
+
+        results = await asyncio.gather(
+            deleter.delete(11111, 1), deleter.delete(11111, 2)
+        )
+
+        assert results == [True, False]
+        assert bot.delete_message.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_missing_method_disables_bulk(self, bot):
+        bot.delete_messages.side_effect = TelegramNotFound(
+            message="Not Found", method="deleteMessages"
+        )
+        deleter = BulkMessageDeleter(bot, max_wait_ms=10)
+
+        await asyncio.gather(deleter.delete(11111, 1), deleter.delete(11111, 2))
+        await asyncio.gather(deleter.delete(11111, 3), deleter.delete(11111, 4))
+
+        bot.delete_messages.assert_called_once()
+        assert bot.delete_message.call_count == 4
+
+    @pytest.mark.asyncio
+    async def test_forbidden_reaches_every_caller(self, bot):
+        bot.get_chat_member.return_value = create_chat_member("creator")
+        bot.delete_messages.side_effect = TelegramForbiddenError(
+            message="Forbidden", method="deleteMessages"
+        )
+        deleter = BulkMessageDeleter(bot, max_wait_ms=10)
+
+        results = await asyncio.gather(
+            try_delete_message(bot, task_for(1), deleter),
+            try_delete_message(bot, task_for(2), deleter),
+        )
+
+        assert results == [False, False]
+        assert len(chat_permissions) == 0
+
+    @pytest.mark.asyncio
+    async def test_service_stop_flushes_pending_deletions(self, bot, monkeypatch):  # noqa: E501
+        monkeypatch.setattr(config.bot, "bulk_delete_enabled", True)
+        monkeypatch.setattr(config.bot, "bulk_delete_max_wait_ms", 60_000)
+        service = AntiSpamService(bot, ai_service=None, workers=1)
+        await service.start(MagicMock())
+        deleter = service._message_processor._deleter
+
+        pending = asyncio.create_task(deleter.delete(11111, 1))
+        await asyncio.sleep(0)
+        await asyncio.wait_for(service.stop(), timeout=1.0)
+
+        assert await asyncio.wait_for(pending, timeout=1.0) is True
+        bot.delete_message.assert_called_once_with(11111, 1)
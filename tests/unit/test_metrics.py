@@ -0,0 +1,137 @@
+import asyncio
+
+import pytest
+from sqlalchemy import text
+
+from app.db.helper import DataBaseHelper
+from app.metrics import (
+    DB_COMMIT_SECONDS,
+    MetricsRegistry,
+    render_metrics,
+    start_configured_metrics_server,
+    start_metrics_server,
+)
+from app.monitoring import system_monitor
+from config import config
+
+
+class TestMetricsRegistry:
+    def test_counter_and_gauge(self):
+        registry = MetricsRegistry()
+        deletions = registry.counter("deletions", "Deleted", ["result"])
+        depth = registry.gauge("queue_depth", "Depth")
+
+        deletions.inc(result="deleted")
+        deletions.inc(2, result="deleted")
+        depth.set(7)
+
+        output = registry.render()
+        assert "# TYPE deletions counter" in output
+        assert 'deletions_total{result="deleted"} 3' in output
+        assert "queue_depth 7" in output
+
+    def test_histogram_buckets_are_cumulative(self):
+        registry = MetricsRegistry()
+        latency = registry.histogram(
+            "latency_seconds", "Latency", ["stage"], buckets=(0.1, 1.0)
+        )
+
+        for value in (0.05, 0.5, 5.0):
+            latency.observe(value, stage="ai")
+
+        lines = registry.render().splitlines()
+        assert 'latency_seconds_bucket{stage="ai",le="0.1"} 1' in lines
+        assert 'latency_seconds_bucket{stage="ai",le="1"} 2' in lines
+        assert 'latency_seconds_bucket{stage="ai",le="+Inf"} 3' in lines
+        assert 'latency_seconds_sum{stage="ai"} 5.55' in lines
+        assert 'latency_seconds_count{stage="ai"} 3' in lines
+
+    def test_labels_must_match(self):
+        registry = MetricsRegistry()
+        latency = registry.histogram("latency_seconds", "Latency", ["stage"])
+
+        with pytest.raises(ValueError):
+            latency.observe(1.0)
+        with pytest.raises(ValueError):
+            registry.counter("latency_seconds", "Duplicate")
+
+    @pytest.mark.asyncio
+    async def test_cancelled_blocks_are_not_observed(self):
+        registry = MetricsRegistry()
+        latency = registry.histogram("latency_seconds", "Latency", ["prompt"])
+
+        async def score(i: int, delay: float) -> None:
+            with latency.time(prompt=i):
+                await asyncio.sleep(delay)
+
+        await score(0, 0)
+        slow = asyncio.create_task(score(1, 10))
+        await asyncio.sleep(0)
+        slow.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await slow
+
+        assert latency.count(prompt=0) == 1
+        assert latency.count(prompt=1) == 0
+
+    def test_system_monitor_counters_are_exported(self):
+        system_monitor.increment_webhook_dropped("duplicate")
+
+        output = render_metrics()
+
+        assert "tgantispam_monitor_spam_blocked_count " in output
+        assert 'tgantispam_monitor_webhook_dropped{key="duplicate"}' in output
+        assert 'tgantispam_monitor_ai_circuit_state{value="closed"} 1' in output  # noqa: E501
+
+
+class TestInstrumentation:
+    @pytest.mark.asyncio
+    async def test_db_commits_are_timed(self):
+        db = DataBaseHelper("sqlite+aiosqlite:///:memory:")
+        commits = DB_COMMIT_SECONDS.count()
+
+        async with db.session_factory() as session:
+            await session.execute(text("SELECT 1"))
+            await session.commit()
+
+        assert DB_COMMIT_SECONDS.count() == commits + 1
+        await db.dispose()
+
+    @pytest.mark.asyncio
+    async def test_side_port_serves_metrics(self):
+        server = await start_metrics_server(0, host="127.0.0.1")
+        port = server.sockets[0].getsockname()[1]
+
+        async def get(path: str) -> bytes:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: x\r\n\r\n".encode())
+            await writer.drain()
+            response = await reader.read()
+            writer.close()
+            return response
+
+        try:
+            metrics = await get("/metrics")
+            missing = await get("/")
+        finally:
+            server.close()
+            await server.wait_closed()
+
+        assert metrics.startswith(b"HTTP/1.1 200 OK")
+        assert b"# TYPE tgantispam_stage_seconds histogram" in metrics
+        assert missing.startswith(b"HTTP/1.1 404")
+
+    @pytest.mark.asyncio
+    async def test_configured_server_is_opt_in(self, monkeypatch):
+        assert await start_configured_metrics_server() is None
+
+        monkeypatch.setattr(config.bot, "metrics_enabled", True)
+        monkeypatch.setattr(config.bot, "metrics_port", 0)
+        server = await start_configured_metrics_server()
+        try:
+            host = server.sockets[0].getsockname()[0]
+        finally:
+            server.close()
+            await server.wait_closed()
+
+        assert host == "127.0.0.1"
@@ -0,0 +1,128 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import DeleteMessage, GetChat, GetUpdates, SendMessage
+
+from app.bot.middleware.outbound import OutboundScheduler, Priority, TokenBucket
+from app.monitoring import system_monitor
+
+
+def scheduler(**kwargs) -> OutboundScheduler:
+    params = dict(
+        global_rate=1000.0, global_burst=1000, chat_rate=1000.0, chat_burst=1000
+    )
+    params.update(kwargs)
+    return OutboundScheduler(**params)
+
+
+class TestTokenBucket:
+    def test_refills_up_to_burst(self):
+        bucket = TokenBucket(rate=2.0, burst=2)
+        now = bucket._updated
+        bucket.take()
+        bucket.take()
+
+        assert not bucket.ready(now)
+        assert bucket.wait_s(now) == pytest.approx(0.5)
+        assert bucket.ready(now + 0.5)
+        assert bucket.idle(now + 10)
+
+    def test_block_delays_readiness(self):
+        bucket = TokenBucket(rate=10.0, burst=5)
+        now = bucket._updated
+        bucket.block(now + 3)
+
+        assert not bucket.ready(now + 1)
+        assert bucket.wait_s(now + 1) == pytest.approx(2)
+        assert bucket.ready(now + 3)
+
+
+class TestOutboundScheduler:
+    @pytest.mark.asyncio
+    async def test_moderation_goes_before_cosmetic_calls(self):
+        outbound = scheduler(global_rate=100.0, global_burst=1)
+        order = []
+
+        async def call(priority, name):
+            await outbound.acquire(priority, chat_id=None)
+            order.append(name)
+
+        # Drain the single token so the next calls have to queue
+        await outbound.acquire(Priority.NORMAL)
+        await asyncio.gather(
+            call(Priority.COSMETIC, "title"),
+            call(Priority.NORMAL, "notify"),
+            call(Priority.MODERATION, "delete"),
+        )
+
+        assert order == ["delete", "notify", "title"]
+        assert outbound.queue_depth == 0
+
+    @pytest.mark.asyncio
+    async def test_busy_chat_does_not_block_other_chats(self):
+        outbound = scheduler(chat_rate=0.001, chat_burst=1)
+        await outbound.acquire(Priority.NORMAL, chat_id=1)
+
+        blocked = asyncio.create_task(outbound.acquire(Priority.NORMAL, chat_id=1))  # noqa: E501
+        await asyncio.wait_for(
+            outbound.acquire(Priority.NORMAL, chat_id=2), timeout=1.0
+        )
+
+        assert not blocked.done()
+        blocked.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await blocked
+
+    @pytest.mark.asyncio
+    async def test_retry_after_blocks_chat_and_retries(self):
+        outbound = scheduler()
+        method = DeleteMessage(chat_id=5, message_id=1)
+        make_request = AsyncMock(
+            side_effect=[TelegramRetryAfter(method, "Too Many Requests", 0), True]  # noqa: E501
+        )
+        retry_after = system_monitor.telegram_retry_after
+
+        result = await outbound(make_request, AsyncMock(), method)
+
+        assert result is True
+        assert make_request.call_count == 2
+        assert system_monitor.telegram_retry_after == retry_after + 1
+        assert outbound._chats[5].blocked_until > 0
+
+    @pytest.mark.asyncio
+    async def test_gives_up_after_max_retries(self):
+        outbound = scheduler(max_retries=1)
+        method = SendMessage(chat_id=5, text="hi")
+        make_request = AsyncMock(
+            side_effect=TelegramRetryAfter(method, "Too Many Requests", 0)
+        )
+
+        with pytest.raises(TelegramRetryAfter):
+            await outbound(make_request, AsyncMock(), method)
+
+        assert make_request.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_get_updates_bypasses_queue(self):
+        outbound = scheduler(global_rate=0.001, global_burst=1)
+        await outbound.acquire(Priority.NORMAL)
+        make_request = AsyncMock(return_value=[])
+
+        await asyncio.wait_for(
+            outbound(make_request, AsyncMock(), GetUpdates()), timeout=1.0
+        )
+
+        make_request.assert_called_once()
+
+    def test_priorities(self):
+        assert (
+            OutboundScheduler.priority_of(DeleteMessage(chat_id=1, message_id=1))  # noqa: E501
+            is Priority.MODERATION
+        )
+        assert (
+            OutboundScheduler.priority_of(SendMessage(chat_id=1, text="x"))
+            is Priority.NORMAL
+        )
+        assert OutboundScheduler.priority_of(GetChat(chat_id=1)) is Priority.COSMETIC  # noqa: E501
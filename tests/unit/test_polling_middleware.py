@@ -0,0 +1,57 @@
+from unittest.mock import AsyncMock
+
+import pytest
+from aiogram.methods import GetUpdates, SendMessage
+from aiogram.types import Update
+
+from app.bot.middleware.polling import UpdateFetchClock, UpdateFetchedAtMiddleware  # noqa: E501
+
+
+class TestUpdateFetchClock:
+    @pytest.mark.asyncio
+    async def test_applies_limit_and_records_fetch_time(self):
+        clock = UpdateFetchClock(limit=50)
+        method = GetUpdates(timeout=10)
+        make_request = AsyncMock(
+            return_value=[Update(update_id=1), Update(update_id=2)]
+        )
+
+        updates = await clock(make_request, AsyncMock(), method)
+
+        assert [u.update_id for u in updates] == [1, 2]
+        assert method.limit == 50
+        assert clock.pop(1) is not None
+        assert clock.pop(1) is None
+
+    @pytest.mark.asyncio
+    async def test_other_methods_pass_through(self):
+        clock = UpdateFetchClock(limit=50)
+        make_request = AsyncMock(return_value=True)
+
+        assert await clock(make_request, AsyncMock(), SendMessage(chat_id=1, text="x"))  # noqa: E501
+        assert not clock._fetched_at
+
+    @pytest.mark.asyncio
+    async def test_pending_entries_are_bounded(self):
+        clock = UpdateFetchClock(max_pending=2)
+        make_request = AsyncMock(
+            return_value=[Update(update_id=i) for i in range(5)]
+        )
+
+        await clock(make_request, AsyncMock(), GetUpdates())
+
+        assert list(clock._fetched_at) == [3, 4]
+
+    @pytest.mark.asyncio
+    async def test_middleware_exposes_fetch_time(self):
+        clock = UpdateFetchClock()
+        await clock(
+            AsyncMock(return_value=[Update(update_id=7)]), AsyncMock(), GetUpdates()  # noqa: E501
+        )
+        handler = AsyncMock()
+        data = {}
+
+        await UpdateFetchedAtMiddleware(clock)(handler, Update(update_id=7), data)  # noqa: E501
+
+        assert data["fetched_at"] is not None
+        handler.assert_awaited_once()
@@ -0,0 +1,112 @@
+from datetime import timedelta
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db import SpammerReputation
+from app.db.base import Base
+from app.services.reputation import SpammerReputationService
+from config import config
+from utils import utc_now
+
+
+@pytest_asyncio.fixture
+async def session_maker():
+    """Create an in-memory SQLite database for testing."""
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:", echo=False)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    yield sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    await engine.dispose()
+
+
+@pytest.fixture(autouse=True)
+def reputation_config(monkeypatch):
+    monkeypatch.setattr(config.bot, "reputation_threshold", 1.5)
+    monkeypatch.setattr(config.bot, "reputation_half_life_h", 24.0)
+
+
+class TestSpammerReputationService:
+    @pytest.mark.asyncio
+    async def test_unknown_user_is_not_a_spammer(self, session_maker):
+        service = SpammerReputationService()
+
+        async with session_maker() as session:
+            assert not await service.is_known_spammer(session, 1)
+            assert await service.get_score(session, 1) == 0.0
+
+    @pytest.mark.asyncio
+    async def test_hits_accumulate_and_are_persisted(self, session_maker):
+        service = SpammerReputationService()
+
+        async with session_maker() as session:
+            await service.record_spam_hit(session, 1)
+            assert not await service.is_known_spammer(session, 1)
+            await service.record_spam_hit(session, 1)
+            await session.commit()
+            assert await service.is_known_spammer(session, 1)
+
+        # A fresh process reads the score back from the table
+        async with session_maker() as session:
+            row = (
+                await session.execute(
+                    select(SpammerReputation).where(
+                        SpammerReputation.telegram_user_id == 1
+                    )
+                )
+            ).scalar_one()
+            assert row.hits == 2
+            assert await SpammerReputationService().is_known_spammer(session, 1)  # noqa: E501
+
+    @pytest.mark.asyncio
+    async def test_score_decays_with_half_life(self, session_maker):
+        service = SpammerReputationService()
+        then = utc_now() - timedelta(hours=48)
+
+        async with session_maker() as session:
+            await service.record_spam_hit(session, 1, now=then)
+            await service.record_spam_hit(session, 1, now=then)
+
+            assert await service.get_score(session, 1) == pytest.approx(0.5, rel=1e-3)  # noqa: E501
+            assert not await service.is_known_spammer(session, 1)
+
+            # The next hit builds on the decayed score
+            assert await service.record_spam_hit(session, 1) == pytest.approx(1.5, rel=1e-3)  # noqa: E501
+
+    @pytest.mark.asyncio
+    async def test_uncommitted_hits_are_not_cached(self, session_maker):
+        service = SpammerReputationService()
+
+        async with session_maker() as session:
+            await service.record_spam_hit(session, 1)
+            await service.record_spam_hit(session, 1)
+            assert await service.get_score(session, 1) == pytest.approx(2.0, rel=1e-3)  # noqa: E501
+            await session.rollback()
+
+        async with session_maker() as session:
+            assert await service.get_score(session, 1) == 0.0
+
+            await service.record_spam_hit(session, 1)
+            # Other sessions see the hit only once it's committed
+            async with session_maker() as other:
+                assert await service.get_score(other, 1) == 0.0
+            await session.commit()
+
+        async with session_maker() as session:
+            assert await service.get_score(session, 1) == pytest.approx(1.0, rel=1e-3)  # noqa: E501
+
+    @pytest.mark.asyncio
+    async def test_memory_is_bounded(self, session_maker):
+        service = SpammerReputationService(max_users=2)
+
+        async with session_maker() as session:
+            for user_id in (1, 2, 3):
+                await service.get_score(session, user_id)
+
+        assert list(service._cache) == [2, 3]
@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+
+from utils import SingleFlight
+
+
+class TestSingleFlight:
+    @pytest.mark.asyncio
+    async def test_concurrent_calls_share_one_execution(self):
+        """Test that callers with the same key await one shared call."""
+        calls = 0
+        shared = []
+
+        async def fn():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "result"
+
+        flight = SingleFlight(on_shared=lambda: shared.append(1))
+
+        results = await asyncio.gather(*(flight.do("k", fn) for _ in range(5)))
+
+        assert results == ["result"] * 5
+        assert calls == 1
+        assert len(shared) == 4
+        assert len(flight) == 0
+
+    @pytest.mark.asyncio
+    async def test_key_is_forgotten_after_completion(self):
+        """Test that sequential calls are not cached."""
+        calls = 0
+
+        async def fn():
+            nonlocal calls
+            calls += 1
+            return calls
+
+        flight = SingleFlight()
+
+        assert await flight.do("k", fn) == 1
+        assert await flight.do("k", fn) == 2
+
+    @pytest.mark.asyncio
+    async def test_error_is_shared(self):
+        """Test that every waiting caller gets the exception."""
+
+        async def fn():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("backend down")
+
+        flight = SingleFlight()
+
+        results = await asyncio.gather(
+            flight.do("k", fn), flight.do("k", fn), return_exceptions=True
+        )
+
+        assert all(isinstance(r, RuntimeError) for r in results)
+
+    @pytest.mark.asyncio
+    async def test_cancelled_caller_does_not_cancel_others(self):
+        """Test that the shared call survives until its last waiter leaves."""
+        started = asyncio.Event()
+        cancelled = False
+
+        async def fn():
+            nonlocal cancelled
+            started.set()
+            try:
+                await asyncio.sleep(0.05)
+            except asyncio.CancelledError:
+                cancelled = True
+                raise
+            return "ok"
+
+        flight = SingleFlight()
+        first = asyncio.create_task(flight.do("k", fn))
+        second = asyncio.create_task(flight.do("k", fn))
+        await started.wait()
+
+        first.cancel()
+        assert await second == "ok"
+        assert first.cancelled()
+        assert not cancelled
+
+    @pytest.mark.asyncio
+    async def test_last_waiter_cancels_shared_call(self):
+        """Test that nobody waiting means the call is cancelled."""
+        started = asyncio.Event()
+        cancelled = asyncio.Event()
+
+        async def fn():
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        flight = SingleFlight()
+        task = asyncio.create_task(flight.do("k", fn))
+        await started.wait()
+
+        task.cancel()
+        await asyncio.wait_for(cancelled.wait(), timeout=1.0)
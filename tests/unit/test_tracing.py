@@ -0,0 +1,158 @@
+import asyncio
+
+import pytest
+
+from app.antispam.processors.message_processor import MessageProcessor
+from app.tracing import (
+    NOOP_SPAN,
+    SpanExporter,
+    Tracer,
+    trace_id_for,
+    tracer as global_tracer,
+)
+
+
+class RecordingExporter(SpanExporter):
+    def __init__(self):
+        self.started = []
+        self.ended = []
+
+    def on_start(self, span):
+        self.started.append(span.name)
+
+    def on_end(self, span):
+        self.ended.append(span)
+
+    def by_name(self, name):
+        return next(s for s in self.ended if s.name == name)
+
+
+def make_tracer(sample_rate: float = 1.0):
+    exporter = RecordingExporter()
+    return Tracer(sample_rate=sample_rate, exporters=[exporter]), exporter
+
+
+class TestTracer:
+    def test_unsampled_spans_are_noops(self):
+        tracer, exporter = make_tracer(sample_rate=0)
+
+        with tracer.start_trace("handler", -100, 1) as root:
+            with tracer.span("chat_lookup") as child:
+                child.set_attribute("ignored", True)
+
+        assert root is NOOP_SPAN
+        assert child is NOOP_SPAN
+        assert tracer.current() is None
+        assert exporter.started == []
+
+    def test_spans_of_one_message_form_a_tree(self):
+        tracer, exporter = make_tracer()
+
+        with tracer.start_trace("handler", -100, 1, user_id=42) as root:
+            with tracer.span("chat_lookup"):
+                pass
+            with tracer.span("enqueue") as enqueue:
+                assert tracer.current() is enqueue
+
+        assert [s.name for s in exporter.ended] == ["chat_lookup", "enqueue", "handler"]  # noqa: E501
+        assert root.trace_id == trace_id_for(-100, 1)
+        assert root.attributes == {"user_id": 42, "chat_id": -100, "msg_id": 1}  # noqa: E501
+        assert exporter.by_name("chat_lookup").parent_id == root.span_id
+        assert {s.trace_id for s in exporter.ended} == {root.trace_id}
+        assert tracer.current() is None
+
+    @pytest.mark.asyncio
+    async def test_work_from_the_queue_links_to_the_handler(self):
+        tracer, exporter = make_tracer()
+        queue: asyncio.Queue = asyncio.Queue()
+
+        with tracer.start_trace("handler", -100, 1) as root:
+            await queue.put(root)
+
+        async def worker():
+            parent = await queue.get()
+            tracer.record("queue_wait", 0.5, parent=parent)
+            with tracer.span("process", parent=parent):
+                # Parallel AI prompts run in their own tasks
+                await asyncio.gather(
+                    *(self._prompt(tracer, i) for i in range(2))
+                )
+
+        await worker()
+
+        process = exporter.by_name("process")
+        queue_wait = exporter.by_name("queue_wait")
+        assert process.parent_id == root.span_id
+        assert queue_wait.parent_id == root.span_id
+        assert 499 <= queue_wait.duration_ms <= 501
+        prompts = [s for s in exporter.ended if s.name == "ai.prompt"]
+        assert {s.attributes["prompt"] for s in prompts} == {0, 1}
+        assert {s.parent_id for s in prompts} == {process.span_id}
+
+    @staticmethod
+    async def _prompt(tracer: Tracer, i: int) -> None:
+        with tracer.span("ai.prompt", prompt=i):
+            await asyncio.sleep(0)
+
+    def test_errors_are_recorded(self):
+        tracer, exporter = make_tracer()
+
+        with pytest.raises(RuntimeError):
+            with tracer.start_trace("handler", -100, 1):
+                with tracer.span("commit"):
+                    raise RuntimeError("database is locked")
+
+        assert exporter.by_name("commit").error == "RuntimeError"
+        assert exporter.by_name("handler").error == "RuntimeError"
+
+    def test_sampling_is_decided_per_message(self):
+        tracer, _ = make_tracer(sample_rate=0.5)
+
+        def sampled(msg_id: int) -> bool:
+            with tracer.start_trace("handler", -100, msg_id) as span:
+                return span.sampled
+
+        decisions = [sampled(msg_id) for msg_id in range(200)]
+
+        assert decisions == [sampled(msg_id) for msg_id in range(200)]
+        assert 50 < sum(decisions) < 150
+
+    def test_failing_exporter_does_not_break_the_pipeline(self):
+        class Broken(SpanExporter):
+            def on_end(self, span):
+                raise ValueError("boom")
+
+        tracer = Tracer(sample_rate=1, exporters=[Broken()])
+
+        with tracer.start_trace("handler", -100, 1) as span:
+            pass
+
+        assert span.end_ns is not None
+
+    def test_opentelemetry_exporter(self):
+        pytest.importorskip("opentelemetry.trace")
+        from app.tracing import OpenTelemetrySpanExporter
+
+        tracer = Tracer(sample_rate=1, exporters=[OpenTelemetrySpanExporter()])  # noqa: E501
+
+        with tracer.start_trace("handler", -100, 1) as root:
+            with tracer.span("commit") as child:
+                pass
+
+        assert root.handle is not None
+        assert child.handle is not None
+
+
+class TestProcessorSpans:
+    def test_each_detector_gets_a_span(self, monkeypatch):
+        tracer, exporter = make_tracer()
+        monkeypatch.setattr(global_tracer, "_exporters", [exporter])
+
+        with tracer.start_trace("process", -100, 1):
+            assert MessageProcessor._detect("links", lambda text: "http" in text, "http://x")  # noqa: E501
+            assert not MessageProcessor._detect("mentions", lambda text: "@" in text, "hi")  # noqa: E501
+
+        links = exporter.by_name("detector.links")
+        assert links.attributes == {"hit": True}
+        assert exporter.by_name("detector.mentions").attributes == {"hit": False}  # noqa: E501
+        assert links.parent_id == exporter.by_name("process").span_id
@@ -0,0 +1,103 @@
+from unittest.mock import AsyncMock
+
+import pytest
+from aiogram.types import Update
+
+from app.bot.middleware.trusted_senders import TrustedSenderMiddleware
+from app.monitoring import system_monitor
+from app.services.trusted_index import (
+    SKIP_INACTIVE_CHAT,
+    SKIP_TRUSTED,
+    TrustedSenderIndex,
+)
+
+
+def group_update(chat_id: int = -100, user_id: int = 42, chat_type: str = "supergroup") -> Update:  # noqa: E501
+    return Update.model_validate(
+        {
+            "update_id": 1,
+            "message": {
+                "message_id": 1,
+                "date": 0,
+                "chat": {"id": chat_id, "type": chat_type},
+                "from": {"id": user_id, "is_bot": False, "first_name": "x"},
+                "text": "hi",
+            },
+        }
+    )
+
+
+class TestTrustedSenderIndex:
+    def test_trusted_pair_and_inactive_chat(self):
+        index = TrustedSenderIndex(ttl_s=60)
+        index.mark_trusted(-100, 42)
+        index.mark_inactive_chat(-200)
+
+        assert index.skip_reason(-100, 42) == SKIP_TRUSTED
+        assert index.skip_reason(-100, 43) is None
+        assert index.skip_reason(-200, 43) == SKIP_INACTIVE_CHAT
+
+    def test_entries_expire(self, monkeypatch):
+        index = TrustedSenderIndex(ttl_s=60)
+        index.mark_trusted(-100, 42)
+
+        now = index._trusted[(-100, 42)]
+        monkeypatch.setattr("app.services.trusted_index.time.monotonic", lambda: now)  # noqa: E501
+
+        assert index.skip_reason(-100, 42) is None
+        assert len(index) == 0
+
+    def test_forget_chat(self):
+        index = TrustedSenderIndex(ttl_s=60)
+        index.mark_trusted(-100, 1)
+        index.mark_trusted(-100, 2)
+        index.mark_trusted(-200, 1)
+        index.mark_inactive_chat(-100)
+
+        index.forget_chat(-100)
+
+        assert index.skip_reason(-100, 1) is None
+        assert index.skip_reason(-200, 1) == SKIP_TRUSTED
+
+    def test_zero_ttl_disables_and_size_is_bounded(self):
+        index = TrustedSenderIndex(ttl_s=0)
+        index.mark_trusted(-100, 1)
+        assert len(index) == 0
+
+        index = TrustedSenderIndex(ttl_s=60, max_size=2)
+        for user_id in (1, 2, 3):
+            index.mark_trusted(-100, user_id)
+        assert list(index._trusted) == [(-100, 2), (-100, 3)]
+
+
+class TestTrustedSenderMiddleware:
+    @pytest.mark.asyncio
+    async def test_trusted_sender_short_circuits(self):
+        index = TrustedSenderIndex(ttl_s=60)
+        index.mark_trusted(-100, 42)
+        handler = AsyncMock()
+        skipped = system_monitor.trusted_shortcuts
+
+        result = await TrustedSenderMiddleware(index)(handler, group_update(), {})  # noqa: E501
+
+        assert result is None
+        handler.assert_not_called()
+        assert system_monitor.trusted_shortcuts == skipped + 1
+
+    @pytest.mark.asyncio
+    async def test_other_updates_pass(self):
+        index = TrustedSenderIndex(ttl_s=60)
+        index.mark_trusted(-100, 42)
+        index.mark_trusted(42, 42)
+        middleware = TrustedSenderMiddleware(index)
+        handler = AsyncMock(return_value="handled")
+
+        assert await middleware(handler, group_update(user_id=7), {}) == "handled"  # noqa: E501
+        # Private chats (commands, admin panel) are never skipped
+        assert (
+            await middleware(
+                handler, group_update(chat_id=42, chat_type="private"), {}
+            )
+            == "handled"
+        )
+        assert handler.call_count == 2
@@ -0,0 +1,84 @@
+import asyncio
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+from aiogram import Bot
+
+from app.bot.webhook_ingest import WebhookIngestor
+from app.monitoring import system_monitor
+
+
+def raw_update(update_id: int) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": -100, "type": "supergroup"},
+            "from": {"id": 42, "is_bot": False, "first_name": "x"},
+            "text": "hi",
+        },
+    }
+
+
+@pytest.fixture
+def bot():
+    return Bot(token="123:abc")
+
+
+class TestWebhookIngestor:
+    @pytest.mark.asyncio
+    async def test_buffered_updates_are_dispatched(self, bot):
+        dp = Mock(feed_update=AsyncMock())
+        ingestor = WebhookIngestor(bot, dp, buffer_size=10, workers=2)
+        ingestor.start()
+
+        assert ingestor.submit(raw_update(1))
+        assert ingestor.submit(raw_update(2))
+        await ingestor.buffer.join()
+        await ingestor.stop()
+
+        ids = sorted(call.args[1].update_id for call in dp.feed_update.call_args_list)  # noqa: E501
+        assert ids == [1, 2]
+        assert not ingestor.accepting
+
+    @pytest.mark.asyncio
+    async def test_full_buffer_rejects_without_waiting(self, bot):
+        release = asyncio.Event()
+
+        async def slow_feed(bot, update):
+            await release.wait()
+
+        dp = Mock(feed_update=slow_feed)
+        ingestor = WebhookIngestor(bot, dp, buffer_size=1, workers=1)
+        ingestor.start()
+        rejected = system_monitor.webhook_rejected
+
+        assert ingestor.submit(raw_update(1))
+        await asyncio.sleep(0)  # worker takes update 1 and blocks
+        assert ingestor.submit(raw_update(2))
+        assert not ingestor.submit(raw_update(3))
+        assert system_monitor.webhook_rejected == rejected + 1
+
+        release.set()
+        await ingestor.stop()
+
+    @pytest.mark.asyncio
+    async def test_not_accepting_before_start(self, bot):
+        ingestor = WebhookIngestor(bot, Mock(), buffer_size=1, workers=1)
+
+        assert not ingestor.submit(raw_update(1))
+
+    @pytest.mark.asyncio
+    async def test_handler_error_keeps_worker_alive(self, bot):
+        dp = Mock(feed_update=AsyncMock(side_effect=[RuntimeError("boom"), None]))  # noqa: E501
+        ingestor = WebhookIngestor(bot, dp, buffer_size=10, workers=1)
+        ingestor.start()
+
+        ingestor.submit(raw_update(1))
+        ingestor.submit({"update_id": 2, "message": "not a message"})
+        ingestor.submit(raw_update(3))
+        await ingestor.buffer.join()
+        await ingestor.stop()
+
+        assert dp.feed_update.call_count == 2
@@ -0,0 +1,89 @@
+import orjson
+import pytest
+
+from app.bot.webhook_prefilter import (
+    DROP_ADMIN_MESSAGE,
+    DROP_DUPLICATE,
+    DROP_MALFORMED,
+    DROP_UPDATE_TYPE,
+    UpdatePreFilter,
+)
+from app.monitoring import system_monitor
+
+ADMIN_ID = 1
+
+
+def message_body(
+    update_id: int,
+    user_id: int = 42,
+    chat_id: int = -100,
+    chat_type: str = "supergroup",
+) -> bytes:
+    return orjson.dumps(
+        {
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id,
+                "date": 0,
+                "chat": {"id": chat_id, "type": chat_type},
+                "from": {"id": user_id, "is_bot": False, "first_name": "x"},
+                "text": "hi",
+            },
+        }
+    )
+
+
+@pytest.fixture
+def prefilter():
+    return UpdatePreFilter(
+        allowed_updates=["message", "callback_query"], admin_id=ADMIN_ID
+    )
+
+
+class TestUpdatePreFilter:
+    @pytest.mark.asyncio
+    async def test_regular_message_passes(self, prefilter):
+        data, reason = prefilter.check(message_body(1))
+
+        assert reason is None
+        assert data["message"]["text"] == "hi"
+
+    @pytest.mark.asyncio
+    async def test_malformed_bodies(self, prefilter):
+        for body in (b"not json", b"[]", b'{"update_id": "1"}'):
+            assert prefilter.check(body) == (None, DROP_MALFORMED)
+
+    @pytest.mark.asyncio
+    async def test_unhandled_update_type(self, prefilter):
+        body = orjson.dumps({"update_id": 1, "channel_post": {}})
+        dropped = system_monitor.webhook_dropped.get(DROP_UPDATE_TYPE, 0)
+
+        _, reason = prefilter.check(body)
+
+        assert reason == DROP_UPDATE_TYPE
+        assert system_monitor.webhook_dropped[DROP_UPDATE_TYPE] == dropped + 1  # noqa: E501
+
+    @pytest.mark.asyncio
+    async def test_redelivery_is_dropped_unless_forgotten(self, prefilter):
+        assert prefilter.check(message_body(7))[1] is None
+        assert prefilter.check(message_body(7))[1] == DROP_DUPLICATE
+
+        prefilter.forget(7)
+        assert prefilter.check(message_body(7))[1] is None
+
+    @pytest.mark.asyncio
+    async def test_admin_group_messages(self, prefilter):
+        # The first one per chat still registers the chat
+        assert prefilter.check(message_body(1, user_id=ADMIN_ID))[1] is None
+        assert (
+            prefilter.check(message_body(2, user_id=ADMIN_ID))[1]
+            == DROP_ADMIN_MESSAGE
+        )
+        assert prefilter.check(message_body(3, user_id=ADMIN_ID, chat_id=-200))[1] is None  # noqa: E501
+
+        # Private chats with the admin are handled as usual
+        for update_id in (4, 5):
+            body = message_body(
+                update_id, user_id=ADMIN_ID, chat_id=ADMIN_ID, chat_type="private"  # noqa: E501
+            )
+            assert prefilter.check(body)[1] is None
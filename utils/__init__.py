@@ -6,6 +6,8 @@ __all__ = [
     "parse_domains",
     "extract_domains_from_text",
     "normalize_host",
+    "MicroBatcher",
+    "SingleFlight",
 ]
 
 
@@ -13,3 +15,5 @@ from .camel_case_to_snake_case import camel_case_to_snake_case
 from .db_utils import get_or_create
 from .timezone_utils import ensure_utc_timezone, utc_now
 from .domain import parse_domains, extract_domains_from_text, normalize_host
+from .batching import MicroBatcher
+from .singleflight import SingleFlight
@@ -0,0 +1,106 @@
+"""
+Micro-batching helper: collect items for a short window and flush them together
+"""
+
+import asyncio
+from typing import Awaitable, Callable, Generic, Hashable, TypeVar
+
+from logger import get_logger
+
+K = TypeVar("K", bound=Hashable)
+T = TypeVar("T")
+R = TypeVar("R")
+
+log = get_logger(__name__)
+
+
+class MicroBatcher(Generic[K, T, R]):
+    """
+    Collects submitted items per key for up to `max_wait_s` seconds or
+    `max_size` items, whichever comes first, and hands them to `flush`
+    as one batch. `flush` must return one result per item, in order;
+    each result is delivered to the future of the caller that submitted it.
+    """
+
+    def __init__(
+        self,
+        flush: Callable[[K, list[T]], Awaitable[list[R]]],
+        *,
+        max_size: int,
+        max_wait_s: float,
+        name: str = "batcher",
+    ) -> None:
+        self._flush_fn = flush
+        self.max_size = max(1, max_size)
+        self.max_wait_s = max(0.0, max_wait_s)
+        self.name = name
+
+        self._pending: dict[K, list[tuple[T, asyncio.Future[R]]]] = {}
+        self._timers: dict[K, asyncio.TimerHandle] = {}
+        self._flushes: set[asyncio.Task[None]] = set()
+
+    async def submit(self, key: K, item: T) -> R:
+        """Add an item to the batch for `key` and wait for its result."""
+        loop = asyncio.get_running_loop()
+        fut: asyncio.Future[R] = loop.create_future()
+
+        batch = self._pending.setdefault(key, [])
+        batch.append((item, fut))
+
+        if len(batch) >= self.max_size:
+            self._start_flush(key)
+        elif key not in self._timers:
+            self._timers[key] = loop.call_later(
+                self.max_wait_s, self._start_flush, key
+            )
+
+        return await fut
+
+    async def close(self) -> None:
+        """Flush everything that is still pending and wait for in-flight batches."""  # noqa: E501
+        for key in list(self._pending):
+            self._start_flush(key)
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+
+    def _start_flush(self, key: K) -> None:
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+
+        batch = self._pending.pop(key, None)
+        if not batch:
+            return
+
+        task = asyncio.create_task(
+            self._flush(key, batch), name=f"{self.name}-flush"
+        )
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _flush(
+        self, key: K, batch: list[tuple[T, asyncio.Future[R]]]
+    ) -> None:
+        items = [item for item, _ in batch]
+        log.debug("%s: flushing %d items for key=%r", self.name, len(items), key)
+
+        try:
+            results = await self._flush_fn(key, items)
+            if len(results) != len(batch):
+                raise RuntimeError(
+                    f"{self.name}: flush returned {len(results)} results "
+                    f"for {len(batch)} items"
+                )
+        except asyncio.CancelledError:
+            for _, fut in batch:
+                fut.cancel()
+            raise
+        except Exception as e:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+
+        for (_, fut), result in zip(batch, results):
+            if not fut.done():
+                fut.set_result(result)
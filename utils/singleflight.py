@@ -0,0 +1,61 @@
+"""
+Single-flight helper: concurrent calls with the same key share one execution
+"""
+
+import asyncio
+from typing import Awaitable, Callable, Generic, Hashable, Optional, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+R = TypeVar("R")
+
+
+class _Flight(Generic[R]):
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: "asyncio.Future[R]") -> None:
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight(Generic[K, R]):
+    """
+    Coalesces concurrent calls by key: the first caller starts `fn`, later
+    callers with the same key await the same result (or exception) while
+    it is in flight. Once it finishes the key is forgotten - this is not
+    a cache.
+
+    A cancelled caller doesn't cancel the shared call for the others;
+    the call is cancelled only when its last waiter goes away.
+    """
+
+    def __init__(self, on_shared: Optional[Callable[[], None]] = None) -> None:
+        self._flights: dict[K, _Flight[R]] = {}
+        self._on_shared = on_shared
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    async def do(self, key: K, fn: Callable[[], Awaitable[R]]) -> R:
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(fn()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(
+                lambda _task, key=key, flight=flight: self._forget(key, flight)
+            )
+        elif self._on_shared is not None:
+            self._on_shared()
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def _forget(self, key: K, flight: _Flight[R]) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]